@@ -0,0 +1,147 @@
+"""Асинхронний шар доступу до даних.
+
+Кожна функція з app.db, що звертається до SQLite, має тут awaitable-аналог
+з тим самим ім'ям і сигнатурою. Виклики виконуються в окремому обмеженому
+пулі потоків, тому повільний запит або очікування блокування не зупиняє
+event loop і polling продовжує працювати.
+"""
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from app import db
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    """Повертає (створюючи за потреби) пул потоків для роботи з БД."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=Config.DB_POOL_SIZE,
+            thread_name_prefix='db'
+        )
+    return _executor
+
+
+async def run_in_db(func, *args, **kwargs):
+    """Виконує блокуючу функцію в пулі потоків БД і чекає результат."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def _make_async(name):
+    # Функцію беремо з модуля під час виклику, а не під час імпорту,
+    # щоб monkeypatch у тестах і пізні заміни в app.db працювали.
+    async def wrapper(*args, **kwargs):
+        return await run_in_db(getattr(db, name), *args, **kwargs)
+
+    wrapper.__name__ = name
+    wrapper.__qualname__ = name
+    wrapper.__doc__ = f"Асинхронна версія app.db.{name}."
+    return wrapper
+
+
+def shutdown(wait=True):
+    """Зупиняє пул потоків БД і закриває з'єднання (викликати при завершенні бота)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+        _executor = None
+        logger.info("Пул потоків БД зупинено")
+    db.close_db_connections()
+
+
+# --- Ініціалізація БД ---
+init_db = _make_async('init_db')
+
+# --- Замовлення ---
+add_order = _make_async('add_order')
+update_order = _make_async('update_order')
+get_order_by_id = _make_async('get_order_by_id')
+get_orders = _make_async('get_orders')
+get_orders_page = _make_async('get_orders_page')
+count_orders = _make_async('count_orders')
+get_orders_by_deadline = _make_async('get_orders_by_deadline')
+update_order_status = _make_async('update_order_status')
+apply_status_transitions = _make_async('apply_status_transitions')
+find_orders = _make_async('find_orders')
+rebuild_search_index = _make_async('rebuild_search_index')
+get_order_by_num = _make_async('get_order_by_num')
+
+# --- Промокоди ---
+add_promocode = _make_async('add_promocode')
+get_promocode = _make_async('get_promocode')
+get_promocodes = _make_async('get_promocodes')
+use_promocode = _make_async('use_promocode')
+get_promocode_usages = _make_async('get_promocode_usages')
+
+# --- Реферальна система ---
+add_referral = _make_async('add_referral')
+get_referrals = _make_async('get_referrals')
+add_referral_bonus = _make_async('add_referral_bonus')
+
+# --- Нагадування ---
+add_reminder = _make_async('add_reminder')
+get_pending_reminders = _make_async('get_pending_reminders')
+get_unsent_reminders = _make_async('get_unsent_reminders')
+mark_reminder_sent = _make_async('mark_reminder_sent')
+mark_reminders_sent = _make_async('mark_reminders_sent')
+mark_reminders_failed = _make_async('mark_reminders_failed')
+
+# --- Спам захист ---
+check_spam_protection = _make_async('check_spam_protection')
+save_spam_snapshot = _make_async('save_spam_snapshot')
+load_spam_snapshot = _make_async('load_spam_snapshot')
+
+# --- Стан FSM ---
+load_fsm_record = _make_async('load_fsm_record')
+save_fsm_records = _make_async('save_fsm_records')
+purge_fsm_records = _make_async('purge_fsm_records')
+
+# --- Статистика замовлень ---
+get_order_stats = _make_async('get_order_stats')
+rebuild_order_stats = _make_async('rebuild_order_stats')
+export_stats = _make_async('export_stats')
+
+# --- Бекапи ---
+create_backup = _make_async('create_backup')
+get_last_backup = _make_async('get_last_backup')
+
+# --- Відгуки ---
+add_feedback = _make_async('add_feedback')
+get_feedbacks = _make_async('get_feedbacks')
+
+# --- Підтримка та переписки ---
+add_support_log = _make_async('add_support_log')
+get_support_logs = _make_async('get_support_logs')
+log_message = _make_async('log_message')
+add_audit_records = _make_async('add_audit_records')
+
+# --- Користувачі ---
+upsert_users = _make_async('upsert_users')
+mark_users_blocked = _make_async('mark_users_blocked')
+get_user = _make_async('get_user')
+count_broadcast_recipients = _make_async('count_broadcast_recipients')
+
+# --- Розсилки ---
+create_broadcast_job = _make_async('create_broadcast_job')
+get_broadcast_job = _make_async('get_broadcast_job')
+get_unfinished_broadcast_jobs = _make_async('get_unfinished_broadcast_jobs')
+set_broadcast_progress_message = _make_async('set_broadcast_progress_message')
+get_broadcast_batch = _make_async('get_broadcast_batch')
+record_broadcast_results = _make_async('record_broadcast_results')
+set_broadcast_status = _make_async('set_broadcast_status')
+
+# --- Старі версії для сумісності ---
+add_promocode_old = _make_async('add_promocode_old')
+use_promocode_old = _make_async('use_promocode_old')
+add_order_old = _make_async('add_order_old')
+update_order_status_old = _make_async('update_order_status_old')
+get_order_by_num_old = _make_async('get_order_by_num_old')
+find_orders_old = _make_async('find_orders_old')
@@ -8,9 +8,79 @@ class Config:
     ADMIN_IDS = [int(id.strip()) for id in os.getenv('ADMIN_IDS', '').split(',') if id.strip()]
     MAX_FILE_SIZE = 20 * 1024 * 1024  # 20MB
     
+    # Отримання апдейтів: 'polling' або 'webhook' (див. app/webhook.py)
+    BOT_MODE = os.getenv('BOT_MODE', 'polling')
+    WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL', '')  # публічна HTTPS-адреса, напр. https://bot.example.com
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')  # порожній — генерується при старті
+    WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+    WEBHOOK_MAX_CONNECTIONS = 40  # одночасних з'єднань від Telegram (1-100)
+    WEBHOOK_DRAIN_TIMEOUT = 30  # секунди на дообробку апдейтів при зупинці
+    
     # Налаштування автоматизації
     AUTO_UPDATE_INTERVAL = 3600  # секунди між автоматичними оновленнями
+    REMINDER_RETRY_DELAY = 300  # секунди до повторної спроби невдалого нагадування (далі ×2)
+    REMINDER_MAX_ATTEMPTS = 5  # після стількох невдач нагадування позначається failed_at
+    REMINDER_ACK_BATCH = 100  # скільки відправлених id позначати одним UPDATE
+    
+    # Відправка повідомлень (ліміти Telegram Bot API)
+    SEND_GLOBAL_RATE = 25  # повідомлень на секунду загалом (ліміт Telegram ~30)
+    SEND_PER_CHAT_INTERVAL = 1.0  # мінімальний інтервал між повідомленнями в один чат (с)
+    SEND_CONCURRENCY = 8  # одночасних запитів до Bot API
+    SEND_MAX_ATTEMPTS = 3  # спроб при мережевих/серверних помилках
+    SEND_BACKOFF_BASE = 1.0  # початкова затримка повтору (с), подвоюється
+    SEND_CHAT_SLOTS_MAX = 10000  # скільки чатів пам'ятати для поштучного ліміту
+    
+    # Сховище стану FSM (див. app/storage)
+    FSM_STORAGE = os.getenv('FSM_STORAGE', 'sqlite')  # 'sqlite' або 'memory' (обмежена пам'ять)
+    FSM_FLUSH_INTERVAL = 1.0  # секунди між записами змінених станів у БД
+    FSM_STATE_TTL = 7 * 86400  # стан, який не змінювався стільки секунд, видаляється
+    FSM_CACHE_IDLE = 3600  # запис без звернень стільки секунд вивантажується з кешу
+    FSM_PURGE_INTERVAL = 3600  # секунди між очищеннями застарілих станів
+    FSM_MEMORY_MAX_CONTEXTS = 100000  # максимум контекстів у пам'яті (FSM_STORAGE='memory')
+    FSM_MEMORY_MAX_BYTES = 64 * 1024 * 1024  # бюджет пам'яті на стани та дані (приблизно)
+    FSM_MEMORY_IDLE_TTL = 24 * 3600  # контекст без звернень стільки секунд видаляється
+    
+    # Облік користувачів (таблиця users)
+    USERS_FLUSH_INTERVAL = 5  # секунди між записами накопичених змін
+    USERS_TOUCH_DEBOUNCE = 300  # не оновлювати last_active_at частіше (секунди)
+    USERS_CACHE_SIZE = 100000  # скільки користувачів пам'ятати для дебаунсу
+    
+    # Розсилки
+    BROADCAST_BATCH_SIZE = 100  # отримувачів в одній порції (результати пишуться порцією)
+    BROADCAST_PROGRESS_INTERVAL = 20  # мінімум секунд між оновленнями повідомлення з прогресом
+    
+    # Бекапи
     BACKUP_INTERVAL = 86400  # секунди між бекапами (24 години)
+    BACKUP_DIR = 'backups'  # каталог для стиснених бекапів
+    BACKUP_KEEP = 7  # скільки останніх бекапів зберігати
+    BACKUP_PAGES_PER_STEP = 1024  # сторінок БД за один крок онлайн-копіювання
+    BACKUP_STEP_SLEEP = 0.005  # пауза між кроками (секунди), щоб не блокувати запис
+    
+    # Експорт статистики в CSV (кнопка "📊 Експорт статистики", /export)
+    EXPORT_CHUNK_SIZE = 1000  # рядків БД за одне читання (fetchmany)
+    EXPORT_SPOOL_MAX_SIZE = 4 * 1024 * 1024  # байтів архіву в пам'яті, далі — тимчасовий файл
+    EXPORT_MAX_BYTES = 50 * 1024 * 1024  # ліміт Bot API на документ
+    
+    # Налаштування бази даних
+    DB_POOL_SIZE = 4  # кількість потоків для асинхронних запитів до БД
+    DB_CACHE_SIZE_KB = 16 * 1024  # розмір кешу сторінок SQLite на з'єднання (16MB)
+    DB_MMAP_SIZE = 128 * 1024 * 1024  # розмір memory-mapped I/O (128MB)
+    DB_STATEMENT_CACHE_SIZE = 256  # кількість підготовлених запитів у кеші з'єднання
+    
+    # Буферизований журнал повідомлень (messages, support_logs)
+    AUDIT_FLUSH_INTERVAL = 0.5  # секунди між записами пакета
+    AUDIT_BATCH_SIZE = 200  # максимум рядків в одному пакеті
+    AUDIT_QUEUE_SIZE = 10000  # максимум рядків у черзі (далі — очікування)
+    
+    # Спам захист (ліміти в пам'яті, див. SPAM_LIMITS)
+    RATE_LIMIT_MAX_KEYS = 100000  # максимум пар (користувач, дія) в LRU
+    RATE_LIMIT_PERSIST = True  # зберігати стан у spam_protection між перезапусками
+    
+    # Кеш промокодів (app/services/promo_registry.py)
+    PROMO_CACHE_TTL = 60  # секунди, скільки рядок промокоду береться з кешу
+    PROMO_CACHE_SIZE = 1024  # максимум кодів у кеші (разом з неіснуючими)
 
 # Статуси замовлень
 ORDER_STATUSES = {
@@ -90,6 +160,21 @@ REMINDER_TYPES = {
     }
 }
 
+# Автоматичні переходи статусів (застосовуються по черзі раз на AUTO_UPDATE_INTERVAL).
+# since: 'deadline_date' — через after_days днів після дедлайну,
+#        'updated_at' / 'created_at' — через after_days днів після зміни/створення.
+# message — сповіщення користувачу (None — без сповіщення), {order_id} підставляється.
+AUTO_STATUS_TRANSITIONS = [
+    {
+        'from_status': 'in_progress',
+        'to_status': 'review',
+        'since': 'deadline_date',
+        'after_days': 0,
+        'notes': 'Автоматичне оновлення: дедлайн минув',
+        'message': 'ℹ️ Ваше замовлення #{order_id} переведено на перевірку (дедлайн минув).'
+    },
+]
+
 
 
 # Обмеження файлів
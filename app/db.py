@@ -1,14 +1,104 @@
 import sqlite3
+import threading
+import re
+import functools
+from collections import namedtuple
 from contextlib import closing
 import json
 from datetime import datetime, timedelta
-import random
+from app.config import Config
+from app.migrations import run_migrations, fill_order_stats
+from app.utils.order_ids import order_number
+from app.utils.deadlines import to_deadline_date
 
 DB_PATH = 'botdata.sqlite3'
 
+# Кожен потік (головний і потоки пулу app.async_db) тримає власне
+# довготривале з'єднання, щоб не відкривати файл і не перечитувати схему
+# на кожен запит.
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+
+# Колонки таблиці orders у порядку створення (для перевірки проєкцій)
+ORDER_COLUMNS = (
+    'id', 'user_id', 'first_name', 'username', 'phone_number', 'type_label',
+    'order_type', 'topic', 'subject', 'deadline', 'volume', 'requirements',
+    'files', 'price', 'status', 'created_at', 'updated_at', 'confirmed_at',
+    'manager_id', 'notes', 'deadline_date'
+)
+# Поля для списків замовлень (/cabinet, /orders) — без великих requirements і files
+ORDER_SUMMARY_COLUMNS = (
+    'id', 'user_id', 'first_name', 'username', 'type_label', 'topic',
+    'deadline', 'price', 'status', 'created_at'
+)
+
+@functools.lru_cache(maxsize=128)
+def _row_class(fields):
+    return namedtuple('Row', fields, rename=True)
+
+def namedtuple_row(cursor, row):
+    """row_factory: рядок як namedtuple з полями за назвами колонок.
+
+    Рядки лишаються кортежами (індексація order[14] працює), але без
+    словника на кожен екземпляр, і поля доступні як атрибути (order.status).
+    """
+    fields = tuple(column[0] for column in cursor.description)
+    return _row_class(fields)(*row)
+
+def _order_columns_sql(columns):
+    if columns is None:
+        return '*'
+    unknown = [column for column in columns if column not in ORDER_COLUMNS]
+    if unknown:
+        raise ValueError(f"Невідомі колонки orders: {unknown}")
+    return ', '.join(columns)
+
+def _connect(path):
+    """Відкриває нове з'єднання та налаштовує PRAGMA для продуктивності."""
+    # check_same_thread=False лише для того, щоб close_db_connections() міг
+    # закрити з'єднання з іншого потоку; кожне з'єднання використовує один потік.
+    conn = sqlite3.connect(
+        path,
+        timeout=10,
+        check_same_thread=False,
+        cached_statements=Config.DB_STATEMENT_CACHE_SIZE
+    )
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA cache_size=-{int(Config.DB_CACHE_SIZE_KB)}')
+    conn.execute(f'PRAGMA mmap_size={int(Config.DB_MMAP_SIZE)}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.row_factory = namedtuple_row
+    return conn
+
 def get_db_connection():
-    """Створює з'єднання з базою даних з таймаутом."""
-    return sqlite3.connect(DB_PATH, timeout=10)
+    """Повертає довготривале з'єднання поточного потоку (створює за потреби).
+
+    Використовується як `with get_db_connection() as conn:` — блок `with`
+    комітить або відкочує транзакцію, але не закриває з'єднання.
+    Підготовлені запити кешуються самим з'єднанням (cached_statements).
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != DB_PATH:
+        conn = _connect(DB_PATH)
+        _local.conn = conn
+        _local.path = DB_PATH
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+def close_db_connections():
+    """Закриває всі відкриті з'єднання (викликати при завершенні бота)."""
+    with _connections_lock:
+        connections = list(_connections)
+        _connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _local.__dict__.clear()
 
 # --- Ініціалізація БД ---
 def init_db():
@@ -161,28 +251,45 @@ def init_db():
         )''')
         
         conn.commit()
+        
+        # Індекси та подальші зміни схеми
+        run_migrations(conn)
 
 # --- Функції для роботи з замовленнями ---
+def _allocate_order_id(c):
+    """Видає наступний номер замовлення в межах поточної транзакції.
+
+    UPDATE лічильника бере блокування запису, тому паралельні підтвердження
+    отримують різні значення; номер — ключова перестановка лічильника
+    (див. app.utils.order_ids). Перевірка зайнятості потрібна лише для
+    старих замовлень з випадковими номерами, які могли збігтися з виданим.
+    """
+    while True:
+        c.execute('''UPDATE id_sequences SET value = value + 1 WHERE name = 'orders'
+                    RETURNING value - 1, secret''')
+        counter, secret = c.fetchone()
+        order_id = order_number(counter, secret.encode())
+        c.execute('SELECT 1 FROM orders WHERE id = ?', (order_id,))
+        if not c.fetchone():
+            return order_id
+
 def add_order(user_id, first_name, username, phone_number, type_label, order_type, 
               topic, subject, deadline, volume, requirements, price, files=None):
     with get_db_connection() as conn:
         c = conn.cursor()
         now = datetime.now().isoformat()
-        # Генеруємо унікальний випадковий id (5-значне число)
-        while True:
-            rand_id = random.randint(10000, 99999)
-            c.execute('SELECT 1 FROM orders WHERE id = ?', (rand_id,))
-            if not c.fetchone():
-                break
+        # Унікальний неперебірний номер (5-значний, далі 6-значний і т.д.)
+        rand_id = _allocate_order_id(c)
         # Конвертуємо файли в JSON
         files_json = json.dumps(files or [])
         c.execute('''INSERT INTO orders 
                     (id, user_id, first_name, username, phone_number, type_label, order_type,
-                     topic, subject, deadline, volume, requirements, files, price, 
+                     topic, subject, deadline, deadline_date, volume, requirements, files, price, 
                      status, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'draft', ?, ?)''',
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'draft', ?, ?)''',
                  (rand_id, user_id, first_name, username, phone_number, type_label, order_type,
-                  topic, subject, deadline, volume, requirements, files_json, price, now, now))
+                  topic, subject, deadline, to_deadline_date(deadline), volume, requirements,
+                  files_json, price, now, now))
         order_id = rand_id
         # Додаємо файли окремо
         if files:
@@ -200,6 +307,10 @@ def update_order(order_id, **kwargs):
         c = conn.cursor()
         now = datetime.now().isoformat()
         
+        # Нормалізована дата дедлайну оновлюється разом з текстом
+        if 'deadline' in kwargs:
+            kwargs['deadline_date'] = to_deadline_date(kwargs['deadline'])
+        
         # Оновлюємо основні поля
         update_fields = []
         values = []
@@ -264,11 +375,16 @@ def get_order_by_id(order_id):
             }
         return None
 
-def get_orders(user_id=None, status=None):
+def get_orders(user_id=None, status=None, columns=None):
+    """Повертає замовлення (нові першими).
+
+    columns — кортеж потрібних колонок (наприклад ORDER_SUMMARY_COLUMNS);
+    за замовчуванням вибираються всі.
+    """
     with get_db_connection() as conn:
         c = conn.cursor()
         
-        query = "SELECT * FROM orders"
+        query = f"SELECT {_order_columns_sql(columns)} FROM orders"
         params = []
         
         if user_id:
@@ -287,6 +403,81 @@ def get_orders(user_id=None, status=None):
         c.execute(query, params)
         return c.fetchall()
 
+def _orders_filter(user_id=None, status=None):
+    conditions = []
+    params = []
+    if user_id:
+        conditions.append("user_id = ?")
+        params.append(user_id)
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    return conditions, params
+
+def get_orders_page(user_id=None, status=None, cursor=None, direction='next', limit=10,
+                    columns=ORDER_SUMMARY_COLUMNS):
+    """Одна сторінка замовлень (нові першими) з keyset-пагінацією.
+
+    Ключ сортування — (created_at, id). cursor — id замовлення на межі
+    поточної сторінки: direction='next' повертає старіші за нього,
+    'prev' — новіші. Незалежно від кількості замовлень читається лише
+    limit + 1 рядків по індексу.
+
+    Повертає (rows, has_more), де rows відсортовані від нових до старих,
+    а has_more означає, що в напрямку direction є ще сторінки.
+    """
+    if 'id' not in columns or 'created_at' not in columns:
+        raise ValueError("Для пагінації потрібні колонки id та created_at")
+    conditions, params = _orders_filter(user_id, status)
+    if cursor is not None:
+        op = '<' if direction == 'next' else '>'
+        conditions.append(f"(created_at, id) {op} (SELECT created_at, id FROM orders WHERE id = ?)")
+        params.append(cursor)
+    order = 'DESC' if direction == 'next' else 'ASC'
+    query = f"SELECT {_order_columns_sql(columns)} FROM orders"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY created_at {order}, id {order} LIMIT ?"
+    params.append(limit + 1)
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute(query, params)
+        rows = c.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction != 'next':
+        rows.reverse()
+    return rows, has_more
+
+def count_orders(user_id=None, status=None):
+    conditions, params = _orders_filter(user_id, status)
+    query = "SELECT COUNT(*) FROM orders"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute(query, params)
+        return c.fetchone()[0]
+
+def get_orders_by_deadline(status, deadline_date=None, before=None, columns=None):
+    """Замовлення зі статусом status і дедлайном рівно deadline_date або раніше before.
+
+    Дати — рядки 'YYYY-MM-DD'; вибірка йде за індексом (status, deadline_date),
+    замовлення з нерозпізнаним дедлайном (deadline_date IS NULL) не потрапляють.
+    """
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        query = f"SELECT {_order_columns_sql(columns)} FROM orders WHERE status = ?"
+        params = [status]
+        if deadline_date is not None:
+            query += " AND deadline_date = ?"
+            params.append(deadline_date)
+        if before is not None:
+            query += " AND deadline_date < ?"
+            params.append(before)
+        c.execute(query, params)
+        return c.fetchall()
+
 # --- Функції для промокодів ---
 def add_promocode(code, discount_type, discount_value, usage_limit, 
                  expires_at=None, is_personal=False, personal_user_id=None, min_order_amount=0):
@@ -313,6 +504,16 @@ def get_promocode(code):
                      FROM promocodes WHERE code = ?''', (code,))
         return c.fetchone()
 
+def get_promocodes():
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT 
+                        code, discount_type, discount_value, usage_limit, 
+                        used_count, created_at, expires_at, is_personal, 
+                        personal_user_id, min_order_amount 
+                     FROM promocodes''')
+        return c.fetchall()
+
 def is_promocode_valid(promocode, user_id, order_amount):
     if not promocode:
         return False, "Промокод не знайдено (повернуто None)"
@@ -344,21 +545,28 @@ def is_promocode_valid(promocode, user_id, order_amount):
     return True, "Промокод дійсний"
 
 def use_promocode(code, user_id, order_id, order_amount):
-    promocode = get_promocode(code)
-    if not promocode:
-        return 0
-
-    # Розрахунок знижки
-    discount = 0
-    if promocode[1] == 'percent':
-        discount = int(order_amount * promocode[2] / 100)
-    elif promocode[1] == 'fixed':
-        discount = int(promocode[2])
+    """Використовує промокод; повертає знижку або None, якщо коду немає чи ліміт вичерпано.
 
-    # Оновлюємо used_count
+    Лічильник збільшується одним умовним UPDATE (used_count < usage_limit),
+    тому паралельні підтвердження замовлень не перевищать ліміт. Запис у
+    promocode_usages додається в тій самій транзакції.
+    """
     with get_db_connection() as conn:
         c = conn.cursor()
-        c.execute('UPDATE promocodes SET used_count = used_count + 1 WHERE code = ?', (code,))
+        c.execute('''UPDATE promocodes SET used_count = used_count + 1
+                    WHERE code = ? AND (usage_limit IS NULL OR used_count < usage_limit)
+                    RETURNING discount_type, discount_value''', (code,))
+        promocode = c.fetchone()
+        if promocode is None:
+            return None
+
+        # Розрахунок знижки
+        discount = 0
+        if promocode.discount_type == 'percent':
+            discount = int(order_amount * promocode.discount_value / 100)
+        elif promocode.discount_type == 'fixed':
+            discount = int(promocode.discount_value)
+
         c.execute('INSERT INTO promocode_usages (code, user_id, order_id, discount_amount, used_at) VALUES (?, ?, ?, ?, ?)',
                   (code, user_id, order_id, discount, datetime.now().isoformat()))
         conn.commit()
@@ -402,19 +610,32 @@ def add_reminder(user_id, order_id, reminder_type, scheduled_at, message):
     with get_db_connection() as conn:
         c = conn.cursor()
         
-        c.execute('''INSERT INTO reminders 
+        # (order_id, reminder_type) унікальні: повторне створення ігнорується
+        c.execute('''INSERT OR IGNORE INTO reminders 
                     (user_id, order_id, reminder_type, scheduled_at, message)
                     VALUES (?, ?, ?, ?, ?)''',
                  (user_id, order_id, reminder_type, scheduled_at, message))
         conn.commit()
+        return c.lastrowid if c.rowcount else None
 
 def get_pending_reminders():
     with get_db_connection() as conn:
         c = conn.cursor()
         now = datetime.now().isoformat()
         
-        c.execute('''SELECT * FROM reminders 
-                    WHERE scheduled_at <= ? AND sent_at IS NULL''', (now,))
+        # Користувачам, які заблокували бота, не відправляємо
+        c.execute('''SELECT * FROM reminders r
+                    WHERE r.scheduled_at <= ? AND r.sent_at IS NULL AND r.failed_at IS NULL
+                      AND NOT EXISTS (SELECT 1 FROM users u
+                                      WHERE u.user_id = r.user_id AND u.is_blocked = 1)''', (now,))
+        return c.fetchall()
+
+def get_unsent_reminders():
+    """Повертає (id, scheduled_at) усіх ще не відправлених нагадувань."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT id, scheduled_at FROM reminders
+                    WHERE sent_at IS NULL AND failed_at IS NULL ORDER BY scheduled_at''')
         return c.fetchall()
 
 def mark_reminder_sent(reminder_id):
@@ -425,6 +646,40 @@ def mark_reminder_sent(reminder_id):
         c.execute('''UPDATE reminders SET sent_at = ? WHERE id = ?''', (now, reminder_id))
         conn.commit()
 
+def mark_reminders_sent(reminder_ids):
+    """Позначає відправленими одразу кілька нагадувань (один UPDATE на порцію id)."""
+    reminder_ids = list(reminder_ids)
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        now = datetime.now().isoformat()
+        # Порції, щоб не впертись у ліміт кількості параметрів SQLite
+        for i in range(0, len(reminder_ids), 500):
+            chunk = reminder_ids[i:i + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            c.execute(f'''UPDATE reminders SET sent_at = ?
+                         WHERE id IN ({placeholders})''', (now, *chunk))
+        conn.commit()
+
+def mark_reminders_failed(failures, max_attempts):
+    """Записує невдалі спроби: failures — список (id, помилка, постійна_помилка, retry_at).
+
+    Нагадування з постійною помилкою або max_attempts невдачами отримує
+    failed_at і більше не повертається get_pending_reminders(); решта
+    переноситься на retry_at.
+    """
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        now = datetime.now().isoformat()
+        c.executemany('''UPDATE reminders SET
+                            attempts = attempts + 1,
+                            last_error = ?,
+                            failed_at = CASE WHEN ? OR attempts + 1 >= ? THEN ? END,
+                            scheduled_at = COALESCE(?, scheduled_at)
+                        WHERE id = ?''',
+                     [(error, bool(permanent), max_attempts, now, retry_at, reminder_id)
+                      for reminder_id, error, permanent, retry_at in failures])
+        conn.commit()
+
 # --- Функції для спам захисту ---
 def check_spam_protection(user_id, action_type, limit=5, window_minutes=5):
     with get_db_connection() as conn:
@@ -453,30 +708,271 @@ def check_spam_protection(user_id, action_type, limit=5, window_minutes=5):
         conn.commit()
         return True
 
-# --- Функції для бекапів ---
-def create_backup():
-    import shutil
-    import os
+def save_spam_snapshot(rows):
+    """Замінює вміст spam_protection знімком стану лімітера в пам'яті."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute('DELETE FROM spam_protection')
+        c.executemany('''INSERT INTO spam_protection (user_id, action_type, created_at)
+                        VALUES (?, ?, ?)''', rows)
+        conn.commit()
+
+def load_spam_snapshot():
+    """Повертає збережені дії (user_id, action_type, created_at) за зростанням часу."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT user_id, action_type, created_at FROM spam_protection
+                    ORDER BY created_at''')
+        return c.fetchall()
+
+# --- Стан FSM ---
+def load_fsm_record(key):
+    """Повертає (state, data, updated_at) для ключа FSM або None."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT state, data, updated_at FROM fsm_storage WHERE key = ?', (key,))
+        return c.fetchone()
+
+def save_fsm_records(upserts=(), deletes=()):
+    """Записує пакет змін стану FSM однією транзакцією.
+
+    upserts — кортежі (key, state, data_json, updated_at); deletes — ключі
+    записів, у яких не лишилось ні стану, ні даних.
+    """
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        if upserts:
+            c.executemany('''INSERT INTO fsm_storage (key, state, data, updated_at)
+                            VALUES (?, ?, ?, ?)
+                            ON CONFLICT (key) DO UPDATE SET
+                                state = excluded.state,
+                                data = excluded.data,
+                                updated_at = excluded.updated_at''', upserts)
+        if deletes:
+            c.executemany('DELETE FROM fsm_storage WHERE key = ?', [(key,) for key in deletes])
+        conn.commit()
+
+def purge_fsm_records(before):
+    """Видаляє записи FSM, не оновлювані з before (ISO); повертає кількість."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute('DELETE FROM fsm_storage WHERE updated_at < ?', (before,))
+        conn.commit()
+        return c.rowcount
+
+# --- Статистика замовлень ---
+OrderStats = namedtuple('OrderStats', 'total_orders total_revenue recent_orders by_status by_type')
+StatusStats = namedtuple('StatusStats', 'status orders revenue')
+
+ORDER_STATS_TABLES = ('order_stats_status', 'order_stats_type', 'order_stats_daily')
+
+def _from_cents(cents):
+    """Копійки -> гривні: ціле число, якщо копійок немає (як ціни в orders)."""
+    return cents // 100 if cents % 100 == 0 else cents / 100
+
+def get_order_stats(since):
+    """Статистика замовлень з агрегатів order_stats_* (без перебору orders).
+
+    since — час ISO ('YYYY-MM-DDTHH:MM:SS' або дата 'YYYY-MM-DD' — з її
+    початку): recent_orders — замовлення, створені пізніше since. Повні дні
+    після since беруться з order_stats_daily, частина дня since — з orders
+    за індексом created_at. by_status — рядки (status, orders, revenue),
+    by_type — (type_label, orders), за спаданням кількості.
+    """
+    since_day = since[:10]
+    next_day = (datetime.fromisoformat(since_day) + timedelta(days=1)).date().isoformat()
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT status, orders, revenue_cents FROM order_stats_status
+                    WHERE orders > 0 ORDER BY orders DESC, status''')
+        status_rows = c.fetchall()
+        c.execute('''SELECT type_label, orders FROM order_stats_type
+                    WHERE orders > 0 ORDER BY orders DESC, type_label''')
+        by_type = c.fetchall()
+        c.execute('''SELECT COALESCE(SUM(orders), 0) AS orders FROM order_stats_daily
+                    WHERE day > ?''', (since_day,))
+        recent_orders = c.fetchone().orders
+        c.execute('''SELECT COUNT(*) AS orders FROM orders
+                    WHERE created_at > ? AND created_at < ?''', (since, next_day))
+        recent_orders += c.fetchone().orders
+    return OrderStats(
+        total_orders=sum(row.orders for row in status_rows),
+        total_revenue=_from_cents(sum(row.revenue_cents for row in status_rows)),
+        recent_orders=recent_orders,
+        by_status=[StatusStats(row.status, row.orders, _from_cents(row.revenue_cents))
+                   for row in status_rows],
+        by_type=by_type
+    )
+
+def rebuild_order_stats():
+    """Перераховує агрегати статистики з orders з нуля.
+
+    Повертає кількість рядків агрегатів, що розходились з orders
+    (0 — тригери вели їх правильно).
+    """
+    def snapshot(c):
+        rows = set()
+        for table in ORDER_STATS_TABLES:
+            c.execute(f'SELECT * FROM {table}')
+            rows.update((table, *row) for row in c.fetchall() if any(row[1:]))
+        return rows
     
-    backup_dir = "backups"
-    if not os.path.exists(backup_dir):
-        os.makedirs(backup_dir)
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        before = snapshot(c)
+        fill_order_stats(c)
+        after = snapshot(c)
+        conn.commit()
+    return len({row[:2] for row in before ^ after})
+
+# --- Експорт статистики ---
+EXPORT_ORDER_COLUMNS = tuple(column for column in ORDER_COLUMNS if column != 'files')
+
+# Текст, з якого Excel/LibreOffice почне формулу
+_CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _csv_safe(row):
+    return [f"'{value}" if isinstance(value, str) and value.startswith(_CSV_FORMULA_PREFIXES) else value
+            for value in row]
+
+def _write_csv(archive, name, c, chunk_size):
+    """Пише результат уже виконаного запиту c у CSV-файл архіву порціями."""
+    import csv
+    import io
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = f"{backup_dir}/backup_{timestamp}.sqlite3"
+    count = 0
+    # utf-8-sig: Excel відкриває кирилицю без ручного вибору кодування
+    with io.TextIOWrapper(archive.open(name, 'w'), encoding='utf-8-sig', newline='') as text:
+        writer = csv.writer(text)
+        writer.writerow(column[0] for column in c.description)
+        while rows := c.fetchmany(chunk_size):
+            writer.writerows(_csv_safe(row) for row in rows)
+            count += len(rows)
+    return count
+
+def export_stats(fileobj, date_from=None, date_to=None, status=None, chunk_size=1000):
+    """Пише в fileobj zip-архів з orders.csv, order_status_history.csv і promocode_usages.csv.
+
+    date_from/date_to ('YYYY-MM-DD', включно) і status фільтрують
+    замовлення за created_at і статусом; історія статусів і використання
+    промокодів експортуються для тих самих замовлень. Рядки читаються
+    порціями по chunk_size і одразу стискаються в архів, тож пам'ять не
+    залежить від розміру таблиць. Усі три файли — з одного знімка БД.
+
+    Повертає кількість рядків за файлами.
+    """
+    import zipfile
     
-    shutil.copy2(DB_PATH, backup_file)
+    conditions, params = [], []
+    if date_from:
+        conditions.append('o.created_at >= ?')
+        params.append(date_from)
+    if date_to:
+        conditions.append('o.created_at < ?')
+        params.append((datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d'))
+    if status:
+        conditions.append('o.status = ?')
+        params.append(status)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    # Без фільтрів — усі рядки, зокрема для вже видалених замовлень
+    join = 'JOIN orders o ON o.id = t.order_id' if conditions else ''
+    columns = ', '.join(f'o.{column}' for column in EXPORT_ORDER_COLUMNS)
     
-    # Записуємо інформацію про бекап
+    counts = {}
+    with get_db_connection() as conn, \
+            zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        c = conn.cursor()
+        if not conn.in_transaction:
+            c.execute('BEGIN')
+        c.execute(f'SELECT {columns} FROM orders o {where} ORDER BY o.created_at, o.id', params)
+        counts['orders'] = _write_csv(archive, 'orders.csv', c, chunk_size)
+        c.execute(f'''SELECT t.order_id, t.status, t.changed_by, t.changed_at, t.notes
+                     FROM order_status_history t {join} {where} ORDER BY t.id''', params)
+        counts['order_status_history'] = _write_csv(archive, 'order_status_history.csv', c, chunk_size)
+        c.execute(f'''SELECT t.code, t.user_id, t.order_id, t.discount_amount, t.used_at
+                     FROM promocode_usages t {join} {where} ORDER BY t.id''', params)
+        counts['promocode_usages'] = _write_csv(archive, 'promocode_usages.csv', c, chunk_size)
+        conn.commit()
+    return counts
+
+# --- Функції для бекапів ---
+def create_backup(progress=None):
+    """Створює стиснений бекап БД без зупинки бота.
+
+    Копія знімається онлайн backup API SQLite порціями по
+    BACKUP_PAGES_PER_STEP сторінок: між порціями блокування відпускається,
+    тож запис у базу не зупиняється, а копія завжди узгоджена (на відміну
+    від копіювання файлу посеред транзакції). Далі копія перевіряється
+    PRAGMA integrity_check, стискається gzip, а старі бекапи понад
+    BACKUP_KEEP видаляються.
+
+    progress(stage, done, total) викликається з потоку бекапу; stage —
+    'copy' (done/total — сторінки), 'verify' або 'compress'.
+    """
+    import gzip
+    import os
+    import shutil
+
+    os.makedirs(Config.BACKUP_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    raw_file = os.path.join(Config.BACKUP_DIR, f"backup_{timestamp}.sqlite3.part")
+    backup_file = os.path.join(Config.BACKUP_DIR, f"backup_{timestamp}.sqlite3.gz")
+
+    def on_step(status, remaining, total):
+        if progress:
+            progress('copy', total - remaining, total)
+
+    try:
+        with closing(sqlite3.connect(raw_file)) as target:
+            get_db_connection().backup(
+                target,
+                pages=Config.BACKUP_PAGES_PER_STEP,
+                progress=on_step,
+                sleep=Config.BACKUP_STEP_SLEEP
+            )
+            if progress:
+                progress('verify', 0, 0)
+            result = target.execute('PRAGMA integrity_check').fetchone()[0]
+            if result != 'ok':
+                raise sqlite3.DatabaseError(f"Бекап не пройшов integrity_check: {result}")
+
+        if progress:
+            progress('compress', 0, 0)
+        with open(raw_file, 'rb') as src, gzip.open(backup_file, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    except Exception:
+        if os.path.exists(backup_file):
+            os.remove(backup_file)
+        raise
+    finally:
+        if os.path.exists(raw_file):
+            os.remove(raw_file)
+
+    # Записуємо інформацію про бекап і видаляємо застарілі
     with get_db_connection() as conn:
         c = conn.cursor()
         c.execute('''INSERT INTO backups (backup_file, created_at, size_bytes)
                     VALUES (?, ?, ?)''',
                  (backup_file, datetime.now().isoformat(), os.path.getsize(backup_file)))
+        c.execute('''SELECT id, backup_file FROM backups
+                    ORDER BY created_at DESC, id DESC LIMIT -1 OFFSET ?''', (Config.BACKUP_KEEP,))
+        expired = c.fetchall()
+        for row in expired:
+            if row.backup_file and os.path.exists(row.backup_file):
+                os.remove(row.backup_file)
+        c.executemany('DELETE FROM backups WHERE id = ?', [(row.id,) for row in expired])
         conn.commit()
-    
+
     return backup_file
 
+def get_last_backup():
+    """Повертає останній запис з таблиці backups або None."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT id, backup_file, created_at, size_bytes FROM backups
+                    ORDER BY created_at DESC, id DESC LIMIT 1''')
+        return c.fetchone()
+
 # --- Інші функції ---
 def update_order_status(order_id, status, manager_id=None, notes=None):
     with get_db_connection() as conn:
@@ -490,14 +986,68 @@ def update_order_status(order_id, status, manager_id=None, notes=None):
                  (order_id, status, manager_id, now, notes))
         conn.commit()
 
-def find_orders(query):
+# Колонки, від яких можна відраховувати автоматичний перехід статусу
+TRANSITION_SINCE_COLUMNS = ('deadline_date', 'updated_at', 'created_at')
+
+def apply_status_transitions(transitions):
+    """Масово змінює статуси замовлень в одній транзакції.
+
+    transitions — список (from_status, to_status, since, cutoff, notes):
+    замовлення зі статусом from_status, у яких колонка since < cutoff,
+    переходять у to_status. Для кожного правила — один UPDATE ... RETURNING
+    і один executemany в order_status_history.
+
+    Повертає список змінених (id, user_id) для кожного правила.
+    """
     with get_db_connection() as conn:
         c = conn.cursor()
-        search_term = f"%{query}%"
-        c.execute('''SELECT * FROM orders 
-                    WHERE topic LIKE ? OR subject LIKE ? OR requirements LIKE ?
-                    ORDER BY created_at DESC''', (search_term, search_term, search_term))
-        return c.fetchall()
+        now = datetime.now().isoformat()
+        changed = []
+        for from_status, to_status, since, cutoff, notes in transitions:
+            if since not in TRANSITION_SINCE_COLUMNS:
+                raise ValueError(f"Невідома колонка для переходу статусу: {since}")
+            c.execute(f'''UPDATE orders SET status = ?, updated_at = ?
+                         WHERE status = ? AND {since} < ?
+                         RETURNING id, user_id''', (to_status, now, from_status, cutoff))
+            rows = c.fetchall()
+            c.executemany('''INSERT INTO order_status_history
+                            (order_id, status, changed_by, changed_at, notes)
+                            VALUES (?, ?, NULL, ?, ?)''',
+                         [(row.id, to_status, now, notes) for row in rows])
+            changed.append(rows)
+        conn.commit()
+        return changed
+
+_SEARCH_TOKEN = re.compile(r'\w+')
+
+def _fts_query(text):
+    """Перетворює довільний текст на безпечний запит FTS5 (усі слова, з префіксом)."""
+    return ' '.join(f'"{token}"*' for token in _SEARCH_TOKEN.findall(text))
+
+def find_orders(query, limit=10, offset=0, columns=ORDER_SUMMARY_COLUMNS):
+    """Повнотекстовий пошук замовлень за темою, предметом і вимогами.
+
+    Результати впорядковані за BM25 (збіг у темі важить найбільше).
+    Повертає (rows, has_more).
+    """
+    match = _fts_query(query)
+    if not match:
+        return [], False
+    select = ', '.join(f'o.{column}' for column in _order_columns_sql(columns).split(', '))
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute(f'''SELECT {select} FROM orders_fts
+                     JOIN orders o ON o.id = orders_fts.rowid
+                     WHERE orders_fts MATCH ?
+                     ORDER BY bm25(orders_fts, 10.0, 5.0, 1.0)
+                     LIMIT ? OFFSET ?''', (match, limit + 1, offset))
+        rows = c.fetchall()
+    return rows[:limit], len(rows) > limit
+
+def rebuild_search_index():
+    """Перебудовує повнотекстовий індекс замовлень з таблиці orders."""
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO orders_fts (orders_fts) VALUES ('rebuild')")
 
 def get_order_by_num(order_num):
     with get_db_connection() as conn:
@@ -615,6 +1165,162 @@ def log_message(user_id, username, direction, text, chat_id=None, message_type='
                   (user_id, username, direction, text, chat_id, message_type))
         conn.commit()
 
+def add_audit_records(messages=(), support_logs=()):
+    """Пакетний запис журналів однією транзакцією (див. app.services.audit_log).
+
+    messages — кортежі (user_id, username, direction, text, chat_id, message_type, created_at);
+    support_logs — кортежі (user_id, admin_id, message, direction, created_at).
+    """
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        if messages:
+            c.executemany('''INSERT INTO messages (user_id, username, direction, text, chat_id, message_type, created_at)
+                             VALUES (?, ?, ?, ?, ?, ?, ?)''', messages)
+        if support_logs:
+            c.executemany('''INSERT INTO support_logs (user_id, admin_id, message, direction, created_at)
+                             VALUES (?, ?, ?, ?, ?)''', support_logs)
+
+
+# --- Користувачі ---
+def upsert_users(rows):
+    """Створює або оновлює користувачів одним executemany.
+
+    rows — кортежі (user_id, username, first_name, last_name, language_code, active_at).
+    Взаємодія з ботом знімає позначку is_blocked.
+    """
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.executemany('''INSERT INTO users
+                            (user_id, username, first_name, last_name, language_code,
+                             first_seen_at, last_active_at)
+                        VALUES (?, ?, ?, ?, ?, ?6, ?6)
+                        ON CONFLICT (user_id) DO UPDATE SET
+                            username = excluded.username,
+                            first_name = excluded.first_name,
+                            last_name = excluded.last_name,
+                            language_code = excluded.language_code,
+                            last_active_at = MAX(COALESCE(users.last_active_at, ''), excluded.last_active_at),
+                            is_blocked = 0,
+                            blocked_at = NULL''', rows)
+        conn.commit()
+
+def mark_users_blocked(user_ids):
+    """Позначає користувачів, які заблокували бота (їм більше нічого не відправляємо)."""
+    user_ids = list(user_ids)
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        now = datetime.now().isoformat()
+        c.executemany('''INSERT INTO users (user_id, first_seen_at, is_blocked, blocked_at)
+                        VALUES (?, ?2, 1, ?2)
+                        ON CONFLICT (user_id) DO UPDATE SET is_blocked = 1, blocked_at = ?2''',
+                     [(user_id, now) for user_id in user_ids])
+        conn.commit()
+
+def get_user(user_id):
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
+        return c.fetchone()
+
+def count_broadcast_recipients():
+    """Кількість користувачів, які не заблокували бота."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT COUNT(*) FROM users WHERE is_blocked = 0')
+        return c.fetchone()[0]
+
+# --- Розсилки ---
+def create_broadcast_job(admin_id, chat_id, payload_type, text=None, file_id=None):
+    """Створює завдання розсилки та список отримувачів в одній транзакції.
+
+    Отримувачі — усі користувачі з таблиці users, які не заблокували бота.
+    Повертає (job_id, total).
+    """
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        now = datetime.now().isoformat()
+        c.execute('''INSERT INTO broadcast_jobs
+                    (admin_id, chat_id, payload_type, text, file_id, status, created_at)
+                    VALUES (?, ?, ?, ?, ?, 'pending', ?)''',
+                 (admin_id, chat_id, payload_type, text, file_id, now))
+        job_id = c.lastrowid
+        c.execute('''INSERT INTO broadcast_deliveries (job_id, user_id)
+                    SELECT ?, user_id FROM users WHERE is_blocked = 0''', (job_id,))
+        total = c.rowcount
+        c.execute('UPDATE broadcast_jobs SET total = ? WHERE id = ?', (total, job_id))
+        conn.commit()
+        return job_id, total
+
+def get_broadcast_job(job_id):
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT * FROM broadcast_jobs WHERE id = ?', (job_id,))
+        return c.fetchone()
+
+def get_unfinished_broadcast_jobs():
+    """Розсилки, які треба (про)довжити: ще не завершені й не скасовані."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT * FROM broadcast_jobs
+                    WHERE status IN ('pending', 'running') ORDER BY id''')
+        return c.fetchall()
+
+def set_broadcast_progress_message(job_id, chat_id, message_id):
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute('''UPDATE broadcast_jobs SET chat_id = ?, progress_message_id = ?
+                    WHERE id = ?''', (chat_id, message_id, job_id))
+        conn.commit()
+
+def get_broadcast_batch(job_id, limit):
+    """Наступні limit отримувачів, яким розсилка ще не відправлялась."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute('''SELECT user_id FROM broadcast_deliveries
+                    WHERE job_id = ? AND status = 'pending'
+                    ORDER BY user_id LIMIT ?''', (job_id, limit))
+        return [row.user_id for row in c.fetchall()]
+
+def record_broadcast_results(job_id, results):
+    """Записує результати порції: results — список (user_id, 'sent'|'failed', помилка).
+
+    Статуси отримувачів і лічильники завдання оновлюються в одній транзакції.
+    """
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        now = datetime.now().isoformat()
+        c.executemany('''UPDATE broadcast_deliveries SET status = ?, error = ?, sent_at = ?
+                        WHERE job_id = ? AND user_id = ?''',
+                     [(status, error, now, job_id, user_id) for user_id, status, error in results])
+        sent = sum(1 for _, status, _ in results if status == 'sent')
+        c.execute('''UPDATE broadcast_jobs SET sent = sent + ?, failed = failed + ?
+                    WHERE id = ? RETURNING *''', (sent, len(results) - sent, job_id))
+        job = c.fetchone()
+        conn.commit()
+        return job
+
+def set_broadcast_status(job_id, status):
+    """Змінює статус розсилки (running / completed / cancelled) і повертає завдання.
+
+    Змінюється лише незавершена розсилка (pending / running): повертає None,
+    якщо її немає або вона вже завершена чи скасована — тож пізнє
+    "зупинити" не перетирає completed, а completed — cancelled.
+    """
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        now = datetime.now().isoformat()
+        if status == 'running':
+            c.execute('''UPDATE broadcast_jobs SET status = ?, started_at = COALESCE(started_at, ?)
+                        WHERE id = ? AND status IN ('pending', 'running') RETURNING *''',
+                      (status, now, job_id))
+        else:
+            c.execute('''UPDATE broadcast_jobs SET status = ?, finished_at = ?
+                        WHERE id = ? AND status IN ('pending', 'running') RETURNING *''',
+                      (status, now, job_id))
+        job = c.fetchone()
+        conn.commit()
+        return job
+
 
 # --- Викликати при старті бота ---
 if __name__ == '__main__':
@@ -3,7 +3,8 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from app.config import Config
-from app.db import get_orders
+from app.async_db import count_broadcast_recipients
+from app.services.broadcast import start_broadcast
 
 router = Router()
 
@@ -35,14 +36,13 @@ async def broadcast_message_handler(message: types.Message, state: FSMContext):
         
     await state.update_data(message_text=message.text)
     
-    orders = get_orders()
-    user_ids = set(order[1] for order in orders) # Assuming user_id is at index 1
+    recipients_count = await count_broadcast_recipients()
     
-    await state.update_data(user_ids_to_send=list(user_ids))
+    await state.update_data(recipients_count=recipients_count)
     
     sent = await message.answer(
         f"Повідомлення для розсилки:\n\n---\n{message.text}\n---\n\n"
-        f"Знайдено {len(user_ids)} унікальних користувачів для розсилки. "
+        f"Знайдено {recipients_count} унікальних користувачів для розсилки. "
         f"Надіслати? (так/ні)",
     )
     await state.update_data(last_bot_message_id=sent.message_id)
@@ -60,31 +60,18 @@ async def broadcast_confirmation_handler(message: types.Message, state: FSMConte
         await state.clear()
         return
 
-    user_ids = data.get("user_ids_to_send", [])
+    recipients_count = data.get("recipients_count", 0)
     message_text = data.get("message_text", "")
     
-    if not user_ids or not message_text:
+    if not recipients_count or not message_text:
         sent = await message.answer("Немає користувачів або тексту для розсилки. Скасовано.")
         await state.update_data(last_bot_message_id=sent.message_id)
         await state.clear()
         return
 
-    sent = await message.answer(f"Починаю розсилку для {len(user_ids)} користувачів...")
-    
-    successful_sends = 0
-    failed_sends = 0
-
-    for user_id in user_ids:
-        try:
-            await message.bot.send_message(user_id, message_text, parse_mode="HTML")
-            successful_sends += 1
-        except Exception:
-            failed_sends += 1
-            
-    sent = await message.answer(
-        f"Розсилку завершено.\n\n"
-        f"✅ Успішно надіслано: {successful_sends}\n"
-        f"❌ Не вдалося надіслати: {failed_sends}"
-    )
+    # Відправка йде у фоні; це повідомлення показує прогрес
+    sent = await message.answer(f"Починаю розсилку для {recipients_count} користувачів...")
+    job_id, total = await start_broadcast(message.bot, message.from_user.id, sent, 'text', text=message_text)
+    print(f"[INFO] /broadcast: admin {message.from_user.id} - job {job_id}, {total} users")
     await state.update_data(last_bot_message_id=sent.message_id)
-    await state.clear() 
\ No newline at end of file
+    await state.clear()
@@ -5,22 +5,39 @@ from aiogram.filters import Command
 from aiogram import Bot
 from app.config import Config, ORDER_STATUSES, STATUS_COLORS, SPAM_LIMITS
 # from app.handlers.feedback import request_feedback
-from collections import Counter
 from datetime import datetime, timedelta
-from app.db import (
-    get_orders, get_order_by_num, find_orders, update_order_status, 
-    add_promocode, get_promocode, get_promocode_usages, get_order_by_id,
-    create_backup, check_spam_protection, log_message
+from app.async_db import (
+    get_order_by_num, find_orders, update_order_status, 
+    get_promocode, get_promocodes, get_promocode_usages, get_order_by_id,
+    get_feedbacks,
+    get_orders_page, count_orders, count_broadcast_recipients,
+    get_order_stats, rebuild_order_stats
 )
+import asyncio
+import html
 import re
+from app.services.backup import run_backup, is_backup_running
+from app.services.export import build_export, is_export_running
+from app.services.promo_registry import promo_registry
+from app.services.broadcast import start_broadcast, cancel_broadcast, PAYLOAD_TYPES as BROADCAST_PAYLOAD_TYPES
 from aiogram.filters.command import CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from app.utils.validation import is_command
+from app.utils.deadlines import to_deadline_date
 
 router = Router()
 
+# За скільки днів рахувати "останні" замовлення у статистиці
+STATS_RECENT_DAYS = 7
+
+CABINET_PAGE_SIZE = 10
+ORDERS_PAGE_SIZE = 20
+SEARCH_PAGE_SIZE = 10
+# Як часто оновлювати повідомлення з прогресом бекапу (секунди)
+BACKUP_PROGRESS_INTERVAL = 1.5
+
 class BroadcastStates(StatesGroup):
     waiting_for_message = State()
     waiting_for_confirmation = State()
@@ -36,6 +53,96 @@ def get_admin_keyboard():
         ]
     )
 
+async def load_order_stats():
+    since = (datetime.now() - timedelta(days=STATS_RECENT_DAYS)).isoformat()
+    return await get_order_stats(since)
+
+def format_order_stats(stats):
+    """Загальна статистика і розподіл за статусами (для /stats і адмін-кабінету)."""
+    text = f"""
+📊 <b>Статистика бота</b>
+
+📈 <b>Загальна статистика:</b>
+• Всього замовлень: {stats.total_orders}
+• Загальна вартість: {stats.total_revenue} грн
+• За останні {STATS_RECENT_DAYS} днів: {stats.recent_orders}
+
+📋 <b>За статусами:</b>
+"""
+    for row in stats.by_status:
+        status_emoji = STATUS_COLORS.get(row.status, "⚪")
+        status_text = ORDER_STATUSES.get(row.status, row.status)
+        text += f"{status_emoji} {status_text}: {row.orders}\n"
+    return text
+
+def format_order_summary(order, show_user=False):
+    """Короткий опис замовлення для списків."""
+    status_emoji = STATUS_COLORS.get(order.status, "⚪")
+    status_text = ORDER_STATUSES.get(order.status, order.status)
+    text = f"{status_emoji} <b>#{order.id}</b> - {order.type_label}\n"
+    if show_user:
+        text += f"👤 {order.first_name} (@{order.username})\n"
+    text += f"📖 {order.topic[:50]}{'...' if len(order.topic) > 50 else ''}\n"
+    text += f"💰 {order.price} грн | 📅 {order.deadline}\n"
+    text += f"📊 Статус: {status_text}\n\n"
+    return text
+
+def get_page_keyboard(prefix, orders, has_prev, has_next):
+    """Кнопки "◀ / ▶" для сторінки замовлень; курсор — id крайнього замовлення."""
+    buttons = []
+    if has_prev:
+        buttons.append(InlineKeyboardButton(text="◀", callback_data=f"{prefix}:prev:{orders[0].id}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton(text="▶", callback_data=f"{prefix}:next:{orders[-1].id}"))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+
+def _page_flags(cursor, direction, has_more):
+    """Повертає (has_prev, has_next) для сторінки, отриманої з get_orders_page."""
+    if cursor is None:
+        return False, has_more
+    if direction == 'next':
+        return True, has_more
+    return has_more, True
+
+async def build_cabinet_page(user_id, cursor=None, direction='next'):
+    """Текст і клавіатура сторінки "Мої замовлення"; (None, None), якщо замовлень немає."""
+    orders, has_more = await get_orders_page(
+        user_id=user_id, cursor=cursor, direction=direction, limit=CABINET_PAGE_SIZE
+    )
+    if not orders:
+        return None, None
+    total = await count_orders(user_id=user_id)
+    text = f"📋 <b>Мої замовлення ({total}):</b>\n\n"
+    text += "".join(format_order_summary(order) for order in orders)
+    keyboard = get_page_keyboard("cabinet_page", orders, *_page_flags(cursor, direction, has_more))
+    return text, keyboard
+
+async def build_orders_page(cursor=None, direction='next'):
+    """Текст і клавіатура сторінки "Всі замовлення" для адміністратора."""
+    orders, has_more = await get_orders_page(cursor=cursor, direction=direction, limit=ORDERS_PAGE_SIZE)
+    if not orders:
+        return None, None
+    total = await count_orders()
+    text = f"📋 <b>Всі замовлення ({total}):</b>\n\n"
+    text += "".join(format_order_summary(order, show_user=True) for order in orders)
+    keyboard = get_page_keyboard("orders_page", orders, *_page_flags(cursor, direction, has_more))
+    return text, keyboard
+
+async def build_search_page(query, offset=0):
+    """Текст і клавіатура сторінки результатів пошуку (/find)."""
+    orders, has_more = await find_orders(query, limit=SEARCH_PAGE_SIZE, offset=offset)
+    if not orders:
+        return None, None
+    text = f"🔎 <b>Результати пошуку «{html.escape(query)}»:</b>\n\n"
+    text += "".join(format_order_summary(order, show_user=True) for order in orders)
+    buttons = []
+    if offset > 0:
+        buttons.append(InlineKeyboardButton(text="◀", callback_data=f"find_page:{max(offset - SEARCH_PAGE_SIZE, 0)}"))
+    if has_more:
+        buttons.append(InlineKeyboardButton(text="▶", callback_data=f"find_page:{offset + SEARCH_PAGE_SIZE}"))
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+    return text, keyboard
+
 @router.message(Command("cabinet"))
 async def cabinet_handler(message: types.Message, state: FSMContext):
     await state.update_data(last_user_message_id=message.message_id)
@@ -47,8 +154,8 @@ async def cabinet_handler(message: types.Message, state: FSMContext):
             await state.update_data(last_info_message_id=sent.message_id)
             return
         # Звичайний користувач
-        orders = get_orders(user_id=user_id)
-        if not orders:
+        text, keyboard = await build_cabinet_page(user_id)
+        if text is None:
             print(f"[INFO] /cabinet: user {user_id} - немає замовлень")
             sent = await message.answer(
                 "📋 <b>Мої замовлення</b>\n\n"
@@ -58,25 +165,24 @@ async def cabinet_handler(message: types.Message, state: FSMContext):
             )
             await state.update_data(last_info_message_id=sent.message_id)
             return
-        text = "📋 <b>Мої замовлення:</b>\n\n"
-        for order in orders[:10]:  # Показуємо останні 10
-            order_id, _, _, _, _, type_label, _, topic, _, deadline, _, _, _, price, status, created_at = order[:16]
-            status_emoji = STATUS_COLORS.get(status, "⚪")
-            status_text = ORDER_STATUSES.get(status, status)
-            text += f"{status_emoji} <b>#{order_id}</b> - {type_label}\n"
-            text += f"📖 {topic[:50]}{'...' if len(topic) > 50 else ''}\n"
-            text += f"💰 {price} грн | 📅 {deadline}\n"
-            text += f"📊 Статус: {status_text}\n\n"
-        if len(orders) > 10:
-            text += f"... та ще {len(orders) - 10} замовлень"
-        sent = await message.answer(text, parse_mode="HTML", reply_markup=None)
+        sent = await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
         await state.update_data(last_bot_message_id=sent.message_id)
-        print(f"[INFO] /cabinet: user {user_id} - показано {len(orders)} замовлень")
+        print(f"[INFO] /cabinet: user {user_id} - показано сторінку замовлень")
     except Exception as e:
         print(f"[ERROR] /cabinet: user {user_id} - {e}")
         sent = await message.answer("Сталася помилка при отриманні кабінету.")
         await state.update_data(last_bot_message_id=sent.message_id)
 
+@router.callback_query(lambda c: c.data and c.data.startswith("cabinet_page:"))
+async def cabinet_page_callback(callback: types.CallbackQuery):
+    _, direction, cursor = callback.data.split(":")
+    text, keyboard = await build_cabinet_page(callback.from_user.id, int(cursor), direction)
+    if text is None:
+        await callback.answer("Більше замовлень немає")
+        return
+    await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+    await callback.answer()
+
 @router.message(Command("cabinet_ad"))
 async def cabinet_admin_handler(message: types.Message):
     user_id = message.from_user.id
@@ -99,43 +205,12 @@ async def admin_stats_callback(callback: types.CallbackQuery):
         await callback.answer("Доступ заборонено")
         return
     
-    # Збираємо статистику
-    all_orders = get_orders()
-    total_orders = len(all_orders)
-    
-    # Статистика за статусами
-    status_counts = Counter(order[14] for order in all_orders)
-    
-    # Статистика за типами
-    type_counts = Counter(order[5] for order in all_orders)
-    
-    # Статистика за останні 7 днів
-    week_ago = datetime.now() - timedelta(days=7)
-    recent_orders = [order for order in all_orders 
-                    if datetime.fromisoformat(order[15]) > week_ago]
-    
-    # Загальна вартість
-    total_revenue = sum(order[13] for order in all_orders if order[13])
-    
-    stats_text = f"""
-📊 <b>Статистика бота</b>
-
-📈 <b>Загальна статистика:</b>
-• Всього замовлень: {total_orders}
-• Загальна вартість: {total_revenue} грн
-• За останні 7 днів: {len(recent_orders)}
-
-📋 <b>За статусами:</b>
-"""
-    
-    for status, count in status_counts.most_common():
-        status_emoji = STATUS_COLORS.get(status, "⚪")
-        status_text = ORDER_STATUSES.get(status, status)
-        stats_text += f"{status_emoji} {status_text}: {count}\n"
+    stats = await load_order_stats()
+    stats_text = format_order_stats(stats)
     
     stats_text += "\n📝 <b>За типами робіт:</b>\n"
-    for order_type, count in type_counts.most_common():
-        stats_text += f"• {order_type}: {count}\n"
+    for row in stats.by_type:
+        stats_text += f"• {row.type_label}: {row.orders}\n"
     
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
@@ -147,6 +222,90 @@ async def admin_stats_callback(callback: types.CallbackQuery):
     await callback.message.edit_text(stats_text, parse_mode="HTML", reply_markup=keyboard)
     await callback.answer()
 
+EXPORT_USAGE = (
+    "Фільтри експорту: /export [з дати] [по дату] [статус]\n"
+    "Наприклад: /export 01.09.2024 31.12.2024 completed"
+)
+
+def parse_export_args(args):
+    """Аргументи /export -> (date_from, date_to, status); ValueError, якщо не розібрано.
+
+    Дати — у тих самих форматах, що й дедлайн (ДД.ММ.РРРР, РРРР-ММ-ДД ...),
+    статус — ключ ORDER_STATUSES; порядок довільний.
+    """
+    dates, status = [], None
+    for token in (args or '').split():
+        if token in ORDER_STATUSES:
+            status = token
+            continue
+        parsed = to_deadline_date(token)
+        if parsed is None or len(dates) == 2:
+            raise ValueError(token)
+        dates.append(parsed)
+    date_from = dates[0] if dates else None
+    date_to = dates[1] if len(dates) > 1 else None
+    if date_from and date_to and date_from > date_to:
+        raise ValueError(f"{date_from} > {date_to}")
+    return date_from, date_to, status
+
+async def send_stats_export(message: types.Message, date_from=None, date_to=None, status=None):
+    """Формує архів експорту і надсилає його документом у чат message."""
+    if is_export_running():
+        await message.answer("Експорт уже виконується, зачекайте")
+        return
+    try:
+        document, counts = await build_export(date_from, date_to, status)
+    except Exception as e:
+        print(f"[ERROR] export_stats: {e}")
+        await message.answer(f"❌ <b>Помилка експорту:</b>\n{html.escape(str(e))}", parse_mode="HTML")
+        return
+    
+    filters = []
+    if date_from or date_to:
+        filters.append(f"📅 {date_from or '…'} — {date_to or '…'}")
+    if status:
+        filters.append(f"📋 {ORDER_STATUSES[status]}")
+    caption = (
+        "📊 <b>Експорт статистики</b>\n"
+        + ''.join(f"{line}\n" for line in filters)
+        + f"\nЗамовлень: {counts['orders']}\n"
+        f"Змін статусу: {counts['order_status_history']}\n"
+        f"Використань промокодів: {counts['promocode_usages']}"
+    )
+    if not filters:
+        caption += "\n\nФільтр за датами і статусом: /export"
+
+    try:
+        await message.answer_document(document, caption=caption, parse_mode="HTML")
+    finally:
+        document.file.close()
+    print(f"[INFO] export_stats: {counts}")
+
+@router.callback_query(lambda c: c.data == "export_stats")
+async def export_stats_callback(callback: types.CallbackQuery):
+    if callback.from_user.id not in Config.ADMIN_IDS:
+        await callback.answer("Доступ заборонено")
+        return
+    
+    await callback.answer("Готую експорт...")
+    await send_stats_export(callback.message)
+
+@router.message(Command("export"))
+async def export_handler(message: types.Message, command: CommandObject, state: FSMContext):
+    if message.from_user.id not in Config.ADMIN_IDS:
+        await message.answer("⛔️ Доступ лише для адміністратора", parse_mode="HTML")
+        return
+    
+    try:
+        date_from, date_to, status = parse_export_args(command.args)
+    except ValueError:
+        sent = await message.answer(
+            EXPORT_USAGE + "\n\nСтатуси: " + ", ".join(ORDER_STATUSES)
+        )
+        await state.update_data(last_info_message_id=sent.message_id)
+        return
+    await send_stats_export(message, date_from, date_to, status)
+
 @router.callback_query(lambda c: c.data == "admin_broadcast")
 async def admin_broadcast_callback(callback: types.CallbackQuery, state: FSMContext):
     if callback.from_user.id not in Config.ADMIN_IDS:
@@ -174,10 +333,15 @@ async def process_broadcast_message(message: types.Message, state: FSMContext):
         await message.answer("Розсилка скасована")
         return
     
-    # Зберігаємо повідомлення
+    if message.content_type not in BROADCAST_PAYLOAD_TYPES:
+        await message.answer("Цей тип повідомлення не підтримується. Надішліть текст, фото, відео або документ.")
+        return
+    
+    # Зберігаємо повідомлення; html_text — текст або підпис з форматуванням
+    # і екранованими <, &, бо розсилка відправляється з parse_mode="HTML"
     await state.update_data(
         message_type=message.content_type,
-        text=message.text if message.text else message.caption,
+        text=message.html_text or None,
         file_id=message.document.file_id if message.document else None,
         photo_id=message.photo[-1].file_id if message.photo else None,
         video_id=message.video.file_id if message.video else None
@@ -191,13 +355,14 @@ async def process_broadcast_message(message: types.Message, state: FSMContext):
         ]
     )
     
+    users_count = await count_broadcast_recipients()
     preview_text = f"""
 📢 <b>Попередній перегляд розсилки:</b>
 
-{message.text or message.caption or 'Медіа повідомлення'}
+{message.html_text or 'Медіа повідомлення'}
 
 ---
-Користувачів для розсилки: {len(set(order[1] for order in get_orders()))}
+Користувачів для розсилки: {users_count}
 """
     
     await message.answer(preview_text, parse_mode="HTML", reply_markup=keyboard)
@@ -209,41 +374,62 @@ async def confirm_broadcast_callback(callback: types.CallbackQuery, state: FSMCo
         await callback.answer("Доступ заборонено")
         return
     
-    # Отримуємо унікальних користувачів
-    orders = get_orders()
-    users = set(order[1] for order in orders)
-    
-    sent_count = 0
-    failed_count = 0
-    
-    for user_id in users:
-        try:
-            if data['message_type'] == 'text':
-                await callback.bot.send_message(user_id, data['text'], parse_mode="HTML")
-            elif data['message_type'] == 'document':
-                await callback.bot.send_document(user_id, data['file_id'], caption=data['text'])
-            elif data['message_type'] == 'photo':
-                await callback.bot.send_photo(user_id, data['photo_id'], caption=data['text'])
-            elif data['message_type'] == 'video':
-                await callback.bot.send_video(user_id, data['video_id'], caption=data['text'])
-            
-            sent_count += 1
-            
-        except Exception as e:
-            failed_count += 1
-            print(f"Помилка відправки користувачу {user_id}: {e}")
-    
-    await callback.message.edit_text(
-        f"✅ <b>Розсилка завершена!</b>\n\n"
-        f"📤 Відправлено: {sent_count}\n"
-        f"❌ Помилки: {failed_count}\n"
-        f"📊 Всього користувачів: {len(users)}",
-        parse_mode="HTML"
+    data = await state.get_data()
+    payload_type = data.get('message_type')
+    if payload_type not in BROADCAST_PAYLOAD_TYPES:
+        await callback.answer("Немає повідомлення для розсилки")
+        await state.clear()
+        return
+    file_id = {
+        'photo': data.get('photo_id'),
+        'document': data.get('file_id'),
+        'video': data.get('video_id'),
+    }.get(payload_type)
+    
+    # Відправка йде у фоні; це повідомлення стає індикатором прогресу
+    job_id, total = await start_broadcast(
+        callback.bot, callback.from_user.id, callback.message,
+        payload_type, text=data.get('text'), file_id=file_id
     )
+    print(f"[INFO] confirm_broadcast: admin {callback.from_user.id} - job {job_id}, {total} users")
     
     await state.clear()
+    await callback.answer("Розсилку запущено")
+
+@router.callback_query(lambda c: c.data == "cancel_broadcast")
+async def cancel_broadcast_callback(callback: types.CallbackQuery, state: FSMContext):
+    await state.clear()
+    await callback.message.edit_text("Розсилка скасована")
     await callback.answer()
 
+@router.callback_query(lambda c: c.data and c.data.startswith("broadcast_stop:"))
+async def broadcast_stop_callback(callback: types.CallbackQuery):
+    if callback.from_user.id not in Config.ADMIN_IDS:
+        await callback.answer("Доступ заборонено")
+        return
+    job_id = int(callback.data.split(":", 1)[1])
+    job = await cancel_broadcast(callback.bot, job_id)
+    if job is None:
+        # Кнопка зі старого повідомлення прогресу
+        await callback.answer("Розсилку вже завершено")
+        return
+    print(f"[INFO] broadcast_stop: admin {callback.from_user.id} - job {job_id}")
+    await callback.answer("Розсилку зупинено")
+
+def format_backup_progress(progress):
+    """Текст повідомлення про хід бекапу."""
+    if progress['stage'] == 'verify':
+        return "💾 <b>Бекап</b>\n\n🔍 Перевірка цілісності копії..."
+    if progress['stage'] == 'compress':
+        return "💾 <b>Бекап</b>\n\n🗜 Стиснення копії..."
+    total = progress['total']
+    percent = progress['done'] * 100 // total if total else 0
+    filled = percent // 10
+    return (
+        "💾 <b>Бекап</b>\n\n"
+        f"📋 Копіювання бази: {'▓' * filled}{'░' * (10 - filled)} {percent}%"
+    )
+
 @router.callback_query(lambda c: c.data == "admin_backup")
 async def admin_backup_callback(callback: types.CallbackQuery):
     if callback.from_user.id not in Config.ADMIN_IDS:
@@ -253,23 +439,44 @@ async def admin_backup_callback(callback: types.CallbackQuery):
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[[InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_admin")]]
     )
+    if is_backup_running():
+        await callback.answer("Бекап уже виконується, зачекайте")
+        return
+    await callback.answer("Створюю бекап...")
+    
+    # Бекап виконується в потоці БД; прогрес оновлюється з того потоку,
+    # а тут раз на BACKUP_PROGRESS_INTERVAL секунд показуємо його адміну
+    progress = {'stage': 'copy', 'done': 0, 'total': 0}
+    def on_progress(stage, done, total):
+        progress.update(stage=stage, done=done, total=total)
+    
+    task = asyncio.ensure_future(run_backup(progress=on_progress))
+    shown = None
     try:
-        backup_file = create_backup()
+        while True:
+            finished, _ = await asyncio.wait({task}, timeout=BACKUP_PROGRESS_INTERVAL)
+            if finished:
+                break
+            text = format_backup_progress(progress)
+            if text != shown:
+                await callback.message.edit_text(text, parse_mode="HTML")
+                shown = text
+        backup_file = task.result()
         await callback.message.edit_text(
             f"✅ <b>Бекап створено!</b>\n\n"
-            f"📁 Файл: {backup_file}\n"
+            f"📁 Файл: {html.escape(backup_file)}\n"
             f"📅 Час: {datetime.now().strftime('%d.%m.%Y %H:%M')}",
             parse_mode="HTML",
             reply_markup=keyboard
         )
+        print(f"[INFO] admin_backup: {backup_file}")
     except Exception as e:
+        print(f"[ERROR] admin_backup: {e}")
         await callback.message.edit_text(
-            f"❌ <b>Помилка створення бекапу:</b>\n{str(e)}",
+            f"❌ <b>Помилка створення бекапу:</b>\n{html.escape(str(e))}",
             parse_mode="HTML",
             reply_markup=keyboard
         )
-    
-    await callback.answer()
 
 @router.callback_query(lambda c: c.data == "admin_promos")
 async def admin_promos_callback(callback: types.CallbackQuery):
@@ -300,13 +507,7 @@ async def promo_stats_callback(callback: types.CallbackQuery):
         return
     
     # Отримуємо статистику промокодів
-    promocodes = []
-    import sqlite3
-    conn = sqlite3.connect('botdata.sqlite3')
-    c = conn.cursor()
-    c.execute('SELECT * FROM promocodes')
-    promocodes = c.fetchall()
-    conn.close()
+    promocodes = await get_promocodes()
     
     if not promocodes:
         await callback.message.edit_text(
@@ -363,33 +564,69 @@ async def back_to_admin_callback(callback: types.CallbackQuery):
 # Інші обробники залишаються без змін
 @router.message(Command("orders"))
 async def orders_handler(message: types.Message, state: FSMContext):
-    data = await state.get_data()
-    orders = get_orders()
+    text, keyboard = await build_orders_page()
     
-    if not orders:
+    if text is None:
         sent = await message.answer("Замовлень не знайдено.")
         await state.update_data(last_info_message_id=sent.message_id)
         return
     
-    text = f"📋 <b>Всі замовлення ({len(orders)}):</b>\n\n"
+    sent = await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+    await state.update_data(last_info_message_id=sent.message_id)
+
+@router.callback_query(lambda c: c.data and c.data.startswith("orders_page:"))
+async def orders_page_callback(callback: types.CallbackQuery):
+    if callback.from_user.id not in Config.ADMIN_IDS:
+        await callback.answer("Доступ заборонено")
+        return
     
-    for order in orders[:20]:  # Показуємо перші 20
-        order_id, user_id, first_name, username, _, type_label, _, topic, _, deadline, _, _, _, price, status, created_at = order[:16]
-        
-        status_emoji = STATUS_COLORS.get(status, "⚪")
-        status_text = ORDER_STATUSES.get(status, status)
-        
-        text += f"{status_emoji} <b>#{order_id}</b> - {type_label}\n"
-        text += f"👤 {first_name} (@{username})\n"
-        text += f"📖 {topic[:50]}{'...' if len(topic) > 50 else ''}\n"
-        text += f"💰 {price} грн | 📅 {deadline}\n"
-        text += f"📊 Статус: {status_text}\n\n"
-    
-    if len(orders) > 20:
-        text += f"... та ще {len(orders) - 20} замовлень"
-    sent = await message.answer(text, parse_mode="HTML")
+    _, direction, cursor = callback.data.split(":")
+    text, keyboard = await build_orders_page(int(cursor), direction)
+    if text is None:
+        await callback.answer("Більше замовлень немає")
+        return
+    await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+    await callback.answer()
+
+@router.message(Command("find"))
+async def find_handler(message: types.Message, command: CommandObject, state: FSMContext):
+    if message.from_user.id not in Config.ADMIN_IDS:
+        await message.answer("⛔️ Доступ лише для адміністратора", parse_mode="HTML")
+        return
+    
+    if not command.args:
+        sent = await message.answer("Використання: /find <текст для пошуку>")
+        await state.update_data(last_info_message_id=sent.message_id)
+        return
+    
+    query = command.args.strip()
+    await state.update_data(find_query=query)
+    text, keyboard = await build_search_page(query)
+    if text is None:
+        sent = await message.answer(f"За запитом «{html.escape(query)}» нічого не знайдено.", parse_mode="HTML")
+    else:
+        sent = await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
     await state.update_data(last_info_message_id=sent.message_id)
 
+@router.callback_query(lambda c: c.data and c.data.startswith("find_page:"))
+async def find_page_callback(callback: types.CallbackQuery, state: FSMContext):
+    if callback.from_user.id not in Config.ADMIN_IDS:
+        await callback.answer("Доступ заборонено")
+        return
+    
+    data = await state.get_data()
+    query = data.get('find_query')
+    if not query:
+        await callback.answer("Пошук застарів, повторіть /find")
+        return
+    offset = int(callback.data.split(":")[1])
+    text, keyboard = await build_search_page(query, offset)
+    if text is None:
+        await callback.answer("Більше результатів немає")
+        return
+    await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+    await callback.answer()
+
 @router.message(Command("order"))
 async def order_detail_handler(message: types.Message, command: CommandObject, state: FSMContext):
     if not command.args:
@@ -399,7 +636,7 @@ async def order_detail_handler(message: types.Message, command: CommandObject, s
     
     try:
         order_num = int(command.args)
-        order_data = get_order_by_id(order_num)
+        order_data = await get_order_by_id(order_num)
         
         if not order_data:
             sent = await message.answer(f"Замовлення #{order_num} не знайдено.")
@@ -410,39 +647,39 @@ async def order_detail_handler(message: types.Message, command: CommandObject, s
         files = order_data['files']
         status_history = order_data['status_history']
         
-        order_id, user_id, first_name, username, phone, type_label, order_type, topic, subject, deadline, volume, requirements, files_json, price, status, created_at, updated_at, confirmed_at, manager_id, notes = order
-        
-        status_emoji = STATUS_COLORS.get(status, "⚪")
-        status_text = ORDER_STATUSES.get(status, status)
+        order_id = order.id
+        user_id = order.user_id
+        status_emoji = STATUS_COLORS.get(order.status, "⚪")
+        status_text = ORDER_STATUSES.get(order.status, order.status)
         
         text = f"""
 📋 <b>Замовлення #{order_id}</b>
 
 👤 <b>Користувач:</b>
-• Ім'я: {first_name}
-• Username: @{username}
+• Ім'я: {order.first_name}
+• Username: @{order.username}
 • ID: {user_id}
-• Телефон: {phone}
+• Телефон: {order.phone_number}
 
 📝 <b>Деталі замовлення:</b>
-• Тип: {type_label}
-• Тема: {topic}
-• Предмет: {subject}
-• Термін: {deadline}
-• Обсяг: {volume}
-• Вимоги: {requirements}
+• Тип: {order.type_label}
+• Тема: {order.topic}
+• Предмет: {order.subject}
+• Термін: {order.deadline}
+• Обсяг: {order.volume}
+• Вимоги: {order.requirements}
 
 💰 <b>Фінанси:</b>
-• Ціна: {price} грн
+• Ціна: {order.price} грн
 • Статус: {status_emoji} {status_text}
 
 📎 <b>Файли:</b> {len(files)} шт.
 
 📅 <b>Дати:</b>
-• Створено: {created_at[:10]}
-• Оновлено: {updated_at[:10] if updated_at else 'Ні'}
+• Створено: {order.created_at[:10]}
+• Оновлено: {order.updated_at[:10] if order.updated_at else 'Ні'}
 
-📝 <b>Примітки:</b> {notes or 'Немає'}
+📝 <b>Примітки:</b> {order.notes or 'Немає'}
 """
         
         # Клавіатура для зміни статусу
@@ -480,7 +717,7 @@ async def set_status_handler(message: types.Message, command: CommandObject, sta
             await state.update_data(last_info_message_id=sent.message_id)
             return
         
-        update_order_status(order_id, new_status, message.from_user.id, "Змінено через команду")
+        await update_order_status(order_id, new_status, message.from_user.id, "Змінено через команду")
         
         sent = await message.answer(f"✅ Статус замовлення #{order_id} змінено на '{ORDER_STATUSES[new_status]}'")
         await state.update_data(last_info_message_id=sent.message_id)
@@ -491,42 +728,31 @@ async def set_status_handler(message: types.Message, command: CommandObject, sta
 
 @router.message(Command("stats"))
 async def stats_handler(message: types.Message, state: FSMContext):
-    orders = get_orders()
+    stats = await load_order_stats()
     
-    if not orders:
+    if not stats.total_orders:
         sent = await message.answer("Статистика недоступна - немає замовлень.")
         await state.update_data(last_info_message_id=sent.message_id)
         return
     
-    # Базова статистика
-    total_orders = len(orders)
-    total_revenue = sum(order[13] for order in orders if order[13])
-    
-    # Статистика за статусами
-    status_counts = Counter(order[14] for order in orders)
+    text = format_order_stats(stats)
     
-    # Статистика за останні 7 днів
-    week_ago = datetime.now() - timedelta(days=7)
-    recent_orders = [order for order in orders 
-                    if datetime.fromisoformat(order[15]) > week_ago]
-    
-    text = f"""
-📊 <b>Статистика бота</b>
-
-📈 <b>Загальна статистика:</b>
-• Всього замовлень: {total_orders}
-• Загальна вартість: {total_revenue} грн
-• За останні 7 днів: {len(recent_orders)}
+    sent = await message.answer(text, parse_mode="HTML")
+    await state.update_data(last_info_message_id=sent.message_id)
 
-📋 <b>За статусами:</b>
-"""
-    
-    for status, count in status_counts.most_common():
-        status_emoji = STATUS_COLORS.get(status, "⚪")
-        status_text = ORDER_STATUSES.get(status, status)
-        text += f"{status_emoji} {status_text}: {count}\n"
+@router.message(Command("rebuild_stats"))
+async def rebuild_stats_handler(message: types.Message, state: FSMContext):
+    if message.from_user.id not in Config.ADMIN_IDS:
+        await message.answer("⛔️ Доступ лише для адміністратора", parse_mode="HTML")
+        return
     
-    sent = await message.answer(text, parse_mode="HTML")
+    mismatched = await rebuild_order_stats()
+    if mismatched:
+        print(f"[ERROR] /rebuild_stats: {mismatched} рядків статистики розходились з orders")
+        text = f"⚠️ Статистику перераховано. Виправлено розбіжностей: {mismatched}"
+    else:
+        text = "✅ Статистику перераховано, розбіжностей немає."
+    sent = await message.answer(text)
     await state.update_data(last_info_message_id=sent.message_id)
 
 @router.message(Command("addpromo"))
@@ -544,7 +770,7 @@ async def add_promo_handler(message: types.Message, command: CommandObject, stat
         usage_limit = int(args[3])
         expires_at = args[4] if len(args) > 4 else None
         
-        add_promocode(code, discount_type, discount_value, usage_limit, expires_at)
+        await promo_registry.add(code, discount_type, discount_value, usage_limit, expires_at)
         
         sent = await message.answer(f"✅ Промокод {code} додано!")
         await state.update_data(last_info_message_id=sent.message_id)
@@ -555,13 +781,7 @@ async def add_promo_handler(message: types.Message, command: CommandObject, stat
 
 @router.message(Command("promos"))
 async def promos_handler(message: types.Message, state: FSMContext):
-    promocodes = []
-    import sqlite3
-    conn = sqlite3.connect('botdata.sqlite3')
-    c = conn.cursor()
-    c.execute('SELECT * FROM promocodes')
-    promocodes = c.fetchall()
-    conn.close()
+    promocodes = await get_promocodes()
     
     if not promocodes:
         sent = await message.answer("Промокодів не знайдено.")
@@ -587,13 +807,7 @@ async def promos_handler(message: types.Message, state: FSMContext):
 
 @router.message(Command("feedbacks"))
 async def feedbacks_handler(message: types.Message, state: FSMContext):
-    feedbacks = []
-    import sqlite3
-    conn = sqlite3.connect('botdata.sqlite3')
-    c = conn.cursor()
-    c.execute('SELECT * FROM feedbacks ORDER BY created_at DESC')
-    feedbacks = c.fetchall()
-    conn.close()
+    feedbacks = await get_feedbacks()
     
     if not feedbacks:
         sent = await message.answer("Відгуків не знайдено.")
@@ -4,7 +4,7 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 import logging
 from aiogram.fsm.context import FSMContext
 from app.utils.validation import is_command
-from app.db import log_message
+from app.services.audit_log import log_message
 
 # Налаштування логування
 logging.basicConfig(level=logging.INFO)
@@ -45,11 +45,12 @@ def get_faq_keyboard():
 
 @router.message(Command("faq"))
 async def faq_handler(message: types.Message, state: FSMContext):
+    user_id = message.from_user.id
     try:
         sent = await message.answer("Часті запитання:", reply_markup=get_faq_keyboard())
         await state.update_data(last_bot_message_id=sent.message_id)
         print(f"[INFO] /faq: user {user_id} - faq sent")
-        log_message(user_id, message.from_user.username, 'user', message.text, message.chat.id)
+        await log_message(user_id, message.from_user.username, 'user', message.text, message.chat.id)
     except Exception as e:
         print(f"[ERROR] /faq: user {user_id} - {e}")
         sent = await message.answer("Вибачте, сталася помилка. Спробуйте пізніше.")
@@ -67,7 +68,7 @@ async def faq_back_callback(callback: types.CallbackQuery, state: FSMContext):
         logger.info(f"[FAQ BACK] Sent new FAQ message after back, message_id={sent.message_id}")
         await state.update_data(last_info_message_id=sent.message_id)
         await callback.answer()
-        log_message(user_id, callback.from_user.username, 'user', callback.data, callback.message.chat.id)
+        await log_message(user_id, callback.from_user.username, 'user', callback.data, callback.message.chat.id)
     except Exception as e:
         logger.error(f"Error in FAQ back callback: {str(e)}")
         await callback.bot.send_message(callback.message.chat.id, f"Вибачте, сталася помилка. {e}")
@@ -88,7 +89,7 @@ async def faq_callback_handler(callback: types.CallbackQuery, state: FSMContext)
             sent = await callback.message.answer(answer, parse_mode="HTML", reply_markup=keyboard)
             await state.update_data(last_bot_message_id=sent.message_id)
             logger.info(f"FAQ answer sent for key: {key}")
-            log_message(callback.from_user.id, callback.from_user.username, 'user', callback.data, callback.message.chat.id)
+            await log_message(callback.from_user.id, callback.from_user.username, 'user', callback.data, callback.message.chat.id)
         await callback.answer()
     except Exception as e:
         logger.error(f"Error in FAQ callback handler: {str(e)}")
@@ -5,7 +5,8 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from app.config import Config
-from app.db import add_feedback, get_feedbacks, log_message
+from app.async_db import add_feedback, get_feedbacks
+from app.services.audit_log import log_message
 from app.utils.validation import is_command
 
 router = Router()
@@ -35,7 +36,7 @@ async def feedback_start(message: types.Message, state: FSMContext):
     try:
         sent = await message.answer("Залиште, будь ласка, свій відгук про виконане замовлення. Ви можете написати текст і/або оцінку від 1 до 5 зірок (наприклад: 5 ⭐️)")
         await state.update_data(last_bot_message_id=sent.message_id)
-        log_message(user_id, message.from_user.username, 'user', message.text, message.chat.id)
+        await log_message(user_id, message.from_user.username, 'user', message.text, message.chat.id)
         print(f"[INFO] /feedback: user {user_id} - feedback request sent")
     except Exception as e:
         print(f"[ERROR] /feedback: user {user_id} - {e}")
@@ -45,7 +46,7 @@ async def feedback_start(message: types.Message, state: FSMContext):
 @router.message(FeedbackStates.waiting_for_feedback)
 async def process_feedback(message: types.Message, state: FSMContext):
     await state.update_data(last_user_message_id=message.message_id)
-    log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
+    await log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
     if is_command(message.text):
         return False
     try:
@@ -62,7 +63,7 @@ async def process_feedback(message: types.Message, state: FSMContext):
         "text": message.text,
         "stars": int(''.join([c for c in message.text if c.isdigit()]) or 0),
     }
-    add_feedback(feedback)
+    await add_feedback(feedback)
     sent = await message.answer("Дякуємо за ваш відгук!")
     await state.update_data(last_info_message_id=sent.message_id)
     await state.clear()
@@ -75,7 +76,7 @@ async def feedbacks_admin(message: types.Message):
             await message.answer("⛔️ Тільки адміністратор може переглядати відгуки.")
             print(f"[ERROR] /feedbacks: user {user_id} - not admin")
             return
-        feedbacks = get_feedbacks()
+        feedbacks = await get_feedbacks()
         if not feedbacks:
             await message.answer("Відгуків ще немає.")
             print(f"[INFO] /feedbacks: user {user_id} - no feedbacks")
@@ -3,7 +3,7 @@ from aiogram.filters import Command
 from app.config import Config
 from aiogram.fsm.context import FSMContext
 from app.utils.validation import is_command
-from app.db import log_message
+from app.services.audit_log import log_message
 
 router = Router()
 
@@ -27,9 +27,12 @@ async def help_handler(message: types.Message, state: FSMContext):
             text += (
                 "\n<b>Для адміністраторів:</b>\n"
                 "/orders — Всі замовлення\n"
+                "/find [текст] — Пошук замовлень за темою, предметом і вимогами\n"
                 "/order_[номер] — Переглянути деталі замовлення (наприклад: /order_5)\n"
                 "/setstatus_[номер]_[статус] — Змінити статус замовлення (наприклад: /setstatus_5_done)\n"
                 "/stats — Статистика\n"
+                "/rebuild_stats — Перерахувати статистику з замовлень\n"
+                "/export [з дати] [по дату] [статус] — Експорт замовлень у CSV (zip)\n"
                 "/addpromo_[код]_[тип]_[значення]_[ліміт] — Додати промокод (наприклад: /addpromo_SUMMER2024_percent_10_100)\n"
                 "/promos — Статистика промокодів\n"
                 "/feedbacks — Всі відгуки\n"
@@ -2,10 +2,14 @@ from aiogram import types, Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import Command
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardRemove
-from app.config import ORDER_TYPE_PRICES, Config, ORDER_STATUSES, SPAM_LIMITS, MAX_FILES_PER_ORDER, ALLOWED_FILE_TYPES
-from app.db import add_order, get_promocode, is_promocode_valid, use_promocode, update_order, get_order_by_id, check_spam_protection, add_referral_bonus, get_referrals, log_message
+from app.config import ORDER_TYPE_PRICES, Config, ORDER_STATUSES, MAX_FILES_PER_ORDER, ALLOWED_FILE_TYPES
+from app.db import is_promocode_valid
+from app.async_db import add_order, update_order, get_order_by_id, add_referral_bonus, get_referrals
+from app.services.audit_log import log_message
+from app.services.promo_registry import promo_registry
+import html
 import json
 import re
 from app.handlers.faq import faq_handler
@@ -14,6 +18,7 @@ from app.handlers.help import help_handler
 from app.handlers.prices import prices_handler
 from app.handlers.start import start_handler
 from app.utils.validation import validate_topic, validate_subject, validate_deadline, validate_volume, validate_requirements, validate_promocode, COMMAND_INPUT, is_command
+from app.utils.deadlines import parse_deadline
 
 router = Router()
 
@@ -31,6 +36,17 @@ class OrderStates(StatesGroup):
     editing_order = State()
 
 
+def get_urgency(deadline_str) -> tuple[float, str]:
+    """Множник терміновості та його підпис для формули ціни."""
+    deadline_date = parse_deadline(deadline_str)
+    if deadline_date:
+        days_to_deadline = (datetime.combine(deadline_date, time()) - datetime.now()).days
+        if days_to_deadline < 3:
+            return 1.5, ' × 1.5 (терміново <3 днів)'
+        if days_to_deadline < 7:
+            return 1.25, ' × 1.25 (терміново <7 днів)'
+    return 1.0, ''
+
 def calculate_price(data: dict) -> tuple[float, float]:
     """Розраховує вартість замовлення на основі введених даних."""
     order_type = data.get("order_type")
@@ -53,29 +69,14 @@ def calculate_price(data: dict) -> tuple[float, float]:
     elif "per_work" in price_info:
         total_price += volume * float(price_info["per_work"])
 
-    try:
-        # Спроба розпарсити різні формати дати
-        parsed_date = None
-        for fmt in ["%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y"]:
-             try:
-                 parsed_date = datetime.strptime(deadline_str, fmt)
-                 break
-             except ValueError:
-                 continue
-        
-        if parsed_date:
-            days_to_deadline = (parsed_date - datetime.now()).days
-            if days_to_deadline < 3:
-                total_price *= 1.5
-            elif days_to_deadline < 7:
-                total_price *= 1.25
-    except TypeError:
-        pass
+    urgency_mult, _ = get_urgency(deadline_str)
+    total_price *= urgency_mult
 
     discount = 0.0
     if promocode_data:
-        promo_type = promocode_data[2]
-        promo_value = float(promocode_data[3])
+        # Рядок db.get_promocode: 0:code, 1:discount_type, 2:discount_value, ...
+        promo_type = promocode_data[1]
+        promo_value = float(promocode_data[2])
         if promo_type == 'percent':
             discount = total_price * (promo_value / 100)
         elif promo_type == 'fixed':
@@ -128,7 +129,7 @@ def get_progress_bar(current_step, total_steps):
 @router.message(Command("order"))
 @router.message(F.text == "📝 Нове замовлення")
 async def order_handler(message: types.Message, state: FSMContext):
-    log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
+    await log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
     current_state = await state.get_state()
     if current_state and current_state.startswith("OrderStates:"):
         # Відновити діалог з того місця, де зупинився користувач
@@ -201,15 +202,7 @@ async def order_handler(message: types.Message, state: FSMContext):
     # Якщо state немає або не OrderStates — почати нове замовлення
     user_id = message.from_user.id
     try:
-        if not check_spam_protection(message.from_user.id, 'order_creation', 
-                                    SPAM_LIMITS['order_creation']['limit'], 
-                                    SPAM_LIMITS['order_creation']['window']):
-            data = await state.get_data()
-            sent = await message.answer("⚠️ Занадто багато замовлень. Спробуйте пізніше.")
-            await state.update_data(last_info_message_id=sent.message_id)
-            print(f"[ERROR] /order: user {user_id} - spam protection triggered")
-            return
-        
+        # Ліміт order_creation перевіряє SpamProtectionMiddleware
         await state.clear()
         keyboard = InlineKeyboardMarkup(
             inline_keyboard=[
@@ -224,6 +217,8 @@ async def order_handler(message: types.Message, state: FSMContext):
             reply_markup=keyboard
         )
         await state.update_data(last_bot_message_id=sent.message_id)
+        # Вибір типу з цього меню продовжує замовлення, а не починає нове
+        await state.set_state(OrderStates.waiting_for_type)
         print(f"[INFO] /order: user {user_id} - order menu sent")
     except Exception as e:
         sent = await message.answer("Сталася помилка при створенні замовлення.")
@@ -254,7 +249,7 @@ async def order_type_callback(callback: types.CallbackQuery, state: FSMContext):
 @router.message(OrderStates.waiting_for_topic)
 async def process_topic(message: types.Message, state: FSMContext):
     await state.update_data(last_user_message_id=message.message_id)
-    log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
+    await log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
     if is_command(message.text):
         if message.text == '/order' or message.text == '/start':
             await state.clear()
@@ -310,7 +305,7 @@ async def process_topic(message: types.Message, state: FSMContext):
 @router.message(OrderStates.waiting_for_subject)
 async def process_subject(message: types.Message, state: FSMContext):
     await state.update_data(last_user_message_id=message.message_id)
-    log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
+    await log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
     if is_command(message.text):
         # Очищати стан лише якщо це /order або /start
         if message.text == '/order' or message.text == '/start':
@@ -357,7 +352,7 @@ async def process_subject(message: types.Message, state: FSMContext):
 @router.message(OrderStates.waiting_for_deadline)
 async def process_deadline(message: types.Message, state: FSMContext):
     await state.update_data(last_user_message_id=message.message_id)
-    log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
+    await log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
     if is_command(message.text):
         # Очищати стан лише якщо це /order або /start
         if message.text == '/order' or message.text == '/start':
@@ -408,7 +403,7 @@ async def process_deadline(message: types.Message, state: FSMContext):
 @router.message(OrderStates.waiting_for_volume)
 async def process_volume(message: types.Message, state: FSMContext):
     await state.update_data(last_user_message_id=message.message_id)
-    log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
+    await log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
     if is_command(message.text):
         # Очищати стан лише якщо це /order або /start
         if message.text == '/order' or message.text == '/start':
@@ -469,7 +464,7 @@ async def process_volume(message: types.Message, state: FSMContext):
 @router.message(OrderStates.waiting_for_requirements)
 async def process_requirements(message: types.Message, state: FSMContext):
     await state.update_data(last_user_message_id=message.message_id)
-    log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
+    await log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
     if is_command(message.text):
         # Очищати стан лише якщо це /order або /start
         if message.text == '/order' or message.text == '/start':
@@ -522,7 +517,7 @@ async def process_requirements(message: types.Message, state: FSMContext):
 
 @router.message(OrderStates.waiting_for_files)
 async def process_files_choice(message: types.Message, state: FSMContext):
-    log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
+    await log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
 
     if message.text == "🔙 Назад":
         await state.set_state(OrderStates.waiting_for_requirements)
@@ -679,7 +674,7 @@ async def go_to_promocode_step(message: types.Message, state: FSMContext):
 @router.message(OrderStates.waiting_for_promocode)
 async def process_promocode_input(message: types.Message, state: FSMContext):
     await state.update_data(last_user_message_id=message.message_id)
-    log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
+    await log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
     if is_command(message.text):
         # Очищати стан лише якщо це /order або /start
         if message.text == '/order' or message.text == '/start':
@@ -746,18 +741,25 @@ async def process_promocode_input(message: types.Message, state: FSMContext):
         await state.update_data(last_info_message_id=prompt_message.message_id, error_message_id=prompt_message.message_id)
         return
 
-    promo_data = get_promocode(promocode)
+    promo_data = await promo_registry.get(promocode)
+    data = await state.get_data()
+    # Мінімальна сума перевіряється за ціною без знижки
+    full_price, _ = calculate_price({**data, 'promocode': None})
     
-    if not promo_data or not is_promocode_valid(promo_data[0]):
-        prompt_message = await bot.send_message(chat_id, "⚠️ Невірний або недійсний промокод. Спробуйте ще раз або натисніть 'Без промокоду'")
+    if not promo_data:
+        error_text = "⚠️ Невірний або недійсний промокод. Спробуйте ще раз або натисніть 'Без промокоду'"
+    else:
+        is_valid, reason = is_promocode_valid(promo_data, message.from_user.id, full_price)
+        error_text = None if is_valid else f"⚠️ {reason}. Спробуйте інший промокод або натисніть 'Без промокоду'"
+    if error_text:
+        prompt_message = await bot.send_message(chat_id, error_text)
         await state.update_data(last_bot_message_id=prompt_message.message_id, error_message_id=prompt_message.message_id)
         return
     
     await state.update_data(promocode=promo_data)
     
     # Розраховуємо ціну зі знижкою
-    data = await state.get_data()
-    price, discount = calculate_price(data)
+    price, discount = calculate_price({**data, 'promocode': promo_data})
     await state.update_data(price=price, discount=discount)
 
     await show_order_summary(message, state)
@@ -784,26 +786,7 @@ async def get_summary_text_and_keyboard(state: FSMContext):
     base_plus_units = base + (per_unit * volume)
     # Множник терміновості
     deadline_str = data.get('deadline', '')
-    urgency_mult = 1.0
-    urgency_label = ''
-    try:
-        parsed_date = None
-        for fmt in ["%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y"]:
-            try:
-                parsed_date = datetime.strptime(deadline_str, fmt)
-                break
-            except ValueError:
-                continue
-        if parsed_date:
-            days_to_deadline = (parsed_date - datetime.now()).days
-            if days_to_deadline < 3:
-                urgency_mult = 1.5
-                urgency_label = ' × 1.5 (терміново <3 днів)'
-            elif days_to_deadline < 7:
-                urgency_mult = 1.25
-                urgency_label = ' × 1.25 (терміново <7 днів)'
-    except Exception:
-        pass
+    urgency_mult, urgency_label = get_urgency(deadline_str)
     price_before_discount = base_plus_units * urgency_mult
     # Знижка
     discount = float(data.get('discount', 0))
@@ -869,7 +852,7 @@ async def show_order_summary(message: types.Message, state: FSMContext, should_e
 async def confirm_order_callback(callback: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
     
-    order_id = add_order(
+    order_id = await add_order(
         user_id=callback.from_user.id,
         first_name=callback.from_user.first_name,
         username=callback.from_user.username,
@@ -885,19 +868,31 @@ async def confirm_order_callback(callback: types.CallbackQuery, state: FSMContex
         files=data.get('files', [])
     )
     
+    price = data['price']
+    promo_note = ""
     if data.get('promocode'):
-        use_promocode(data['promocode'][0], callback.from_user.id, order_id, data['discount'])
-    
-    referrals = get_referrals(callback.from_user.id)
-    if referrals and data['price'] >= Config.REFERRAL_MIN_ORDER_AMOUNT:
+        code = data['promocode'][0]
+        full_price = price + data.get('discount', 0)
+        discount = await promo_registry.redeem(code, callback.from_user.id, order_id, full_price)
+        if discount is None:
+            # Ліміт вичерпали інші замовлення, поки користувач підтверджував
+            price = full_price
+            await update_order(order_id, price=price)
+            promo_note = (f"\n\n⚠️ Промокод {html.escape(code)} уже вичерпано, "
+                          f"замовлення створено без знижки: {price:.2f} грн")
+            print(f"[INFO] confirm_order: промокод {code} вичерпано, замовлення {order_id} без знижки")
+    
+    referrals = await get_referrals(callback.from_user.id)
+    if referrals and price >= Config.REFERRAL_MIN_ORDER_AMOUNT:
         for ref in referrals:
-            bonus_amount = data['price'] * Config.REFERRAL_BONUS_PERCENT // 100
-            add_referral_bonus(ref[0], callback.from_user.id, order_id, bonus_amount)
+            bonus_amount = price * Config.REFERRAL_BONUS_PERCENT // 100
+            await add_referral_bonus(ref[0], callback.from_user.id, order_id, bonus_amount)
     
     sent = await callback.message.answer(
         f"✅ <b>Замовлення успішно створено!</b>\n\n"
         f"Наш менеджер зв'яжеться з вами найближчим часом.\n"
-        f"Для перегляду замовлення використайте /cabinet",
+        f"Для перегляду замовлення використайте /cabinet"
+        f"{promo_note}",
         parse_mode="HTML",
         reply_markup=get_main_menu_keyboard()
     )
@@ -962,7 +957,7 @@ async def process_edit_input(message: types.Message, state: FSMContext):
     error_message_id = data.get('error_message_id')
     bot = message.bot
     chat_id = message.chat.id
-    log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
+    await log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
     if is_command(message.text):
         # Очищати стан лише якщо це /order або /start
         if message.text == '/order' or message.text == '/start':
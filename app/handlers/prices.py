@@ -3,7 +3,7 @@ from aiogram.filters import Command
 from app.config import ORDER_TYPE_PRICES
 from aiogram.fsm.context import FSMContext
 from app.utils.validation import is_command
-from app.db import log_message
+from app.services.audit_log import log_message
 
 router = Router()
 
@@ -1,8 +1,10 @@
-from aiogram import types, Router
-from aiogram.filters import Command
+from aiogram import F, types, Router
+from aiogram.filters import Command, ChatMemberUpdatedFilter, KICKED
 from aiogram.fsm.context import FSMContext
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from app.db import add_referral, get_referrals, log_message
+from app.async_db import add_referral, get_referrals
+from app.services.audit_log import log_message
+from app.services.user_tracker import user_tracker
 from app.utils.validation import is_command
 
 router = Router()
@@ -27,7 +29,7 @@ async def start_handler(message: types.Message, state: FSMContext):
             try:
                 ref_id = int(args[1][3:])
                 if ref_id != user_id:
-                    add_referral(ref_id, user_id)
+                    await add_referral(ref_id, user_id)
                     print(f"[INFO] /start: user {user_id} - referral from {ref_id}")
             except Exception as e:
                 print(f"[ERROR] /start: user {user_id} - referral parse error: {e}")
@@ -94,7 +96,7 @@ async def myref_handler(message: types.Message):
     user_id = message.from_user.id
     try:
         ref_link = f"https://t.me/{(await message.bot.me()).username}?start=ref{user_id}"
-        referrals = get_referrals(user_id)
+        referrals = await get_referrals(user_id)
         text = (
             f"<b>Твоє реферальне посилання:</b>\n{ref_link}\n\n"
             f"Запрошено користувачів: <b>{len(referrals)}</b>"
@@ -103,4 +105,12 @@ async def myref_handler(message: types.Message):
         print(f"[INFO] /myref: user {user_id} - ref link sent")
     except Exception as e:
         print(f"[ERROR] /myref: user {user_id} - {e}")
-        await message.answer("Сталася помилка при отриманні реферального посилання.") 
\ No newline at end of file
+        await message.answer("Сталася помилка при отриманні реферального посилання.")
+
+@router.my_chat_member(F.chat.type == 'private', ChatMemberUpdatedFilter(member_status_changed=KICKED))
+async def bot_blocked_handler(event: types.ChatMemberUpdated):
+    # Користувач заблокував бота: розсилки й нагадування його пропускають.
+    # Без цього обробника Telegram не надсилає my_chat_member (allowed_updates
+    # береться з resolve_used_update_types) і блокування видно лише з помилок відправки.
+    user_tracker.mark_blocked(event.from_user.id)
+    print(f"[INFO] my_chat_member: user {event.from_user.id} - bot blocked")
@@ -5,15 +5,15 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from app.config import Config
-from app.db import add_support_log, log_message
+from app.services.audit_log import add_support_log, log_message
 from app.utils.validation import is_command
 
 router = Router()
 SUPPORT_LOG = "support_log.json"
 
 # Логування чату у БД
-def log_support(user_id, admin_id, message, direction):
-    add_support_log({
+async def log_support(user_id, admin_id, message, direction):
+    await add_support_log({
         "user_id": user_id,
         "admin_id": admin_id,
         "message": message,
@@ -32,7 +32,8 @@ async def support_start(message: types.Message, state: FSMContext):
     try:
         sent = await message.answer("Напишіть своє питання або уточнення. Менеджер отримає ваше повідомлення і відповість тут у чаті.")
         await state.update_data(last_bot_message_id=sent.message_id)
-        log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
+        await state.set_state(SupportStates.waiting_for_message)
+        await log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
         print(f"[INFO] /support: user {user_id} - support started")
     except Exception as e:
         print(f"[ERROR] /support: user {user_id} - {e}")
@@ -49,7 +50,7 @@ async def support_user_message(message: types.Message, state: FSMContext, bot: B
         sent = await message.answer("Ваше питання надіслано менеджеру. Очікуйте відповідь тут у чаті. Наступні повідомлення також будуть пересилатись.")
         await state.update_data(last_bot_message_id=sent.message_id)
         await state.set_state(SupportStates.in_dialog)
-        log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
+        await log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
     except Exception as e:
         sent = await message.answer("Сталася помилка при надсиланні питання.")
         await state.update_data(last_bot_message_id=sent.message_id)
@@ -63,7 +64,7 @@ async def support_dialog_message(message: types.Message, bot: Bot):
             parse_mode="HTML"
         )
     await message.answer("Повідомлення надіслано.", reply_markup=types.ReplyKeyboardRemove())
-    log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
+    await log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id)
 
 # Адмін відповідає користувачу через reply
 @router.message(F.reply_to_message, F.from_user.id.in_(Config.ADMIN_IDS))
@@ -87,4 +88,4 @@ async def support_admin_reply(message: types.Message, bot: Bot):
             await message.answer("⚠️ Не вдалося визначити користувача для відповіді.")
     else:
         await message.answer("⚠️ Не вдалося визначити користувача. Відповідайте на правильне повідомлення.")
-    log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id) 
\ No newline at end of file
+    await log_message(message.from_user.id, message.from_user.username, 'user', message.text, message.chat.id) 
\ No newline at end of file
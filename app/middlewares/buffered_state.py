@@ -0,0 +1,26 @@
+from aiogram import BaseMiddleware
+from app.storage.buffered import BufferedFSMContext
+
+class BufferedStateMiddleware(BaseMiddleware):
+    """Підміняє data["state"] на BufferedFSMContext на час обробника.
+
+    Реєструється як inner-middleware на dp.message і dp.callback_query:
+    спрацьовує лише коли обробник знайдено, а стан уже прочитав
+    FSMContextMiddleware (його беремо з data["raw_state"]). Зміни стану
+    записуються в сховище один раз після обробника — також якщо він
+    завершився помилкою, як і без буфера.
+    """
+
+    async def __call__(self, handler, event, data):
+        state = data.get('state')
+        if state is None or isinstance(state, BufferedFSMContext):
+            return await handler(event, data)
+        if 'raw_state' in data:
+            buffered = BufferedFSMContext(state.storage, state.key, data['raw_state'])
+        else:
+            buffered = BufferedFSMContext(state.storage, state.key)
+        data['state'] = buffered
+        try:
+            return await handler(event, data)
+        finally:
+            await buffered.flush()
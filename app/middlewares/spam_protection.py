@@ -1,45 +1,64 @@
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
-from app.db import check_spam_protection
-from app.config import SPAM_LIMITS
+from app.services.rate_limiter import rate_limiter
 import logging
+import math
 
 logger = logging.getLogger(__name__)
 
 class SpamProtectionMiddleware(BaseMiddleware):
-    async def __call__(self, handler, event, data):
-        user_id = event.from_user.id
-        
-        # Визначаємо тип дії
-        action_type = "general"
-        
+    """Відхиляє події, що перевищують SPAM_LIMITS.
+
+    Реєструється як outer-middleware на dp.message і dp.callback_query,
+    тому перевірка виконується до фільтрів для всіх роутерів; стан FSM
+    (data["raw_state"]) на цей момент уже прочитано.
+    Ліміти рахуються в пам'яті (app.services.rate_limiter), без запитів до БД.
+    """
+
+    def __init__(self, limiter=None):
+        self.limiter = rate_limiter if limiter is None else limiter
+
+    @staticmethod
+    def get_action_type(event, raw_state=None):
+        """Визначає тип дії для SPAM_LIMITS (None — подія не обмежується).
+
+        raw_state — поточний стан FSM. Нове замовлення рахується один раз:
+        командою /order (кнопкою "Нове замовлення") або кнопкою типу роботи
+        зі старого меню. Усередині форми (OrderStates) /order лише відновлює
+        діалог, а вибір типу продовжує вже розпочате замовлення.
+        """
+        in_order_flow = (raw_state or '').startswith('OrderStates:')
         if isinstance(event, Message):
-            if event.text and event.text.startswith('/order'):
-                action_type = "order_creation"
-            elif event.text and event.text.startswith('/support'):
-                action_type = "support_message"
-            elif event.text and event.text.startswith('/feedback'):
-                action_type = "feedback"
+            text = event.text or ''
+            command = text.split(maxsplit=1)[0].split('@')[0] if text.strip() else ''
+            if command == '/order' or text == "📝 Нове замовлення":
+                return None if in_order_flow else "order_creation"
+            if text.startswith('/support'):
+                return "support_message"
+            if text.startswith('/feedback'):
+                return "feedback"
         elif isinstance(event, CallbackQuery):
-            if event.data and event.data.startswith('order_type:'):
-                action_type = "order_creation"
-        
+            if (event.data or '').startswith('order_type:') and not in_order_flow:
+                return "order_creation"
+        return None
+
+    async def __call__(self, handler, event, data):
+        user = getattr(event, 'from_user', None)
+        action_type = self.get_action_type(event, data.get('raw_state'))
+        if user is None or action_type is None:
+            return await handler(event, data)
+
         # Перевіряємо спам захист
-        if action_type in SPAM_LIMITS:
-            limit = SPAM_LIMITS[action_type]['limit']
-            window = SPAM_LIMITS[action_type]['window']
-            
-            if not check_spam_protection(user_id, action_type, limit, window):
-                if isinstance(event, Message):
-                    await event.answer(
-                        f"⚠️ Занадто багато запитів. Спробуйте через {window} хвилин."
-                    )
-                elif isinstance(event, CallbackQuery):
-                    await event.answer(
-                        f"⚠️ Занадто багато запитів. Спробуйте через {window} хвилин.",
-                        show_alert=True
-                    )
-                return
-        
+        allowed, retry_after = self.limiter.hit(user.id, action_type)
+        if not allowed:
+            minutes = max(1, math.ceil(retry_after / 60))
+            text = f"⚠️ Занадто багато запитів. Спробуйте через {minutes} хв."
+            logger.info(f"Спам захист: user {user.id}, дія {action_type}")
+            if isinstance(event, Message):
+                await event.answer(text)
+            elif isinstance(event, CallbackQuery):
+                await event.answer(text, show_alert=True)
+            return
+
         # Якщо все добре, продовжуємо обробку
-        return await handler(event, data) 
\ No newline at end of file
+        return await handler(event, data)
@@ -0,0 +1,22 @@
+from aiogram import BaseMiddleware
+from app.services.user_tracker import user_tracker
+import logging
+
+logger = logging.getLogger(__name__)
+
+class UserTrackingMiddleware(BaseMiddleware):
+    """Оновлює таблицю users для кожного апдейту.
+
+    Реєструється як outer-middleware на dp.update (після вбудованого
+    UserContextMiddleware, тож користувач уже є в data["event_from_user"]).
+    Сам запис у БД буферизує app.services.user_tracker. Розблокування бота
+    (my_chat_member) теж приходить сюди і знімає позначку is_blocked;
+    блокування позначає обробник bot_blocked_handler (app/handlers/start.py).
+    """
+
+    def __init__(self, tracker=None):
+        self.tracker = user_tracker if tracker is None else tracker
+
+    async def __call__(self, handler, event, data):
+        self.tracker.touch(data.get('event_from_user'))
+        return await handler(event, data)
@@ -0,0 +1,392 @@
+"""Версійні міграції схеми БД.
+
+Поточна версія схеми зберігається в `PRAGMA user_version`. init_db()
+спочатку створює базові таблиці (CREATE TABLE IF NOT EXISTS), а потім
+run_migrations() по черзі застосовує всі міграції з номером, більшим за
+збережений, тож наявні файли botdata.sqlite3 оновлюються на місці.
+
+Щоб змінити схему, додайте нову функцію в кінець MIGRATIONS з наступним
+номером. Уже випущені міграції не редагуються.
+"""
+import logging
+import secrets
+
+from app.utils.deadlines import to_deadline_date
+
+logger = logging.getLogger(__name__)
+
+
+def _add_column(c, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN, якщо колонки ще немає (SQLite не має IF NOT EXISTS)."""
+    columns = {row[1] for row in c.execute(f'PRAGMA table_info({table})')}
+    if column not in columns:
+        c.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def _v1_secondary_indexes(c):
+    """Індекси для основних вибірок (get_orders, нагадування, спам захист тощо)."""
+    # get_orders(user_id=..., [status=...]) ORDER BY created_at
+    c.execute('CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders (user_id, created_at)')
+    # get_orders(status=...) ORDER BY created_at
+    c.execute('CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders (status, created_at)')
+    # get_pending_reminders: sent_at IS NULL AND scheduled_at <= ?
+    c.execute('CREATE INDEX IF NOT EXISTS idx_reminders_pending ON reminders (sent_at, scheduled_at)')
+    # check_spam_protection: підрахунок дій у вікні (покриваючий індекс)
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_spam_user_action_created
+                 ON spam_protection (user_id, action_type, created_at)''')
+    # check_spam_protection: видалення застарілих записів
+    c.execute('CREATE INDEX IF NOT EXISTS idx_spam_created ON spam_protection (created_at)')
+    # get_order_by_id: історія статусів і файли замовлення
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_status_history_order
+                 ON order_status_history (order_id, changed_at)''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_order_files_order ON order_files (order_id)')
+    # get_referrals / add_referral
+    c.execute('CREATE INDEX IF NOT EXISTS idx_referrals_user ON referrals (user_id, referred_id)')
+    # get_promocode_usages
+    c.execute('CREATE INDEX IF NOT EXISTS idx_promocode_usages_code ON promocode_usages (code)')
+    # get_support_logs(user_id=...)
+    c.execute('CREATE INDEX IF NOT EXISTS idx_support_logs_user ON support_logs (user_id, created_at)')
+
+
+def _v2_order_id_sequence(c):
+    """Лічильник і секретний ключ для генерації номерів замовлень."""
+    c.execute('''CREATE TABLE IF NOT EXISTS id_sequences (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0,
+        secret TEXT NOT NULL
+    )''')
+    c.execute('''INSERT OR IGNORE INTO id_sequences (name, value, secret)
+                 VALUES ('orders', 0, ?)''', (secrets.token_hex(16),))
+
+
+def _v3_orders_created_index(c):
+    """Індекс для сторінок усіх замовлень (/orders) за (created_at, id)."""
+    c.execute('CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at)')
+
+
+def _v4_orders_fulltext_search(c):
+    """Повнотекстовий індекс FTS5 по темі, предмету та вимогах замовлень.
+
+    Таблиця external-content: тексти зберігаються лише в orders, індекс
+    синхронізують тригери. unicode61 розбиває кирилицю на слова і зводить
+    регістр; діакритика не прибирається, щоб "й"/"ї" не зливались з "и"/"і".
+    """
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS orders_fts USING fts5(
+        topic, subject, requirements,
+        content='orders', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 0'
+    )''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS orders_fts_ai AFTER INSERT ON orders BEGIN
+        INSERT INTO orders_fts (rowid, topic, subject, requirements)
+        VALUES (new.id, new.topic, new.subject, new.requirements);
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS orders_fts_ad AFTER DELETE ON orders BEGIN
+        INSERT INTO orders_fts (orders_fts, rowid, topic, subject, requirements)
+        VALUES ('delete', old.id, old.topic, old.subject, old.requirements);
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS orders_fts_au
+        AFTER UPDATE OF topic, subject, requirements ON orders BEGIN
+        INSERT INTO orders_fts (orders_fts, rowid, topic, subject, requirements)
+        VALUES ('delete', old.id, old.topic, old.subject, old.requirements);
+        INSERT INTO orders_fts (rowid, topic, subject, requirements)
+        VALUES (new.id, new.topic, new.subject, new.requirements);
+    END''')
+    # Індексуємо вже наявні замовлення
+    c.execute("INSERT INTO orders_fts (orders_fts) VALUES ('rebuild')")
+
+
+def _v5_reminder_delivery_state(c):
+    """Лічильник спроб і стан "dead letter" для нагадувань.
+
+    Нагадування, яке не вдалося відправити REMINDER_MAX_ATTEMPTS разів (або
+    з постійною помилкою), отримує failed_at і більше не вибирається.
+    """
+    _add_column(c, 'reminders', 'attempts', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column(c, 'reminders', 'last_error', 'TEXT')
+    _add_column(c, 'reminders', 'failed_at', 'TEXT')
+    # Частковий індекс лише по активних нагадуваннях замість (sent_at, scheduled_at)
+    c.execute('DROP INDEX IF EXISTS idx_reminders_pending')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders (scheduled_at)
+                 WHERE sent_at IS NULL AND failed_at IS NULL''')
+
+
+def _v6_deadline_date(c):
+    """Нормалізована дата дедлайну та унікальність нагадувань.
+
+    deadline_date (YYYY-MM-DD) заповнюється з текстового deadline, щоб
+    автоматизація вибирала замовлення за індексом (status, deadline_date),
+    а не розбирала дедлайн кожного замовлення в Python.
+    """
+    _add_column(c, 'orders', 'deadline_date', 'TEXT')
+    c.execute('SELECT id, deadline FROM orders WHERE deadline_date IS NULL')
+    c.executemany('UPDATE orders SET deadline_date = ? WHERE id = ?',
+                  [(to_deadline_date(deadline), order_id) for order_id, deadline in c.fetchall()])
+    c.execute('CREATE INDEX IF NOT EXISTS idx_orders_status_deadline ON orders (status, deadline_date)')
+    # Прибираємо дублікати нагадувань (лишаємо найперше) і забороняємо нові
+    c.execute('''DELETE FROM reminders WHERE order_id IS NOT NULL AND id NOT IN (
+                     SELECT MIN(id) FROM reminders GROUP BY order_id, reminder_type)''')
+    c.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_reminders_order_type
+                 ON reminders (order_id, reminder_type)''')
+
+
+def _v7_broadcast_jobs(c):
+    """Завдання розсилок і статус доставки кожному отримувачу.
+
+    Стан зберігається в БД, тому розсилка після перезапуску бота
+    продовжується з першого ще не обробленого отримувача.
+    """
+    c.execute('''CREATE TABLE IF NOT EXISTS broadcast_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        admin_id INTEGER,
+        chat_id INTEGER,
+        progress_message_id INTEGER,
+        payload_type TEXT NOT NULL,
+        text TEXT,
+        file_id TEXT,
+        status TEXT NOT NULL DEFAULT 'pending',
+        total INTEGER NOT NULL DEFAULT 0,
+        sent INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT,
+        started_at TEXT,
+        finished_at TEXT
+    )''')
+    c.execute('''CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+        job_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        error TEXT,
+        sent_at TEXT,
+        PRIMARY KEY (job_id, user_id)
+    ) WITHOUT ROWID''')
+    # Наступна порція отримувачів: лише ще не оброблені
+    c.execute("""CREATE INDEX IF NOT EXISTS idx_broadcast_deliveries_pending
+                 ON broadcast_deliveries (job_id, user_id) WHERE status = 'pending'""")
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status
+                 ON broadcast_jobs (status)''')
+
+
+def _v8_users(c):
+    """Таблиця користувачів бота (оновлюється при кожній взаємодії).
+
+    Заповнюється з наявних замовлень і журналу повідомлень, щоб розсилки
+    одразу охоплювали і тих, хто ще нічого не замовляв.
+    """
+    c.execute('''CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        first_name TEXT,
+        last_name TEXT,
+        language_code TEXT,
+        first_seen_at TEXT,
+        last_active_at TEXT,
+        is_blocked INTEGER NOT NULL DEFAULT 0,
+        blocked_at TEXT
+    )''')
+    # Отримувачі розсилок: лише ті, хто не заблокував бота
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_users_active
+                 ON users (user_id) WHERE is_blocked = 0''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_users_last_active ON users (last_active_at)')
+    c.execute('''INSERT OR IGNORE INTO users (user_id, username, first_name, first_seen_at, last_active_at)
+                 SELECT user_id, username, first_name, MIN(created_at), MAX(created_at)
+                 FROM orders WHERE user_id IS NOT NULL GROUP BY user_id''')
+    c.execute('''INSERT OR IGNORE INTO users (user_id, username, first_seen_at, last_active_at)
+                 SELECT user_id, username, MIN(created_at), MAX(created_at)
+                 FROM messages WHERE user_id IS NOT NULL AND direction = 'user' GROUP BY user_id''')
+
+
+
+def _v9_fsm_storage(c):
+    """Стан FSM (незавершені замовлення, діалоги підтримки) між перезапусками.
+
+    Ключ — рядок з полів aiogram StorageKey (див. app.storage.sqlite),
+    data — JSON. Записи, що давно не оновлювались, видаляються за
+    updated_at (FSM_STATE_TTL).
+    """
+    c.execute('''CREATE TABLE IF NOT EXISTS fsm_storage (
+        key TEXT PRIMARY KEY,
+        state TEXT,
+        data TEXT NOT NULL DEFAULT '{}',
+        updated_at TEXT NOT NULL
+    ) WITHOUT ROWID''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_fsm_storage_updated ON fsm_storage (updated_at)')
+
+
+def _cents(price):
+    """SQL: ціна в цілих копійках (ціни — REAL, а суми з float накопичують похибку)."""
+    return f"CAST(ROUND(COALESCE({price}, 0) * 100) AS INTEGER)"
+
+
+# Ключі агрегатів статистики для рядка замовлення (new/old у тригерах)
+def _stats_keys(row):
+    return {
+        'status': f"COALESCE({row}.status, '')",
+        'type': f"COALESCE({row}.type_label, '')",
+        'day': f"substr({row}.created_at, 1, 10)",
+        'cents': _cents(f'{row}.price'),
+    }
+
+
+def _stats_add(row, tables=('status', 'type', 'daily')):
+    """SQL, що додає рядок замовлення до агрегатів."""
+    k = _stats_keys(row)
+    sql = {
+        'status': f'''INSERT INTO order_stats_status (status, orders, revenue_cents) VALUES ({k['status']}, 1, {k['cents']})
+            ON CONFLICT (status) DO UPDATE SET orders = orders + 1, revenue_cents = revenue_cents + excluded.revenue_cents;''',
+        'type': f'''INSERT INTO order_stats_type (type_label, orders) VALUES ({k['type']}, 1)
+            ON CONFLICT (type_label) DO UPDATE SET orders = orders + 1;''',
+        'daily': f'''INSERT INTO order_stats_daily (day, orders, revenue_cents)
+            SELECT {k['day']}, 1, {k['cents']} WHERE {row}.created_at IS NOT NULL
+            ON CONFLICT (day) DO UPDATE SET orders = orders + 1, revenue_cents = revenue_cents + excluded.revenue_cents;''',
+    }
+    return '\n'.join(sql[table] for table in tables)
+
+
+def _stats_remove(row, tables=('status', 'type', 'daily')):
+    """SQL, що віднімає рядок замовлення від агрегатів."""
+    k = _stats_keys(row)
+    sql = {
+        'status': f'''UPDATE order_stats_status SET orders = orders - 1, revenue_cents = revenue_cents - {k['cents']}
+            WHERE status = {k['status']};''',
+        'type': f'''UPDATE order_stats_type SET orders = orders - 1 WHERE type_label = {k['type']};''',
+        'daily': f'''UPDATE order_stats_daily SET orders = orders - 1, revenue_cents = revenue_cents - {k['cents']}
+            WHERE day = {k['day']};''',
+    }
+    return '\n'.join(sql[table] for table in tables)
+
+
+def fill_order_stats(c):
+    """Перераховує агрегати статистики з таблиці orders з нуля."""
+    c.execute('DELETE FROM order_stats_status')
+    c.execute('DELETE FROM order_stats_type')
+    c.execute('DELETE FROM order_stats_daily')
+    c.execute(f'''INSERT INTO order_stats_status (status, orders, revenue_cents)
+                 SELECT COALESCE(status, ''), COUNT(*), SUM({_cents('price')})
+                 FROM orders GROUP BY 1''')
+    c.execute('''INSERT INTO order_stats_type (type_label, orders)
+                 SELECT COALESCE(type_label, ''), COUNT(*) FROM orders GROUP BY 1''')
+    c.execute(f'''INSERT INTO order_stats_daily (day, orders, revenue_cents)
+                 SELECT substr(created_at, 1, 10), COUNT(*), SUM({_cents('price')})
+                 FROM orders WHERE created_at IS NOT NULL GROUP BY 1''')
+
+
+ORDER_STATS_TRIGGERS = ('order_stats_ai', 'order_stats_ad', 'order_stats_au_status',
+                        'order_stats_au_type', 'order_stats_au_daily')
+
+
+def _create_order_stats(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS order_stats_status (
+        status TEXT PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
+        revenue_cents INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE IF NOT EXISTS order_stats_type (
+        type_label TEXT PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE IF NOT EXISTS order_stats_daily (
+        day TEXT PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
+        revenue_cents INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS order_stats_ai AFTER INSERT ON orders BEGIN
+        {_stats_add('new')}
+    END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS order_stats_ad AFTER DELETE ON orders BEGIN
+        {_stats_remove('old')}
+    END''')
+    # Оновлення: лише ті агрегати, чиї ключі чи сума справді змінились
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS order_stats_au_status
+        AFTER UPDATE OF status, price ON orders
+        WHEN old.status IS NOT new.status OR old.price IS NOT new.price BEGIN
+        {_stats_remove('old', ('status',))}
+        {_stats_add('new', ('status',))}
+    END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS order_stats_au_type
+        AFTER UPDATE OF type_label ON orders
+        WHEN old.type_label IS NOT new.type_label BEGIN
+        {_stats_remove('old', ('type',))}
+        {_stats_add('new', ('type',))}
+    END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS order_stats_au_daily
+        AFTER UPDATE OF created_at, price ON orders
+        WHEN old.created_at IS NOT new.created_at OR old.price IS NOT new.price BEGIN
+        {_stats_remove('old', ('daily',))}
+        {_stats_add('new', ('daily',))}
+    END''')
+    fill_order_stats(c)
+
+
+def _v10_order_stats(c):
+    """Агрегати для статистики (/stats, "📊 Статистика") замість перебору orders.
+
+    Кількість і сума замовлень за статусами, кількість за типами робіт і
+    кількість/сума за днями створення. Агрегати підтримують тригери на
+    orders, тож їх оновлює будь-який шлях запису (add_order, update_order,
+    update_order_status, apply_status_transitions). Перевірка й
+    перерахунок з нуля — db.rebuild_order_stats() (команда /rebuild_stats).
+    """
+    _create_order_stats(c)
+
+
+def _v11_order_stats_cents(c):
+    """Суми в агрегатах статистики — цілі копійки (revenue_cents).
+
+    Початкова редакція v10 (до релізу) додавала й віднімала в тригерах
+    REAL-ціни, і суми накопичували похибку float. Бази, що встигли пройти
+    її, отримують таблиці й тригери заново; для нових баз це повтор v10.
+    """
+    for trigger in ORDER_STATS_TRIGGERS:
+        c.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    for table in ('order_stats_status', 'order_stats_type', 'order_stats_daily'):
+        c.execute(f'DROP TABLE IF EXISTS {table}')
+    _create_order_stats(c)
+
+
+# (версія, функція міграції) — строго за зростанням версії
+MIGRATIONS = [
+    (1, _v1_secondary_indexes),
+    (2, _v2_order_id_sequence),
+    (3, _v3_orders_created_index),
+    (4, _v4_orders_fulltext_search),
+    (5, _v5_reminder_delivery_state),
+    (6, _v6_deadline_date),
+    (7, _v7_broadcast_jobs),
+    (8, _v8_users),
+    (9, _v9_fsm_storage),
+    (10, _v10_order_stats),
+    (11, _v11_order_stats_cents),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_migrations(conn):
+    """Застосовує всі міграції, новіші за поточну версію схеми.
+
+    Кожна міграція разом з оновленням user_version виконується в окремій
+    транзакції, тому перервана міграція не залишає схему наполовину зміненою.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    version = get_schema_version(conn)
+    for target, migrate in MIGRATIONS:
+        if target <= version:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            c = conn.cursor()
+            migrate(c)
+            c.execute(f'PRAGMA user_version = {int(target)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"Помилка міграції схеми до версії {target}")
+            raise
+        logger.info(f"Схему БД оновлено до версії {target}")
+        version = target
+    return version
@@ -0,0 +1,106 @@
+"""Буферизований запис журналів messages та support_logs.
+
+Обробники лише ставлять рядки в чергу в пам'яті. Фонова задача збирає їх
+у пакети (до AUDIT_BATCH_SIZE рядків або раз на AUDIT_FLUSH_INTERVAL
+секунд) і записує одним executemany в одній транзакції, тому повідомлення
+користувача не чекає на commit/fsync.
+
+Черга обмежена (AUDIT_QUEUE_SIZE): якщо БД не встигає, log_message()
+чекає на вільне місце замість необмеженого росту пам'яті. stop()
+дописує все, що залишилось у черзі.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from app import async_db
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _utc_now():
+    # Той самий формат, що й datetime('now') у SQLite
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class AuditLogWriter:
+    def __init__(self, flush_interval=None, batch_size=None, queue_size=None):
+        self.flush_interval = flush_interval or Config.AUDIT_FLUSH_INTERVAL
+        self.batch_size = batch_size or Config.AUDIT_BATCH_SIZE
+        self.queue_size = queue_size or Config.AUDIT_QUEUE_SIZE
+        self._queue = None
+        self._task = None
+        self._loop = None
+
+    def _ensure_started(self):
+        """Запускає фонову задачу при першому записі в поточному event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    async def _put(self, kind, row):
+        self._ensure_started()
+        await self._queue.put((kind, row))
+
+    async def log_message(self, user_id, username, direction, text, chat_id=None, message_type='text'):
+        await self._put('messages', (user_id, username, direction, text, chat_id, message_type, _utc_now()))
+
+    async def add_support_log(self, log: dict):
+        await self._put('support_logs', (
+            log.get('user_id'), log.get('admin_id'), log.get('message'), log.get('direction'), _utc_now()
+        ))
+
+    async def _run(self):
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            stopping = item is None
+            batch = [] if stopping else [item]
+            deadline = loop.time() + self.flush_interval
+            while not stopping and len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch):
+        messages = [row for kind, row in batch if kind == 'messages']
+        support_logs = [row for kind, row in batch if kind == 'support_logs']
+        try:
+            await async_db.add_audit_records(messages, support_logs)
+        except Exception as e:
+            logger.error(f"Помилка запису журналу ({len(batch)} рядків): {e}")
+
+    async def stop(self):
+        """Дописує всі рядки з черги і зупиняє фонову задачу."""
+        if self._task is None or self._loop is not asyncio.get_running_loop():
+            return
+        if not self._task.done():
+            # None у черзі — сигнал дописати поточний пакет і завершитись
+            await self._queue.put(None)
+            await self._task
+        self._task = None
+        logger.info("Журнал повідомлень дописано")
+
+
+# Глобальний екземпляр
+audit_log = AuditLogWriter()
+
+log_message = audit_log.log_message
+add_support_log = audit_log.add_support_log
@@ -1,15 +1,22 @@
 import asyncio
 from datetime import datetime, timedelta
 from aiogram import Bot
-from app.db import get_pending_reminders, mark_reminder_sent, get_orders, update_order_status
-from app.config import Config, REMINDER_TYPES
+from app.async_db import get_orders_by_deadline, apply_status_transitions
+from app.services.reminders import add_reminder, start_reminder_scheduler, stop_reminder_scheduler
+from app.config import Config, REMINDER_TYPES, AUTO_STATUS_TRANSITIONS
+from app.services.sender import get_sender
+from app.utils.deadlines import parse_deadline
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Колонки замовлень, потрібні для обробки дедлайнів
+DEADLINE_COLUMNS = ('id', 'user_id', 'deadline')
+
 class AutomationService:
     def __init__(self, bot: Bot):
         self.bot = bot
+        self.sender = get_sender(bot)
         self.is_running = False
     
     async def start(self):
@@ -19,7 +26,7 @@ class AutomationService:
         
         while self.is_running:
             try:
-                await self.process_reminders()
+                # Самі нагадування відправляє ReminderScheduler у свій час
                 await self.process_deadline_reminders()
                 await self.process_auto_status_updates()
                 await asyncio.sleep(Config.AUTO_UPDATE_INTERVAL)
@@ -32,114 +39,61 @@ class AutomationService:
         self.is_running = False
         logger.info("Автоматизація зупинена")
     
-    async def process_reminders(self):
-        """Обробляє нагадування"""
-        reminders = get_pending_reminders()
-        
-        for reminder in reminders:
-            try:
-                reminder_id, user_id, order_id, reminder_type, scheduled_at, sent_at, message = reminder
-                
-                # Відправляємо нагадування
-                await self.bot.send_message(user_id, message)
-                
-                # Позначаємо як відправлене
-                mark_reminder_sent(reminder_id)
-                
-                logger.info(f"Нагадування {reminder_id} відправлено користувачу {user_id}")
-                
-            except Exception as e:
-                logger.error(f"Помилка при відправці нагадування {reminder_id}: {e}")
-    
     async def process_deadline_reminders(self):
         """Створює нагадування про дедлайни"""
-        orders = get_orders(status='confirmed')
+        # Вибираємо в SQL лише замовлення, дедлайн яких рівно через days_before днів
+        days_before = REMINDER_TYPES['deadline_approaching']['days_before']
+        deadline_date = (datetime.now().date() + timedelta(days=days_before)).isoformat()
+        orders = await get_orders_by_deadline('confirmed', deadline_date=deadline_date,
+                                              columns=DEADLINE_COLUMNS)
         
         for order in orders:
+            order_id, user_id, deadline = order
             try:
-                order_id, user_id, _, _, _, _, _, _, _, deadline, _, _, _, _, _, _, _, _, _, _ = order
-                
-                # Парсимо дедлайн
-                deadline_date = self.parse_deadline(deadline)
-                if not deadline_date:
-                    continue
-                
-                # Перевіряємо чи потрібно створити нагадування
-                days_before = REMINDER_TYPES['deadline_approaching']['days_before']
-                reminder_date = deadline_date - timedelta(days=days_before)
+                # Створюємо нагадування (повторне для того ж замовлення ігнорується)
+                message = REMINDER_TYPES['deadline_approaching']['message']
+                scheduled_at = datetime.now().isoformat()
                 
-                if datetime.now().date() == reminder_date:
-                    # Створюємо нагадування
-                    message = REMINDER_TYPES['deadline_approaching']['message']
-                    scheduled_at = datetime.now().isoformat()
-                    
-                    from app.db import add_reminder
-                    add_reminder(user_id, order_id, 'deadline_approaching', scheduled_at, message)
-                    
+                if await add_reminder(user_id, order_id, 'deadline_approaching', scheduled_at, message):
                     logger.info(f"Створено нагадування про дедлайн для замовлення {order_id}")
                 
             except Exception as e:
                 logger.error(f"Помилка при обробці дедлайну замовлення {order_id}: {e}")
     
     async def process_auto_status_updates(self):
-        """Автоматично оновлює статуси замовлень"""
-        orders = get_orders(status='in_progress')
+        """Автоматично оновлює статуси замовлень за правилами AUTO_STATUS_TRANSITIONS"""
+        now = datetime.now()
+        transitions = []
+        for rule in AUTO_STATUS_TRANSITIONS:
+            cutoff = now - timedelta(days=rule.get('after_days', 0))
+            # deadline_date — дата без часу, решта колонок — повний ISO-час
+            cutoff = cutoff.date().isoformat() if rule['since'] == 'deadline_date' else cutoff.isoformat()
+            transitions.append((rule['from_status'], rule['to_status'], rule['since'], cutoff, rule.get('notes')))
         
-        for order in orders:
-            try:
-                order_id, user_id, _, _, _, _, _, _, _, deadline, _, _, _, _, _, _, _, _, _, _ = order
-                
-                # Парсимо дедлайн
-                deadline_date = self.parse_deadline(deadline)
-                if not deadline_date:
-                    continue
-                
-                # Якщо дедлайн минув, змінюємо статус на "review"
-                if datetime.now().date() > deadline_date:
-                    update_order_status(order_id, 'review', notes="Автоматичне оновлення: дедлайн минув")
-                    
-                    # Сповіщаємо користувача
-                    await self.bot.send_message(
-                        user_id,
-                        f"ℹ️ Ваше замовлення #{order_id} переведено на перевірку (дедлайн минув)."
-                    )
-                    
-                    logger.info(f"Автоматично оновлено статус замовлення {order_id} на 'review'")
-                
-            except Exception as e:
-                logger.error(f"Помилка при автоматичному оновленні статусу замовлення {order_id}: {e}")
+        # Усі переходи — одна транзакція в БД
+        changed = await apply_status_transitions(transitions)
+        
+        # Сповіщення відправляємо паралельно з лімітами Telegram
+        notifications = []
+        for rule, rows in zip(AUTO_STATUS_TRANSITIONS, changed):
+            if rows:
+                logger.info(f"Автоматично оновлено статус {len(rows)} замовлень "
+                            f"'{rule['from_status']}' -> '{rule['to_status']}'")
+            if not rule.get('message'):
+                continue
+            for order_id, user_id in rows:
+                notifications.append(self.notify_status_change(user_id, rule['message'].format(order_id=order_id)))
+        await asyncio.gather(*notifications)
+    
+    async def notify_status_change(self, user_id, text):
+        try:
+            await self.sender.send_message(user_id, text)
+        except Exception as e:
+            logger.error(f"Помилка сповіщення користувача {user_id} про зміну статусу: {e}")
     
     def parse_deadline(self, deadline_str):
         """Парсить дедлайн з різних форматів"""
-        try:
-            # Спробуємо різні формати
-            formats = [
-                "%Y-%m-%d",
-                "%d.%m.%Y",
-                "%d/%m/%Y",
-                "%d-%m-%Y"
-            ]
-            
-            for fmt in formats:
-                try:
-                    return datetime.strptime(deadline_str, fmt).date()
-                except ValueError:
-                    continue
-            
-            # Якщо не вдалося розпарсити, спробуємо знайти числа
-            import re
-            numbers = re.findall(r'\d+', deadline_str)
-            if len(numbers) >= 3:
-                # Припускаємо формат DD.MM.YYYY
-                day, month, year = int(numbers[0]), int(numbers[1]), int(numbers[2])
-                if year < 100:  # Якщо рік двозначний
-                    year += 2000
-                return datetime(year, month, day).date()
-            
-            return None
-            
-        except Exception:
-            return None
+        return parse_deadline(deadline_str)
     
     async def send_auto_response(self, user_id, message_type):
         """Відправляє автоматичні відповіді"""
@@ -161,10 +115,12 @@ async def start_automation(bot: Bot):
     """Запускає автоматизацію"""
     global automation_service
     automation_service = AutomationService(bot)
+    await start_reminder_scheduler(bot)
     asyncio.create_task(automation_service.start())
 
 async def stop_automation():
     """Зупиняє автоматизацію"""
     global automation_service
     if automation_service:
-        await automation_service.stop() 
\ No newline at end of file
+        await automation_service.stop()
+    await stop_reminder_scheduler() 
\ No newline at end of file
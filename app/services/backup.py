@@ -0,0 +1,83 @@
+"""Бекапи БД: запуск у фоновому потоці та планувальник за BACKUP_INTERVAL.
+
+Сам бекап (онлайн-копіювання, integrity_check, gzip, ротація) виконує
+app.db.create_backup у пулі потоків БД. Тут — блокування, щоб ручний
+бекап з адмін-панелі не перетинався із запланованим, і фонова задача,
+що запускає бекап раз на BACKUP_INTERVAL секунд.
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+from app.async_db import create_backup, get_last_backup
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+_backup_lock = None
+_scheduler_task = None
+
+
+def _get_lock():
+    global _backup_lock
+    if _backup_lock is None:
+        _backup_lock = asyncio.Lock()
+    return _backup_lock
+
+
+def is_backup_running():
+    return _backup_lock is not None and _backup_lock.locked()
+
+
+async def run_backup(progress=None):
+    """Створює бекап; паралельні виклики виконуються по черзі."""
+    async with _get_lock():
+        backup_file = await create_backup(progress=progress)
+    logger.info(f"Бекап створено: {backup_file}")
+    return backup_file
+
+
+async def _seconds_until_next_backup():
+    last = await get_last_backup()
+    if last is None:
+        return 0
+    try:
+        elapsed = (datetime.now() - datetime.fromisoformat(last.created_at)).total_seconds()
+    except (TypeError, ValueError):
+        return 0
+    return max(0, Config.BACKUP_INTERVAL - elapsed)
+
+
+async def _scheduler_loop():
+    # Перший бекап — коли від попереднього мине BACKUP_INTERVAL
+    # (після перезапуску відлік не починається заново)
+    delay = await _seconds_until_next_backup()
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            await run_backup()
+            delay = Config.BACKUP_INTERVAL
+        except Exception as e:
+            logger.error(f"Помилка планового бекапу: {e}")
+            delay = min(Config.BACKUP_INTERVAL, 600)  # повтор через 10 хвилин
+
+
+def start_backup_scheduler():
+    """Запускає фонову задачу планових бекапів."""
+    global _scheduler_task
+    if _scheduler_task is None or _scheduler_task.done():
+        _scheduler_task = asyncio.create_task(_scheduler_loop())
+        logger.info("Планувальник бекапів запущено")
+
+
+async def stop_backup_scheduler():
+    """Зупиняє планувальник (бекап, що вже виконується, завершиться в потоці)."""
+    global _scheduler_task
+    if _scheduler_task is not None:
+        _scheduler_task.cancel()
+        try:
+            await _scheduler_task
+        except asyncio.CancelledError:
+            pass
+        _scheduler_task = None
+        logger.info("Планувальник бекапів зупинено")
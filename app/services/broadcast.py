@@ -0,0 +1,212 @@
+"""Фонові масові розсилки.
+
+Розсилка — це запис у broadcast_jobs і рядок у broadcast_deliveries на
+кожного отримувача. BroadcastWorker бере отримувачів порціями по
+BROADCAST_BATCH_SIZE, відправляє їх паралельно через RateLimitedSender
+(тобто з максимально дозволеною Telegram швидкістю) і записує результати
+порції однією транзакцією. Після перезапуску незавершені розсилки
+продовжуються з першого необробленого отримувача (у гіршому разі повторно
+отримає повідомлення лише порція, що була у відправці під час збою).
+
+Прогрес показується в одному повідомленні адміна, яке редагується не
+частіше ніж раз на BROADCAST_PROGRESS_INTERVAL секунд.
+"""
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from app import async_db
+from app.config import Config
+from app.services.sender import get_sender
+
+logger = logging.getLogger(__name__)
+
+# Підтримувані типи повідомлень розсилки
+PAYLOAD_TYPES = ('text', 'photo', 'document', 'video')
+
+JOB_STATUS_LABELS = {
+    'pending': '⏳ В черзі',
+    'running': '📤 Відправляється',
+    'completed': '✅ Завершено',
+    'cancelled': '⛔ Зупинено',
+}
+
+
+def format_broadcast_progress(job):
+    """Текст повідомлення з прогресом розсилки."""
+    done = job.sent + job.failed
+    percent = done * 100 // job.total if job.total else 100
+    filled = percent // 10
+    return (
+        f"📢 <b>Розсилка #{job.id}</b>\n\n"
+        f"{JOB_STATUS_LABELS.get(job.status, job.status)}\n"
+        f"{'▓' * filled}{'░' * (10 - filled)} {percent}%\n\n"
+        f"📤 Відправлено: {job.sent}\n"
+        f"❌ Помилки: {job.failed}\n"
+        f"📊 Всього користувачів: {job.total}"
+    )
+
+
+def get_progress_keyboard(job):
+    if job.status not in ('pending', 'running'):
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="⛔ Зупинити розсилку", callback_data=f"broadcast_stop:{job.id}")
+    ]])
+
+
+class BroadcastWorker:
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.sender = get_sender(bot)
+        self._tasks = {}
+        self._cancelled = set()
+
+    def is_running(self, job_id):
+        task = self._tasks.get(job_id)
+        return task is not None and not task.done()
+
+    def start_job(self, job_id):
+        """Запускає (або продовжує) відправку розсилки у фоновій задачі."""
+        if not self.is_running(job_id):
+            self._tasks[job_id] = asyncio.create_task(self._run(job_id))
+
+    async def resume_unfinished(self):
+        """Продовжує розсилки, перервані зупинкою бота."""
+        for job in await async_db.get_unfinished_broadcast_jobs():
+            logger.info(f"Продовжуємо розсилку {job.id} ({job.sent + job.failed}/{job.total})")
+            self.start_job(job.id)
+
+    async def cancel_job(self, job_id):
+        """Скасовує розсилку; None — її немає або вона вже завершена."""
+        if self.is_running(job_id):
+            self._cancelled.add(job_id)
+        job = await async_db.set_broadcast_status(job_id, 'cancelled')
+        if job is not None and not self.is_running(job_id):
+            await self._show_progress(job)
+        return job
+
+    async def stop(self):
+        """Зупиняє відправку; стан лишається в БД і продовжиться після старту."""
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _run(self, job_id):
+        try:
+            job = await async_db.set_broadcast_status(job_id, 'running')
+            if job is None:
+                # Скасовано, поки розсилка чекала в черзі
+                return
+            await self._show_progress(job)
+            loop = asyncio.get_running_loop()
+            shown_at = loop.time()
+            while job_id not in self._cancelled:
+                user_ids = await async_db.get_broadcast_batch(job_id, Config.BROADCAST_BATCH_SIZE)
+                if not user_ids:
+                    break
+                results = await asyncio.gather(*(self._deliver(job, user_id) for user_id in user_ids))
+                job = await async_db.record_broadcast_results(job_id, results)
+                # Оновлюємо прогрес не частіше, ніж раз на BROADCAST_PROGRESS_INTERVAL
+                if loop.time() - shown_at >= Config.BROADCAST_PROGRESS_INTERVAL:
+                    await self._show_progress(job)
+                    shown_at = loop.time()
+            job = None
+            if job_id not in self._cancelled:
+                job = await async_db.set_broadcast_status(job_id, 'completed')
+            if job is None:
+                # Скасування встигло раніше — у БД уже cancelled
+                job = await async_db.get_broadcast_job(job_id)
+            await self._show_progress(job)
+            logger.info(f"Розсилка {job_id}: {job.status}, відправлено {job.sent}, помилок {job.failed}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Помилка розсилки {job_id}: {e}")
+        finally:
+            self._cancelled.discard(job_id)
+
+    async def _deliver(self, job, user_id):
+        """Відправляє повідомлення розсилки одному отримувачу; повертає (user_id, статус, помилка)."""
+        try:
+            if job.payload_type == 'text':
+                await self.sender.call(user_id, self.bot.send_message, job.text, parse_mode="HTML")
+            elif job.payload_type == 'photo':
+                await self.sender.call(user_id, self.bot.send_photo, job.file_id,
+                                       caption=job.text, parse_mode="HTML")
+            elif job.payload_type == 'document':
+                await self.sender.call(user_id, self.bot.send_document, job.file_id,
+                                       caption=job.text, parse_mode="HTML")
+            elif job.payload_type == 'video':
+                await self.sender.call(user_id, self.bot.send_video, job.file_id,
+                                       caption=job.text, parse_mode="HTML")
+            else:
+                return user_id, 'failed', f"Непідтримуваний тип: {job.payload_type}"
+            return user_id, 'sent', None
+        except Exception as e:
+            return user_id, 'failed', str(e)
+
+    async def _show_progress(self, job):
+        if not job.chat_id or not job.progress_message_id:
+            return
+        try:
+            await self.bot.edit_message_text(
+                format_broadcast_progress(job),
+                chat_id=job.chat_id,
+                message_id=job.progress_message_id,
+                parse_mode="HTML",
+                reply_markup=get_progress_keyboard(job)
+            )
+        except TelegramBadRequest:
+            # "message is not modified" або повідомлення видалено — не критично
+            pass
+        except Exception as e:
+            logger.warning(f"Не вдалося оновити прогрес розсилки {job.id}: {e}")
+
+
+# Глобальний екземпляр (створюється в start_broadcast_worker)
+broadcast_worker = None
+
+
+async def start_broadcast(bot: Bot, admin_id, progress_message, payload_type, text=None, file_id=None):
+    """Створює розсилку, показує її в progress_message і запускає відправку.
+
+    Повертає (job_id, total).
+    """
+    global broadcast_worker
+    if broadcast_worker is None:
+        broadcast_worker = BroadcastWorker(bot)
+    job_id, total = await async_db.create_broadcast_job(admin_id, progress_message.chat.id,
+                                                        payload_type, text, file_id)
+    await async_db.set_broadcast_progress_message(job_id, progress_message.chat.id,
+                                                  progress_message.message_id)
+    # Початковий стан показуємо до старту задачі, щоб не перетерти її оновлення
+    await broadcast_worker._show_progress(await async_db.get_broadcast_job(job_id))
+    broadcast_worker.start_job(job_id)
+    return job_id, total
+
+
+async def cancel_broadcast(bot: Bot, job_id):
+    """Зупиняє розсилку (вже відправлені повідомлення не відкликаються)."""
+    global broadcast_worker
+    if broadcast_worker is None:
+        broadcast_worker = BroadcastWorker(bot)
+    return await broadcast_worker.cancel_job(job_id)
+
+
+async def start_broadcast_worker(bot: Bot):
+    global broadcast_worker
+    broadcast_worker = BroadcastWorker(bot)
+    await broadcast_worker.resume_unfinished()
+
+
+async def stop_broadcast_worker():
+    global broadcast_worker
+    if broadcast_worker is not None:
+        await broadcast_worker.stop()
+        broadcast_worker = None
@@ -0,0 +1,79 @@
+"""Експорт статистики для адміністратора: zip з CSV замовлень, історії
+статусів і використань промокодів.
+
+Архів пише app.db.export_stats у пулі потоків БД, читаючи рядки порціями
+по EXPORT_CHUNK_SIZE, у SpooledTemporaryFile: до EXPORT_SPOOL_MAX_SIZE
+байтів він лежить у пам'яті, більший — у тимчасовому файлі на диску.
+Надсилається архів через SpooledInputFile, який віддає його aiogram
+порціями, не читаючи в пам'ять цілком. Одночасно виконується лише один
+експорт.
+"""
+import asyncio
+import logging
+import tempfile
+from datetime import datetime
+
+from aiogram.types.input_file import DEFAULT_CHUNK_SIZE, InputFile
+
+from app.async_db import export_stats
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+_export_lock = None
+
+
+def _get_lock():
+    global _export_lock
+    if _export_lock is None:
+        _export_lock = asyncio.Lock()
+    return _export_lock
+
+
+def is_export_running():
+    return _export_lock is not None and _export_lock.locked()
+
+
+class SpooledInputFile(InputFile):
+    """Документ для відправки з відкритого файлового об'єкта (читається порціями)."""
+
+    def __init__(self, file, filename, chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot):
+        # Файл може бути вже на диску — читаємо не в event loop
+        await asyncio.to_thread(self.file.seek, 0)
+        while chunk := await asyncio.to_thread(self.file.read, self.chunk_size):
+            yield chunk
+
+
+def export_filename(date_from=None, date_to=None, status=None):
+    parts = ['stats']
+    if date_from or date_to:
+        parts.append(f"{date_from or ''}_{date_to or ''}")
+    if status:
+        parts.append(status)
+    parts.append(datetime.now().strftime('%Y%m%d_%H%M'))
+    return '_'.join(parts) + '.zip'
+
+
+async def build_export(date_from=None, date_to=None, status=None):
+    """Створює архів експорту; повертає (SpooledInputFile, кількості рядків).
+
+    Файл закриває викликач (input_file.file.close()). Якщо архів більший
+    за EXPORT_MAX_BYTES, кидає ValueError — тоді треба звузити фільтр.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=Config.EXPORT_SPOOL_MAX_SIZE)
+    try:
+        async with _get_lock():
+            counts = await export_stats(spool, date_from, date_to, status, Config.EXPORT_CHUNK_SIZE)
+        size = spool.tell()
+        if size > Config.EXPORT_MAX_BYTES:
+            raise ValueError(f"Архів завеликий для Telegram ({size // (1024 * 1024)} МБ), "
+                             f"звузьте період або статус")
+    except BaseException:
+        spool.close()
+        raise
+    logger.info(f"Експорт статистики: {counts}, {size} байтів")
+    return SpooledInputFile(spool, export_filename(date_from, date_to, status)), counts
@@ -0,0 +1,70 @@
+"""Промокоди з кешем у пам'яті перед таблицею promocodes.
+
+На кроці промокоду користувач може вводити коди один за одним, і кожна
+спроба читала БД. PromoRegistry кешує рядки get_promocode — і відсутність
+коду теж — на PROMO_CACHE_TTL секунд у LRU з PROMO_CACHE_SIZE записів.
+add() і redeem() скидають запис свого коду, тож новий промокод доступний
+одразу, а used_count після використання читається з БД заново.
+
+Кеш лише для показу та попередньої перевірки: ліміт використань
+гарантує умовний UPDATE у db.use_promocode, а не значення з кешу.
+"""
+import time
+from collections import OrderedDict
+
+from app import async_db
+from app.config import Config
+
+
+class PromoRegistry:
+    def __init__(self, ttl=None, max_size=None, clock=time.monotonic):
+        self.ttl = ttl or Config.PROMO_CACHE_TTL
+        self.max_size = max_size or Config.PROMO_CACHE_SIZE
+        self.clock = clock
+        self._entries = OrderedDict()
+        # Змінюється при кожному скиданні: читання, що почалось до
+        # скидання, не кладе в кеш застарілий рядок
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, code):
+        """Рядок промокоду (як db.get_promocode) або None, якщо такого немає."""
+        entry = self._entries.get(code)
+        if entry is not None and entry[1] > self.clock():
+            self._entries.move_to_end(code)
+            return entry[0]
+        generation = self._generation
+        row = await async_db.get_promocode(code)
+        if generation == self._generation:
+            self._entries[code] = (row, self.clock() + self.ttl)
+            self._entries.move_to_end(code)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return row
+
+    def invalidate(self, code=None):
+        """Скидає кеш коду (або весь кеш, якщо code не задано)."""
+        self._generation += 1
+        if code is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(code, None)
+
+    async def add(self, code, *args, **kwargs):
+        """Додає промокод (аргументи як у db.add_promocode)."""
+        try:
+            await async_db.add_promocode(code, *args, **kwargs)
+        finally:
+            self.invalidate(code)
+
+    async def redeem(self, code, user_id, order_id, order_amount):
+        """Використовує промокод; повертає знижку або None, якщо ліміт вичерпано."""
+        try:
+            return await async_db.use_promocode(code, user_id, order_id, order_amount)
+        finally:
+            self.invalidate(code)
+
+
+promo_registry = PromoRegistry()
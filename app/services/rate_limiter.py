@@ -0,0 +1,104 @@
+"""Обмеження частоти дій користувачів (спам захист) у пам'яті процесу.
+
+Для кожної пари (user_id, action_type) зберігається кільцевий буфер
+(deque) з часом останніх дій — не більше `limit` елементів, тому
+перевірка "ковзного вікна" не звертається до БД і займає мікросекунди.
+
+Пари зберігаються в LRU (OrderedDict) з обмеженням RATE_LIMIT_MAX_KEYS:
+найдавніше використані записи витісняються, тож пам'ять не росте з
+кількістю користувачів.
+
+Щоб ліміти переживали перезапуск, стан можна зберегти в таблицю
+spam_protection (save_to_db) і відновити при старті (restore_from_db).
+"""
+import logging
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from app import async_db
+from app.config import Config, SPAM_LIMITS
+
+logger = logging.getLogger(__name__)
+
+
+class SlidingWindowLimiter:
+    def __init__(self, limits=None, max_keys=None, clock=time.time):
+        self.limits = SPAM_LIMITS if limits is None else limits
+        self.max_keys = max_keys or Config.RATE_LIMIT_MAX_KEYS
+        self.clock = clock
+        self._hits = OrderedDict()
+
+    def __len__(self):
+        return len(self._hits)
+
+    def _window(self, action_type):
+        return self.limits[action_type]['window'] * 60
+
+    def _bucket(self, key, limit):
+        bucket = self._hits.get(key)
+        if bucket is None or bucket.maxlen != limit:
+            bucket = deque(bucket or (), maxlen=limit)
+            self._hits[key] = bucket
+            if len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+        else:
+            self._hits.move_to_end(key)
+        return bucket
+
+    def hit(self, user_id, action_type):
+        """Реєструє дію і повертає (дозволено, секунд до наступної спроби).
+
+        Дії без ліміту в SPAM_LIMITS завжди дозволені. Відхилена дія не
+        записується, тому не подовжує блокування.
+        """
+        if action_type not in self.limits:
+            return True, 0
+        limit = self.limits[action_type]['limit']
+        window = self._window(action_type)
+        now = self.clock()
+        bucket = self._bucket((user_id, action_type), limit)
+        # У буфері не більше limit останніх дій; якщо найстаріша з них
+        # ще у вікні — ліміт вичерпано
+        if len(bucket) >= limit and now - bucket[0] < window:
+            return False, window - (now - bucket[0])
+        bucket.append(now)
+        return True, 0
+
+    def snapshot(self):
+        """Повертає рядки (user_id, action_type, created_at) дій, що ще у вікні."""
+        now = self.clock()
+        rows = []
+        for (user_id, action_type), bucket in self._hits.items():
+            if action_type not in self.limits:
+                continue
+            window = self._window(action_type)
+            for ts in bucket:
+                if now - ts < window:
+                    rows.append((user_id, action_type, datetime.fromtimestamp(ts).isoformat()))
+        return rows
+
+    def restore(self, rows):
+        """Відновлює стан з рядків snapshot() (рядки мають бути впорядковані за часом)."""
+        for user_id, action_type, created_at in rows:
+            if action_type not in self.limits:
+                continue
+            try:
+                ts = datetime.fromisoformat(created_at).timestamp()
+            except (TypeError, ValueError):
+                continue
+            self._bucket((user_id, action_type), self.limits[action_type]['limit']).append(ts)
+
+    async def save_to_db(self):
+        rows = self.snapshot()
+        await async_db.save_spam_snapshot(rows)
+        logger.info(f"Стан спам захисту збережено ({len(rows)} записів)")
+
+    async def restore_from_db(self):
+        rows = await async_db.load_spam_snapshot()
+        self.restore(rows)
+        logger.info(f"Стан спам захисту відновлено ({len(rows)} записів)")
+
+
+# Глобальний екземпляр
+rate_limiter = SlidingWindowLimiter()
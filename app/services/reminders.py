@@ -0,0 +1,181 @@
+"""Планувальник нагадувань.
+
+Час усіх невідправлених нагадувань тримається в min-heap (heapq) за
+scheduled_at. Фонова задача спить рівно до найближчого нагадування, а
+add_reminder() будить її одразу, тож нагадування йде через секунди після
+настання часу, а не при наступному погодинному проході автоматизації.
+Відправка — паралельна, з лімітами Telegram (app.services.sender).
+
+Таблиця reminders лишається джерелом істини: при старті heap
+заповнюється з неї, а при спрацюванні відправляються всі нагадування з
+scheduled_at <= now, які ще не позначені як відправлені.
+"""
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime
+
+from aiogram import Bot
+
+from app import async_db
+from app.config import Config
+from app.services.sender import get_sender, is_permanent_error
+
+logger = logging.getLogger(__name__)
+
+
+def _timestamp(scheduled_at):
+    """scheduled_at (ISO-рядок) -> unix-час; нерозібраний час вважаємо настав."""
+    try:
+        return datetime.fromisoformat(scheduled_at).timestamp()
+    except (TypeError, ValueError):
+        return 0
+
+
+class ReminderScheduler:
+    def __init__(self, bot: Bot, clock=time.time):
+        self.bot = bot
+        self.sender = get_sender(bot)
+        self.clock = clock
+        self._heap = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    async def start(self):
+        """Завантажує невідправлені нагадування з БД і запускає фонову задачу."""
+        await self.resync()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        logger.info(f"Планувальник нагадувань запущено ({len(self._heap)} в черзі)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("Планувальник нагадувань зупинено")
+
+    async def resync(self):
+        """Перебудовує heap з таблиці reminders (після перезапуску)."""
+        rows = await async_db.get_unsent_reminders()
+        self._heap = [(_timestamp(row.scheduled_at), row.id) for row in rows]
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def schedule(self, reminder_id, scheduled_at):
+        """Додає нагадування в heap і будить задачу, якщо воно стало найближчим."""
+        when = _timestamp(scheduled_at)
+        heapq.heappush(self._heap, (when, reminder_id))
+        if self._heap[0] == (when, reminder_id):
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            due = []
+            try:
+                self._wakeup.clear()
+                timeout = self._heap[0][0] - self.clock() if self._heap else None
+                if timeout is None or timeout > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                # Знімаємо з heap усе, що вже настало, і відправляємо
+                now = self.clock()
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap))
+                await self.process_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Помилка планувальника нагадувань: {e}")
+                # Зняті нагадування не відправлено (наприклад, БД заблокована) —
+                # повертаємо їх у heap, щоб повторити після паузи
+                for entry in due:
+                    heapq.heappush(self._heap, entry)
+                await asyncio.sleep(Config.REMINDER_RETRY_DELAY)
+
+    async def process_due(self):
+        """Відправляє всі нагадування, час яких настав.
+
+        Відправки йдуть паралельно через RateLimitedSender (ліміти Telegram
+        дотримує він). Успішні id позначаються порціями по REMINDER_ACK_BATCH
+        одним UPDATE, невдалі — одним executemany наприкінці.
+        """
+        reminders = await async_db.get_pending_reminders()
+        if not reminders:
+            return
+        sent_ids = []
+        failures = []
+
+        async def flush_sent():
+            if sent_ids:
+                batch = sent_ids[:]
+                sent_ids.clear()
+                await async_db.mark_reminders_sent(batch)
+
+        async def deliver(reminder):
+            try:
+                await self.sender.send_message(reminder.user_id, reminder.message)
+            except Exception as e:
+                permanent = is_permanent_error(e)
+                attempts = reminder.attempts + 1
+                retry_at = None
+                if permanent or attempts >= Config.REMINDER_MAX_ATTEMPTS:
+                    logger.error(f"Нагадування {reminder.id} не відправлено остаточно: {e}")
+                else:
+                    # Повторна спроба з експоненційною затримкою
+                    delay = Config.REMINDER_RETRY_DELAY * 2 ** (attempts - 1)
+                    when = self.clock() + delay
+                    retry_at = datetime.fromtimestamp(when).isoformat()
+                    heapq.heappush(self._heap, (when, reminder.id))
+                    logger.warning(f"Нагадування {reminder.id}: помилка ({e}), повтор через {delay} с")
+                failures.append((reminder.id, str(e), permanent, retry_at))
+                return
+            sent_ids.append(reminder.id)
+            if len(sent_ids) >= Config.REMINDER_ACK_BATCH:
+                await flush_sent()
+
+        try:
+            await asyncio.gather(*(deliver(reminder) for reminder in reminders))
+        finally:
+            await flush_sent()
+            if failures:
+                await async_db.mark_reminders_failed(failures, Config.REMINDER_MAX_ATTEMPTS)
+        logger.info(f"Нагадування: відправлено {len(reminders) - len(failures)}, помилок {len(failures)}")
+
+
+# Глобальний екземпляр (створюється в start_reminder_scheduler)
+reminder_scheduler = None
+
+
+async def add_reminder(user_id, order_id, reminder_type, scheduled_at, message):
+    """Зберігає нагадування в БД і одразу ставить його в планувальник.
+
+    Повертає id нагадування або None, якщо таке (order_id, reminder_type) вже є.
+    """
+    reminder_id = await async_db.add_reminder(user_id, order_id, reminder_type, scheduled_at, message)
+    if reminder_id is not None and reminder_scheduler is not None:
+        reminder_scheduler.schedule(reminder_id, scheduled_at)
+    return reminder_id
+
+
+async def start_reminder_scheduler(bot: Bot):
+    global reminder_scheduler
+    reminder_scheduler = ReminderScheduler(bot)
+    await reminder_scheduler.start()
+
+
+async def stop_reminder_scheduler():
+    global reminder_scheduler
+    if reminder_scheduler is not None:
+        await reminder_scheduler.stop()
+        reminder_scheduler = None
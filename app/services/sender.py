@@ -0,0 +1,119 @@
+"""Відправка повідомлень з урахуванням лімітів Telegram.
+
+Bot API дозволяє близько 30 повідомлень на секунду загалом і не частіше
+одного повідомлення на секунду в один чат. RateLimitedSender тримає:
+
+* глобальне "відро токенів" на SEND_GLOBAL_RATE повідомлень/с;
+* для кожного чату час, раніше якого наступне повідомлення не піде
+  (SEND_PER_CHAT_INTERVAL);
+* семафор на SEND_CONCURRENCY одночасних запитів.
+
+TelegramRetryAfter (429) чекає стільки, скільки сказав Telegram;
+мережеві та серверні помилки повторюються з експоненційною затримкою.
+Постійні помилки (бот заблокований, чат не знайдено) не повторюються —
+див. is_permanent_error(); хто заблокував бота, позначається в users.
+"""
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramNetworkError,
+    TelegramRetryAfter, TelegramServerError
+)
+
+from app.config import Config
+from app.services.user_tracker import user_tracker
+
+logger = logging.getLogger(__name__)
+
+# Помилки, після яких повтор не допоможе
+PERMANENT_ERRORS = (TelegramForbiddenError, TelegramBadRequest)
+# Тимчасові помилки, які варто повторити
+TRANSIENT_ERRORS = (TelegramNetworkError, TelegramServerError)
+
+
+def is_permanent_error(error):
+    return isinstance(error, PERMANENT_ERRORS)
+
+
+class RateLimitedSender:
+    def __init__(self, bot: Bot, global_rate=None, per_chat_interval=None,
+                 concurrency=None, max_attempts=None, backoff_base=None):
+        self.bot = bot
+        self.global_rate = global_rate or Config.SEND_GLOBAL_RATE
+        self.per_chat_interval = Config.SEND_PER_CHAT_INTERVAL if per_chat_interval is None else per_chat_interval
+        self.max_attempts = max_attempts or Config.SEND_MAX_ATTEMPTS
+        self.backoff_base = Config.SEND_BACKOFF_BASE if backoff_base is None else backoff_base
+        self._semaphore = asyncio.Semaphore(concurrency or Config.SEND_CONCURRENCY)
+        self._tokens = float(self.global_rate)
+        self._refilled_at = None
+        self._chat_next = {}
+
+    async def _acquire_global(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if self._refilled_at is not None:
+                self._tokens = min(
+                    float(self.global_rate),
+                    self._tokens + (now - self._refilled_at) * self.global_rate
+                )
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.global_rate)
+
+    async def _acquire_chat(self, chat_id):
+        """Резервує наступний вільний слот для чату і чекає на нього."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._chat_next.get(chat_id, now))
+        self._chat_next[chat_id] = slot + self.per_chat_interval
+        if len(self._chat_next) > Config.SEND_CHAT_SLOTS_MAX:
+            # Прибираємо чати, слоти яких уже минули
+            self._chat_next = {k: v for k, v in self._chat_next.items() if v > now}
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def call(self, chat_id, method, *args, **kwargs):
+        """Викликає метод бота для chat_id з лімітами та повторними спробами."""
+        attempt = 0
+        while True:
+            await self._acquire_chat(chat_id)
+            async with self._semaphore:
+                await self._acquire_global()
+                try:
+                    return await method(chat_id, *args, **kwargs)
+                except TelegramForbiddenError:
+                    # Користувач заблокував бота — більше йому не відправляємо
+                    if isinstance(chat_id, int) and chat_id > 0:
+                        user_tracker.mark_blocked(chat_id)
+                    raise
+                except TelegramRetryAfter as e:
+                    # 429 не рахуємо як невдалу спробу: Telegram сам каже, скільки чекати
+                    logger.warning(f"Ліміт Telegram для чату {chat_id}, чекаємо {e.retry_after} с")
+                    retry_after = e.retry_after
+                except TRANSIENT_ERRORS as e:
+                    attempt += 1
+                    if attempt >= self.max_attempts:
+                        raise
+                    retry_after = self.backoff_base * 2 ** (attempt - 1)
+                    logger.warning(f"Помилка відправки в чат {chat_id} ({e}), повтор через {retry_after} с")
+            await asyncio.sleep(retry_after)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        return await self.call(chat_id, self.bot.send_message, text, **kwargs)
+
+
+_senders = {}
+
+
+def get_sender(bot: Bot):
+    """Повертає спільний RateLimitedSender для бота (ліміти спільні для всіх відправок)."""
+    sender = _senders.get(id(bot))
+    if sender is None or sender.bot is not bot:
+        sender = RateLimitedSender(bot)
+        _senders[id(bot)] = sender
+    return sender
@@ -0,0 +1,102 @@
+"""Облік користувачів бота (таблиця users).
+
+UserTrackingMiddleware викликає touch() для кожного апдейту — це лише
+запис у словник у пам'яті, без звернення до БД. Фонова задача раз на
+USERS_FLUSH_INTERVAL секунд записує накопичені зміни одним executemany.
+
+Запис дебаунситься: якщо профіль користувача не змінився, повторна
+активність пишеться не частіше ніж раз на USERS_TOUCH_DEBOUNCE секунд.
+Позначки "заблокував бота" (mark_blocked) пишуться тим самим пакетом.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from app import async_db
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class UserTracker:
+    def __init__(self, flush_interval=None, debounce=None, cache_size=None, clock=time.monotonic):
+        self.flush_interval = flush_interval or Config.USERS_FLUSH_INTERVAL
+        self.debounce = Config.USERS_TOUCH_DEBOUNCE if debounce is None else debounce
+        self.cache_size = cache_size or Config.USERS_CACHE_SIZE
+        self.clock = clock
+        self._pending = {}
+        self._blocked = set()
+        # user_id -> (профіль, час останнього запису) для дебаунсу, LRU
+        self._seen = OrderedDict()
+        self._task = None
+        self._loop = None
+
+    def _ensure_started(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._loop is not loop:
+            self._loop = loop
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    def touch(self, user):
+        """Реєструє активність користувача (aiogram.types.User)."""
+        if user is None or user.is_bot:
+            return
+        profile = (user.username, user.first_name, user.last_name, user.language_code)
+        now = self.clock()
+        seen = self._seen.get(user.id)
+        if seen is not None:
+            self._seen.move_to_end(user.id)
+            if seen[0] == profile and now - seen[1] < self.debounce and user.id not in self._blocked:
+                return
+        self._seen[user.id] = (profile, now)
+        if len(self._seen) > self.cache_size:
+            self._seen.popitem(last=False)
+        self._blocked.discard(user.id)
+        self._pending[user.id] = (user.id, *profile, datetime.now().isoformat())
+        self._ensure_started()
+
+    def mark_blocked(self, user_id):
+        """Позначає, що користувач заблокував бота (TelegramForbiddenError)."""
+        self._pending.pop(user_id, None)
+        self._seen.pop(user_id, None)
+        self._blocked.add(user_id)
+        self._ensure_started()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Записує накопичені зміни в БД."""
+        pending, self._pending = list(self._pending.values()), {}
+        blocked, self._blocked = list(self._blocked), set()
+        try:
+            if pending:
+                await async_db.upsert_users(pending)
+            if blocked:
+                await async_db.mark_users_blocked(blocked)
+        except Exception as e:
+            logger.error(f"Помилка запису користувачів ({len(pending)} + {len(blocked)}): {e}")
+
+    async def stop(self):
+        """Зупиняє фонову задачу і дописує все накопичене."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+# Глобальний екземпляр
+user_tracker = UserTracker()
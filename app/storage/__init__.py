@@ -0,0 +1,19 @@
+from app.config import Config
+from .buffered import BufferedFSMContext
+from .memory import BoundedMemoryStorage
+from .sqlite import SQLiteStorage
+
+
+def create_storage():
+    """FSM-сховище згідно з Config.FSM_STORAGE ('sqlite' або 'memory')."""
+    if Config.FSM_STORAGE == 'memory':
+        return BoundedMemoryStorage()
+    return SQLiteStorage()
+
+
+__all__ = [
+    'BufferedFSMContext',
+    'BoundedMemoryStorage',
+    'SQLiteStorage',
+    'create_storage'
+]
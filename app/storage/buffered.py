@@ -0,0 +1,113 @@
+"""FSMContext, який накопичує зміни в межах одного апдейта.
+
+Обробник часто викликає state.update_data кілька разів поспіль
+(last_user_message_id, потім price/discount, потім last_bot_message_id),
+і кожен виклик — це окремі get_data + set_data у сховищі. BufferedFSMContext
+читає стан і дані зі сховища щонайбільше раз, тримає зміни в пам'яті й
+записує їх одним set_state та одним set_data у flush() — і лише якщо
+вони відрізняються від прочитаного (state.clear() для порожнього
+контексту нічого не пише). Його створює
+BufferedStateMiddleware (app/middlewares/buffered_state.py) і викликає
+flush() після завершення обробника.
+
+Два апдейти одного користувача можуть оброблятися одночасно (подвійне
+натискання кнопки). Тому після update_data flush() перечитує дані зі
+сховища і переносить на них лише ключі, змінені цим обробником, — ключі,
+які встиг записати інший апдейт, не затираються. set_data() і clear()
+замінюють дані повністю, як і без буфера.
+"""
+from copy import copy, deepcopy
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.memory import DataNotDictLikeError
+
+_MISSING = object()
+
+
+class BufferedFSMContext(FSMContext):
+    def __init__(self, storage, key, raw_state=_MISSING):
+        super().__init__(storage, key)
+        # raw_state уже прочитав FSMContextMiddleware — не читаємо вдруге
+        self._state = raw_state
+        self._stored_state = raw_state
+        self._data = None
+        self._stored_data = None
+        self._state_changed = False
+        self._data_changed = False
+        self._data_replaced = False
+
+    @property
+    def has_pending(self):
+        return self._state_changed or self._data_changed
+
+    async def get_state(self):
+        if self._state is _MISSING:
+            self._state = self._stored_state = await self.storage.get_state(key=self.key)
+        return self._state
+
+    async def set_state(self, state=None) -> None:
+        self._state = state.state if isinstance(state, State) else state
+        self._state_changed = True
+
+    async def _load_data(self):
+        if self._data is None:
+            self._data = await self.storage.get_data(key=self.key)
+            # Глибока копія: обробники змінюють вкладені списки на місці
+            self._stored_data = deepcopy(self._data)
+        return self._data
+
+    async def get_data(self):
+        return (await self._load_data()).copy()
+
+    async def get_value(self, key, default=None):
+        return copy((await self._load_data()).get(key, default))
+
+    async def set_data(self, data) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+        self._data = data.copy()
+        self._data_changed = True
+        self._data_replaced = True
+
+    async def update_data(self, data=None, **kwargs):
+        if data:
+            kwargs.update(data)
+        current = await self._load_data()
+        current.update(kwargs)
+        self._data_changed = True
+        return current.copy()
+
+    async def flush(self):
+        """Записує в сховище те, що відрізняється від прочитаного."""
+        if self._state_changed:
+            if self._state != self._stored_state:
+                await self.storage.set_state(key=self.key, state=self._state)
+                self._stored_state = self._state
+            self._state_changed = False
+        if self._data_changed:
+            if self._data_replaced:
+                if self._data != self._stored_data:
+                    await self.storage.set_data(key=self.key, data=self._data)
+            else:
+                await self._merge_changed_keys()
+            self._stored_data = deepcopy(self._data)
+            self._data_changed = self._data_replaced = False
+
+    async def _merge_changed_keys(self):
+        changed = [
+            key for key in self._data.keys() | self._stored_data.keys()
+            if self._data.get(key, _MISSING) != self._stored_data.get(key, _MISSING)
+        ]
+        if not changed:
+            return
+        # Свіжі дані: паралельний апдейт міг записати інші ключі
+        data = await self.storage.get_data(key=self.key)
+        for key in changed:
+            if key in self._data:
+                data[key] = self._data[key]
+            else:
+                data.pop(key, None)
+        await self.storage.set_data(key=self.key, data=data)
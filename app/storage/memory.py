@@ -0,0 +1,136 @@
+"""FSM-сховище в пам'яті з обмеженим обсягом.
+
+Заміна aiogram MemoryStorage, у якого кожен користувач, що хоч раз
+написав боту, назавжди лишає в пам'яті запис (навіть порожній — його
+створює вже get_state). Тут:
+
+* порожні контексти (без стану й даних) не зберігаються взагалі;
+* дані зберігаються компактно — одним рядком JSON у bytes замість
+  словника Python (ті самі типи, що повертає SQLiteStorage);
+* записи лежать в LRU (OrderedDict): контексти без звернень довше
+  FSM_MEMORY_IDLE_TTL видаляються, а при перевищенні FSM_MEMORY_MAX_CONTEXTS
+  або бюджету FSM_MEMORY_MAX_BYTES витісняються найдавніші.
+
+stats() повертає кількість живих контекстів, зайняті байти та лічильники
+витіснень.
+"""
+import json
+import time
+from collections import OrderedDict
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import DataNotDictLikeError
+
+from app.config import Config
+
+# Приблизні накладні витрати на запис: StorageKey, вузол OrderedDict, _Entry
+ENTRY_OVERHEAD = 256
+
+
+def encode_data(data):
+    if not data:
+        return None
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str).encode()
+
+
+def decode_data(blob):
+    return json.loads(blob) if blob else {}
+
+
+class _Entry:
+    __slots__ = ('state', 'blob', 'touched_at', 'size')
+
+    def __init__(self, state, blob, touched_at):
+        self.state = state
+        self.blob = blob
+        self.touched_at = touched_at
+        self.size = ENTRY_OVERHEAD + len(state or '') + len(blob or b'')
+
+
+class BoundedMemoryStorage(BaseStorage):
+    def __init__(self, max_contexts=None, max_bytes=None, idle_ttl=None, clock=time.monotonic):
+        self.max_contexts = max_contexts or Config.FSM_MEMORY_MAX_CONTEXTS
+        self.max_bytes = max_bytes or Config.FSM_MEMORY_MAX_BYTES
+        self.idle_ttl = idle_ttl or Config.FSM_MEMORY_IDLE_TTL
+        self.clock = clock
+        self._entries = OrderedDict()
+        self.bytes_used = 0
+        self.evicted_idle = 0
+        self.evicted_budget = 0
+
+    def stats(self):
+        return {
+            'contexts': len(self._entries),
+            'bytes': self.bytes_used,
+            'evicted_idle': self.evicted_idle,
+            'evicted_budget': self.evicted_budget,
+        }
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = self.clock()
+        if now - entry.touched_at > self.idle_ttl:
+            del self._entries[key]
+            self.bytes_used -= entry.size
+            self.evicted_idle += 1
+            return None
+        entry.touched_at = now
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key, state, blob):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes_used -= old.size
+        now = self.clock()
+        if state is not None or blob is not None:
+            entry = _Entry(state, blob, now)
+            self._entries[key] = entry
+            self.bytes_used += entry.size
+        self._evict(now)
+
+    def _evict(self, now):
+        entries = self._entries
+        # Найдавніші — на початку: спершу прострочені
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if now - entry.touched_at <= self.idle_ttl:
+                break
+            del entries[key]
+            self.bytes_used -= entry.size
+            self.evicted_idle += 1
+        # Потім — понад ліміти (щойно записаний контекст лишається)
+        while len(entries) > 1 and (len(entries) > self.max_contexts or self.bytes_used > self.max_bytes):
+            _, entry = entries.popitem(last=False)
+            self.bytes_used -= entry.size
+            self.evicted_budget += 1
+
+    async def set_state(self, key: StorageKey, state=None) -> None:
+        entry = self._get(key)
+        state = state.state if isinstance(state, State) else state
+        self._put(key, state, entry.blob if entry else None)
+
+    async def get_state(self, key: StorageKey):
+        entry = self._get(key)
+        return entry.state if entry else None
+
+    async def set_data(self, key: StorageKey, data) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+        entry = self._get(key)
+        self._put(key, entry.state if entry else None, encode_data(data))
+
+    async def get_data(self, key: StorageKey):
+        entry = self._get(key)
+        return decode_data(entry.blob) if entry else {}
+
+    async def get_value(self, storage_key: StorageKey, dict_key: str, default=None):
+        return (await self.get_data(storage_key)).get(dict_key, default)
+
+    async def close(self) -> None:
+        pass
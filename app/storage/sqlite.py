@@ -0,0 +1,201 @@
+"""FSM-сховище aiogram у SQLite з кешем у пам'яті та відкладеним записом.
+
+Стан і дані FSM (незавершені замовлення, діалоги підтримки) зберігаються
+в таблиці fsm_storage, тому переживають перезапуск бота. При цьому
+обробники не чекають на БД:
+
+* читання йде з кешу; з БД запис читається лише при першому зверненні
+  до ключа після старту (або після вивантаження з кешу), причому
+  одночасні звернення до одного ключа читають БД один раз;
+* зміни лише позначають ключ "брудним", а фонова задача раз на
+  FSM_FLUSH_INTERVAL секунд записує всі брудні ключі однією транзакцією.
+  Якщо ключ за цей час змінювався кілька разів, пишеться тільки
+  останній стан. Записи без стану й даних видаляються.
+
+Раз на FSM_PURGE_INTERVAL з кешу вивантажуються записи без звернень
+довше FSM_CACHE_IDLE, а з БД видаляються стани, які не змінювались
+довше FSM_STATE_TTL. close() дописує незбережені зміни.
+
+Дані зберігаються як JSON: кортежі (рядки з БД) повертаються списками,
+а невідомі типи — рядками.
+"""
+import asyncio
+import json
+import logging
+import time
+from copy import copy
+from datetime import datetime, timedelta
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import DataNotDictLikeError
+
+from app import async_db
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def storage_key_to_str(key: StorageKey) -> str:
+    """Рядковий ключ fsm_storage з полів StorageKey."""
+    parts = (key.bot_id, key.chat_id, key.user_id, key.thread_id,
+             key.business_connection_id, key.destiny)
+    return ':'.join('' if part is None else str(part) for part in parts)
+
+
+class _Record:
+    __slots__ = ('state', 'data', 'touched_at')
+
+    def __init__(self, state, data, touched_at):
+        self.state = state
+        self.data = data
+        self.touched_at = touched_at
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(self, flush_interval=None, ttl=None, cache_idle=None, purge_interval=None,
+                 clock=time.monotonic):
+        self.flush_interval = flush_interval or Config.FSM_FLUSH_INTERVAL
+        self.ttl = ttl or Config.FSM_STATE_TTL
+        self.cache_idle = cache_idle or Config.FSM_CACHE_IDLE
+        self.purge_interval = purge_interval or Config.FSM_PURGE_INTERVAL
+        self.clock = clock
+        self._records = {}
+        self._dirty = set()
+        self._loading = {}
+        self._purged_at = None
+        self._task = None
+        self._loop = None
+
+    def _ensure_started(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._loop is not loop:
+            self._loop = loop
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    async def _get_record(self, key: StorageKey):
+        skey = storage_key_to_str(key)
+        record = self._records.get(skey)
+        if record is None:
+            record = await self._load(skey)
+        record.touched_at = self.clock()
+        return skey, record
+
+    async def _load(self, skey):
+        task = self._loading.get(skey)
+        if task is None:
+            task = asyncio.ensure_future(async_db.load_fsm_record(skey))
+            self._loading[skey] = task
+            try:
+                row = await task
+            finally:
+                self._loading.pop(skey, None)
+        else:
+            row = await task
+        # Поки читали БД, запис могла створити інша задача
+        record = self._records.get(skey)
+        if record is None:
+            if row is not None:
+                record = _Record(row.state, json.loads(row.data), self.clock())
+            else:
+                record = _Record(None, {}, self.clock())
+            self._records[skey] = record
+        self._ensure_started()
+        return record
+
+    def _mark_dirty(self, skey):
+        self._dirty.add(skey)
+        self._ensure_started()
+
+    async def set_state(self, key: StorageKey, state=None) -> None:
+        skey, record = await self._get_record(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(skey)
+
+    async def get_state(self, key: StorageKey):
+        _, record = await self._get_record(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+        skey, record = await self._get_record(key)
+        record.data = data.copy()
+        self._mark_dirty(skey)
+
+    async def get_data(self, key: StorageKey):
+        _, record = await self._get_record(key)
+        return record.data.copy()
+
+    async def get_value(self, storage_key: StorageKey, dict_key: str, default=None):
+        _, record = await self._get_record(storage_key)
+        return copy(record.data.get(dict_key, default))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if self._purged_at is None or self.clock() - self._purged_at >= self.purge_interval:
+                await self.purge()
+
+    async def flush(self):
+        """Записує змінені стани в БД однією транзакцією."""
+        if not self._dirty:
+            return
+        keys, self._dirty = self._dirty, set()
+        now = datetime.now().isoformat()
+        upserts, deletes = [], []
+        for skey in keys:
+            record = self._records.get(skey)
+            if record is None:
+                continue
+            if record.state is None and not record.data:
+                deletes.append(skey)
+                continue
+            try:
+                data = json.dumps(record.data, ensure_ascii=False, default=str)
+            except ValueError as e:
+                logger.error(f"Не вдалося серіалізувати стан FSM {skey}: {e}")
+                continue
+            upserts.append((skey, record.state, data, now))
+        try:
+            await async_db.save_fsm_records(upserts, deletes)
+        except Exception as e:
+            # Повторимо з наступним пакетом
+            self._dirty |= keys
+            logger.error(f"Помилка запису стану FSM ({len(upserts)} + {len(deletes)}): {e}")
+
+    async def purge(self):
+        """Вивантажує з кешу давно не використані записи і видаляє з БД застарілі."""
+        self._purged_at = self.clock()
+        idle_before = self._purged_at - self.cache_idle
+        idle = [skey for skey, record in self._records.items()
+                if record.touched_at < idle_before and skey not in self._dirty]
+        for skey in idle:
+            del self._records[skey]
+        before = (datetime.now() - timedelta(seconds=self.ttl)).isoformat()
+        try:
+            removed = await async_db.purge_fsm_records(before)
+        except Exception as e:
+            logger.error(f"Помилка очищення стану FSM: {e}")
+            return
+        if idle or removed:
+            logger.info(f"FSM: вивантажено з кешу {len(idle)}, видалено застарілих {removed}")
+
+    async def close(self) -> None:
+        """Зупиняє фонову задачу і дописує незбережені зміни."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,56 @@
+"""Розбір дедлайнів замовлень.
+
+Користувач вводить дедлайн вільним текстом ("25.12.2025", "2025-12-25"
+тощо). В orders.deadline зберігається введений текст, а в
+orders.deadline_date — нормалізована дата ISO (YYYY-MM-DD), за якою
+автоматизація вибирає замовлення прямо в SQL.
+
+parse_deadline() — єдиний розбір дедлайну для валідації, розрахунку ціни
+та автоматизації, тож однаковий текст скрізь або розпізнається, або ні.
+Замість перебору форматів через strptime (кожна невдала спроба — виняток)
+використовуються два заздалегідь скомпільовані регулярні вирази, а
+результати кешуються: користувачі здебільшого вводять ті самі дати.
+
+Підтримувані формати (роздільник ".", "/", "-" або пробіл, однаковий
+в одній даті):
+    ДД.ММ.РРРР, ДД.ММ.РР (рік 20РР), РРРР.ММ.ДД
+"""
+import functools
+import re
+from datetime import date
+
+_DAY_FIRST = re.compile(r'(\d{1,2})([./\- ])(\d{1,2})\2(\d{4}|\d{2})')
+_YEAR_FIRST = re.compile(r'(\d{4})([./\- ])(\d{1,2})\2(\d{1,2})')
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse(text):
+    match = _DAY_FIRST.fullmatch(text)
+    if match:
+        day, _, month, year = match.groups()
+        year = int(year)
+        if year < 100:  # Якщо рік двозначний
+            year += 2000
+    else:
+        match = _YEAR_FIRST.fullmatch(text)
+        if not match:
+            return None
+        year, _, month, day = match.groups()
+        year = int(year)
+    try:
+        return date(year, int(month), int(day))
+    except ValueError:  # 31.02, 00.13 тощо
+        return None
+
+
+def parse_deadline(deadline_str):
+    """Парсить дедлайн; повертає date або None, якщо формат не розпізнано."""
+    if not isinstance(deadline_str, str):
+        return None
+    return _parse(deadline_str.strip())
+
+
+def to_deadline_date(deadline_str):
+    """Текст дедлайну -> 'YYYY-MM-DD' для orders.deadline_date (або None)."""
+    parsed = parse_deadline(deadline_str)
+    return parsed.isoformat() if parsed else None
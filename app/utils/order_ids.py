@@ -0,0 +1,64 @@
+"""Неперебірні унікальні номери замовлень.
+
+Номер замовлення — це ключова перестановка значення лічильника: i-те
+замовлення отримує номер permute(i). Перестановка взаємно однозначна,
+тому різні значення лічильника ніколи не дають однаковий номер, а без
+секретного ключа наступний номер не вгадати.
+
+Перестановка — шифр Фейстеля на Z_a × Z_b (схема FE1), де a * b дорівнює
+кількості d-значних чисел, тож обчислення завжди займає сталий час без
+повторних спроб. Спочатку видаються 5-значні номери (10000–99999); коли
+лічильник вичерпує цей простір (90 000 замовлень), видача переходить на
+6-значні номери, потім на 7-значні і так далі.
+"""
+import hashlib
+import hmac
+
+FIRST_DIGITS = 5
+ROUNDS = 4
+
+
+def _domain(digits):
+    """Повертає (розмір, a, b) простору d-значних номерів, де розмір = a * b."""
+    m = digits - 1
+    size = 9 * 10 ** m
+    if m % 2:
+        a = 9 * 10 ** ((m - 1) // 2)
+    else:
+        a = 3 * 10 ** (m // 2)
+    return size, a, size // a
+
+
+def _round_value(key, round_no, value, modulus):
+    digest = hmac.new(key, f"{round_no}:{value}".encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], 'big') % modulus
+
+
+def permute(index, key, digits=FIRST_DIGITS):
+    """Ключова перестановка чисел [0, 9 * 10**(digits-1))."""
+    size, a, b = _domain(digits)
+    if not 0 <= index < size:
+        raise ValueError(f"Індекс {index} поза простором {digits}-значних номерів")
+    x = index
+    for round_no in range(ROUNDS):
+        left, right = divmod(x, b)
+        x = a * right + (left + _round_value(key, round_no, right, a)) % a
+    return x
+
+
+def order_number(counter, key):
+    """Перетворює значення лічильника (від 0) на номер замовлення.
+
+    Перші 90 000 значень дають 5-значні номери, наступні 900 000 — 6-значні
+    і т.д., тому простір номерів ніколи не закінчується.
+    """
+    if counter < 0:
+        raise ValueError("Лічильник не може бути від'ємним")
+    digits = FIRST_DIGITS
+    offset = counter
+    while True:
+        size, _, _ = _domain(digits)
+        if offset < size:
+            return 10 ** (digits - 1) + permute(offset, key, digits)
+        offset -= size
+        digits += 1
@@ -6,6 +6,8 @@ from aiogram import Bot
 from aiogram.fsm.context import FSMContext
 import logging
 
+from app.utils.deadlines import parse_deadline
+
 def is_command(text: str) -> bool:
     return isinstance(text, str) and text.strip().startswith("/")
 
@@ -47,26 +49,13 @@ def validate_deadline(deadline: str) -> Tuple[bool, str]:
     if is_command(deadline):
         return None, COMMAND_INPUT
 
-    # Спробуємо різні формати дат
-    formats = [
-        "%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y",
-        "%Y-%m-%d", "%Y.%m.%d", "%Y/%m/%d"
-    ]
-    
-    parsed_date = None
-    for fmt in formats:
-        try:
-            parsed_date = datetime.strptime(deadline, fmt)
-            break
-        except ValueError:
-            continue
-            
+    parsed_date = parse_deadline(deadline)
     if parsed_date is None:
         return False, "Невірний формат дати. Використовуйте формат ДД.ММ.РРРР, наприклад: 10.10.2010"
 
-    if parsed_date.date() < datetime.now().date():
+    if parsed_date < datetime.now().date():
         return False, "Дедлайн не може бути в минулому Повторіть ввід у форматі ДД.ММ.РРРР"
-    if parsed_date.date() > datetime.now().date() + timedelta(days=365*2): # Дозволимо до 2-х років
+    if parsed_date > datetime.now().date() + timedelta(days=365*2): # Дозволимо до 2-х років
         return False, "Дедлайн не може бути більше двох років вперед Повторіть ввід у форматі ДД.ММ.РРРР"
         
     return True, "OK"
@@ -0,0 +1,132 @@
+"""Режим webhook — альтернатива long polling (Config.BOT_MODE = 'webhook').
+
+Telegram сам надсилає апдейти POST-запитами на WEBHOOK_BASE_URL +
+WEBHOOK_PATH. Запит перевіряється за заголовком
+X-Telegram-Bot-Api-Secret-Token, і Telegram одразу отримує 200, а апдейт
+обробляється у фоновій задачі (handle_in_background), тож повільний
+обробник не затримує наступні апдейти.
+
+Під час зупинки нові запити отримують 503 (Telegram повторить їх після
+перезапуску), а вже прийняті апдейти дообробляються протягом
+WEBHOOK_DRAIN_TIMEOUT секунд. Фонові задачі бота зупиняє bot.py після
+виходу з run_webhook().
+
+Локальна перевірка без реєстрації в Telegram: не задавати
+WEBHOOK_BASE_URL і надіслати записаний апдейт напряму, наприклад
+    curl -H "X-Telegram-Bot-Api-Secret-Token: $WEBHOOK_SECRET" \\
+         -H "Content-Type: application/json" \\
+         -d @update.json http://127.0.0.1:8080/webhook
+"""
+import asyncio
+import logging
+import secrets
+import signal
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class DrainingRequestHandler(SimpleRequestHandler):
+    """SimpleRequestHandler, який при зупинці дочікується апдейтів в обробці."""
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token=None, drain_timeout=None, **data):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.drain_timeout = Config.WEBHOOK_DRAIN_TIMEOUT if drain_timeout is None else drain_timeout
+        self.draining = False
+
+    @property
+    def in_flight(self):
+        return len(self._background_feed_update_tasks)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.draining:
+            return web.Response(status=503, text="Shutting down")
+        return await super().handle(request)
+
+    async def _background_feed_update(self, bot, update):
+        try:
+            await super()._background_feed_update(bot, update)
+        except Exception as e:
+            logger.error(f"Помилка обробки апдейта {update.get('update_id')}: {e}")
+
+    async def drain(self):
+        """Перестає приймати апдейти і чекає завершення вже прийнятих."""
+        self.draining = True
+        tasks = set(self._background_feed_update_tasks)
+        if not tasks:
+            return
+        logger.info(f"Дообробляємо {len(tasks)} апдейтів перед зупинкою")
+        _, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+        if pending:
+            logger.warning(f"{len(pending)} апдейтів не встигли обробитись за "
+                           f"{self.drain_timeout} с і скасовані")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def close(self):
+        # Сесію бота закриває bot.py після зупинки фонових задач
+        await self.drain()
+
+
+def create_webhook_app(dispatcher: Dispatcher, bot: Bot, path=None, secret_token=None):
+    """Створює aiohttp-застосунок з обробником webhook; повертає (app, handler)."""
+    app = web.Application()
+    handler = DrainingRequestHandler(dispatcher, bot, secret_token=secret_token)
+    handler.register(app, path=path or Config.WEBHOOK_PATH)
+    setup_application(app, dispatcher, bot=bot)
+    return app, handler
+
+
+async def run_webhook(dispatcher: Dispatcher, bot: Bot):
+    """Запускає HTTP-сервер webhook і працює до SIGINT/SIGTERM."""
+    base_url = Config.WEBHOOK_BASE_URL.rstrip('/')
+    secret_token = Config.WEBHOOK_SECRET or None
+    if base_url and secret_token is None:
+        # Telegram передаватиме його в кожному запиті
+        secret_token = secrets.token_urlsafe(32)
+    app, handler = create_webhook_app(dispatcher, bot, Config.WEBHOOK_PATH, secret_token)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, Config.WEBHOOK_HOST, Config.WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Webhook слухає {Config.WEBHOOK_HOST}:{Config.WEBHOOK_PORT}{Config.WEBHOOK_PATH}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    signals = (signal.SIGINT, signal.SIGTERM)
+    for sig in signals:
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: зупинка через KeyboardInterrupt
+    try:
+        if base_url:
+            await bot.set_webhook(
+                url=base_url + Config.WEBHOOK_PATH,
+                secret_token=secret_token,
+                allowed_updates=dispatcher.resolve_used_update_types(),
+                max_connections=Config.WEBHOOK_MAX_CONNECTIONS
+            )
+            logger.info(f"Webhook зареєстровано: {base_url}{Config.WEBHOOK_PATH}")
+        else:
+            logger.warning("WEBHOOK_BASE_URL не задано: webhook у Telegram не реєструється (локальний режим)")
+            if secret_token is None:
+                logger.warning("WEBHOOK_SECRET не задано: запити не перевіряються")
+        await stop.wait()
+        logger.info("Отримано сигнал зупинки")
+    finally:
+        # Спершу дообробляємо прийняті апдейти, потім зупиняємо сервер
+        await handler.drain()
+        await runner.cleanup()
+        for sig in signals:
+            try:
+                loop.remove_signal_handler(sig)
+            except (NotImplementedError, RuntimeError):
+                pass
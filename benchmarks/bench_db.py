@@ -0,0 +1,175 @@
+"""Бенчмарк гарячих функцій app.db на базі зі 100 000 рядків.
+
+"До" — запити з початкової версії app.db на початковій схемі (без
+міграцій та індексів), з новим з'єднанням sqlite3.connect на кожен виклик
+і журналом за замовчуванням. "Після" — поточні функції app.db на схемі з
+усіма міграціями та з довготривалими з'єднаннями потоку (WAL,
+synchronous=NORMAL, кеш сторінок, mmap, кеш підготовлених запитів).
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bench_db [--rows 100000] [--calls 2000]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+
+from app import db
+
+pooled_connection = db.get_db_connection
+
+
+def _baseline_connection():
+    return sqlite3.connect(db.DB_PATH, timeout=10)
+
+
+def baseline_add_order(user_id, first_name, username, phone_number, type_label, order_type,
+                       topic, subject, deadline, volume, requirements, price, files=None):
+    """add_order з початкової версії: випадковий id з перевіркою, без індексів."""
+    with closing(_baseline_connection()) as conn, conn:
+        c = conn.cursor()
+        now = datetime.now().isoformat()
+        while True:
+            order_id = random.randint(10000, 99999)
+            c.execute('SELECT 1 FROM orders WHERE id = ?', (order_id,))
+            if not c.fetchone():
+                break
+        c.execute('''INSERT INTO orders
+                    (id, user_id, first_name, username, phone_number, type_label, order_type,
+                     topic, subject, deadline, volume, requirements, files, price,
+                     status, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'draft', ?, ?)''',
+                  (order_id, user_id, first_name, username, phone_number, type_label, order_type,
+                   topic, subject, deadline, volume, requirements, json.dumps(files or []), price, now, now))
+        for file_id in files or []:
+            c.execute('''INSERT INTO order_files (order_id, file_id, uploaded_at)
+                        VALUES (?, ?, ?)''', (order_id, file_id, now))
+        c.execute('''INSERT INTO order_status_history (order_id, status, changed_at)
+                    VALUES (?, 'draft', ?)''', (order_id, now))
+        return order_id
+
+
+def baseline_get_orders(user_id):
+    with closing(_baseline_connection()) as conn:
+        return conn.execute('SELECT * FROM orders WHERE user_id = ? ORDER BY created_at DESC',
+                            (user_id,)).fetchall()
+
+
+def baseline_check_spam_protection(user_id, action_type, limit=5, window_minutes=5):
+    with closing(_baseline_connection()) as conn, conn:
+        c = conn.cursor()
+        now = datetime.now()
+        window_start = (now - timedelta(minutes=window_minutes)).isoformat()
+        c.execute('DELETE FROM spam_protection WHERE created_at < ?', (window_start,))
+        c.execute('''SELECT COUNT(*) FROM spam_protection
+                    WHERE user_id = ? AND action_type = ? AND created_at >= ?''',
+                  (user_id, action_type, window_start))
+        if c.fetchone()[0] >= limit:
+            return False
+        c.execute('''INSERT INTO spam_protection (user_id, action_type, created_at)
+                    VALUES (?, ?, ?)''', (user_id, action_type, now.isoformat()))
+        return True
+
+
+BASELINE = (baseline_add_order, baseline_get_orders, baseline_check_spam_protection)
+
+
+def seed(path, rows, migrate=True):
+    """Створює схему та заповнює orders і spam_protection синтетичними даними.
+
+    migrate=False — лише початкові таблиці init_db, без міграцій (індексів,
+    лічильника id, deadline_date, тригерів статистики).
+    """
+    db.DB_PATH = path
+    if migrate:
+        db.init_db()
+    else:
+        run_migrations = db.run_migrations
+        db.get_db_connection = _baseline_connection
+        db.run_migrations = lambda conn: None
+        try:
+            db.init_db()
+        finally:
+            db.run_migrations = run_migrations
+            db.get_db_connection = pooled_connection
+    conn = sqlite3.connect(path)
+    now = datetime.now()
+    orders = []
+    for i in range(rows):
+        created = (now - timedelta(minutes=rows - i)).isoformat()
+        orders.append((
+            1_000_000 + i, random.randint(1, rows // 10), 'User', 'user', '',
+            'Курсова робота', 'coursework', f'Тема {i}', 'Предмет', '01.01.2030',
+            '30', 'Вимоги ' * 20, '[]', 1500, random.choice(['draft', 'confirmed', 'in_progress']),
+            created, created
+        ))
+    conn.executemany('''INSERT INTO orders
+        (id, user_id, first_name, username, phone_number, type_label, order_type,
+         topic, subject, deadline, volume, requirements, files, price, status,
+         created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', orders)
+    spam = [
+        (random.randint(1, rows // 10), 'support_message', (now - timedelta(seconds=i % 240)).isoformat())
+        for i in range(rows)
+    ]
+    conn.executemany('INSERT INTO spam_protection (user_id, action_type, created_at) VALUES (?, ?, ?)', spam)
+    conn.commit()
+    conn.close()
+
+
+def bench(label, func, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    total = sum(samples)
+    print(f"  {label:<24} {calls / total:>10.0f} ops/s   "
+          f"p50 {statistics.median(samples) * 1e6:>8.0f} µs   "
+          f"p99 {sorted(samples)[int(len(samples) * 0.99) - 1] * 1e6:>8.0f} µs")
+
+
+def run_suite(title, rows, calls, functions):
+    print(title)
+    users = rows // 10
+    add_order, get_orders, check_spam_protection = functions
+    bench('add_order', lambda: add_order(
+        random.randint(1, users), 'User', 'user', '', 'Реферат', 'essay',
+        'Тема', 'Предмет', '01.01.2030', '10', 'Вимоги', 500, files=['f1']
+    ), calls)
+    bench('get_orders(user_id)', lambda: get_orders(random.randint(1, users)), calls)
+    bench('check_spam_protection', lambda: check_spam_protection(
+        random.randint(1, users), 'support_message', 5, 5
+    ), calls)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before_path = os.path.join(tmp, 'before.sqlite3')
+        after_path = os.path.join(tmp, 'after.sqlite3')
+
+        # "До": початкові схема й запити, окреме з'єднання на кожен виклик
+        seed(before_path, args.rows, migrate=False)
+        run_suite(f"До (початкова схема, з'єднання на виклик), {args.rows} рядків:",
+                  args.rows, args.calls, BASELINE)
+
+        # "Після": усі міграції, довготривале з'єднання потоку з налаштованими PRAGMA
+        seed(after_path, args.rows)
+        run_suite(f"Після (міграції, з'єднання потоку, WAL), {args.rows} рядків:",
+                  args.rows, args.calls, (db.add_order, db.get_orders, db.check_spam_protection))
+        db.close_db_connections()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Мікробенчмарк розбору дедлайнів.
+
+Порівнює старий підхід (перебір форматів через strptime, як було у
+validate_deadline) з app.utils.deadlines.parse_deadline: без кешу
+(лише регулярні вирази) і з прогрітим LRU-кешем.
+
+Корпус — тексти дедлайнів з таблиці orders (якщо передано --db), інакше
+типові введення користувачів: різні роздільники, двозначні роки,
+пробіли, помилкові дати та довільний текст.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bench_deadlines [--db botdata.sqlite3] [--size 100000]
+"""
+import argparse
+import random
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+from app.utils import deadlines
+
+OLD_FORMATS = [
+    "%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y",
+    "%Y-%m-%d", "%Y.%m.%d", "%Y/%m/%d"
+]
+
+
+def old_parse(text):
+    for fmt in OLD_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def synthetic_corpus(size):
+    today = date.today()
+    templates = [
+        lambda d: d.strftime('%d.%m.%Y'),
+        lambda d: d.strftime('%d.%m.%Y'),
+        lambda d: d.strftime('%d.%m.%Y'),
+        lambda d: d.strftime('%d/%m/%Y'),
+        lambda d: d.strftime('%d-%m-%Y'),
+        lambda d: d.strftime('%Y-%m-%d'),
+        lambda d: d.strftime('%d.%m.%y'),
+        lambda d: f"{d.day}.{d.month}.{d.year}",
+        lambda d: f" {d.strftime('%d.%m.%Y')} ",
+    ]
+    garbage = ['завтра', 'через тиждень', '31.02.2030', '2030-13-01', 'до кінця місяця', '']
+    corpus = []
+    for _ in range(size):
+        if random.random() < 0.1:
+            corpus.append(random.choice(garbage))
+        else:
+            day = today + timedelta(days=random.randint(0, 90))
+            corpus.append(random.choice(templates)(day))
+    return corpus
+
+
+def db_corpus(path, size):
+    conn = sqlite3.connect(path)
+    rows = [row[0] for row in conn.execute('SELECT deadline FROM orders WHERE deadline IS NOT NULL')]
+    conn.close()
+    if not rows:
+        raise SystemExit(f"У {path} немає замовлень з дедлайном")
+    return [random.choice(rows) for _ in range(size)]
+
+
+def bench(label, func, corpus):
+    start = time.perf_counter()
+    parsed = sum(1 for text in corpus if func(text) is not None)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {len(corpus) / elapsed:>12,.0f} рядків/с   розпізнано {parsed}/{len(corpus)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', help='шлях до botdata.sqlite3 з реальними дедлайнами')
+    parser.add_argument('--size', type=int, default=100_000)
+    args = parser.parse_args()
+
+    corpus = db_corpus(args.db, args.size) if args.db else synthetic_corpus(args.size)
+    print(f"Корпус: {len(corpus)} рядків, унікальних {len(set(corpus))}")
+
+    bench('strptime (старий)', old_parse, corpus)
+    bench('regex без кешу', lambda text: deadlines._parse.__wrapped__(text.strip()), corpus)
+    deadlines._parse.cache_clear()
+    bench('parse_deadline (холодний)', deadlines.parse_deadline, corpus)
+    bench('parse_deadline (теплий)', deadlines.parse_deadline, corpus)
+    print(f"  {deadlines._parse.cache_info()}")
+
+
+if __name__ == '__main__':
+    main()
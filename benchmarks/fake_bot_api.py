@@ -0,0 +1,96 @@
+"""Локальна заглушка Telegram Bot API для навантажувальних тестів.
+
+Приймає запити aiogram на /bot<token>/<method> і відповідає правдоподібними
+результатами: методи відправки повертають Message з новим message_id,
+getMe — бота, решта — True. Нічого не зберігає, лише рахує виклики за
+методами; latency імітує мережеву затримку справжнього API.
+
+Зазвичай load_test запускає заглушку у своєму event loop. Щоб її робота
+не потрапляла в заміри бота, її можна запустити окремим процесом:
+    python -m benchmarks.fake_bot_api [--port 8081] [--latency-ms 0]
+і передати load_test --api-url http://127.0.0.1:8081
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from collections import Counter
+
+from aiohttp import web
+
+BOT_USER = {'id': 100000, 'is_bot': True, 'first_name': 'Load Test Bot', 'username': 'load_test_bot'}
+
+# Методи, що повертають надіслане/змінене повідомлення
+MESSAGE_METHODS = {
+    'sendmessage', 'sendphoto', 'senddocument', 'sendvideo', 'sendaudio', 'sendvoice',
+    'sendsticker', 'sendlocation', 'sendcontact', 'forwardmessage',
+    'editmessagetext', 'editmessagecaption', 'editmessagereplymarkup', 'editmessagemedia',
+}
+
+
+class FakeBotAPI:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self._message_ids = itertools.count(1)
+        self._runner = None
+        self.url = None
+
+    async def handle(self, request):
+        method = request.match_info['method'].lower()
+        self.calls[method] += 1
+        data = await request.post()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method == 'getme':
+            result = BOT_USER
+        elif method in MESSAGE_METHODS:
+            chat_id = data.get('chat_id', 0)
+            result = {
+                'message_id': int(data.get('message_id') or next(self._message_ids)),
+                'date': int(time.time()),
+                'chat': {'id': int(chat_id) if str(chat_id).lstrip('-').isdigit() else 0, 'type': 'private'},
+                'from': BOT_USER,
+                'text': data.get('text') or '',
+            }
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    async def start(self, host='127.0.0.1', port=0):
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f'http://{host}:{port}'
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    api = FakeBotAPI(latency=args.latency_ms / 1000)
+    print(f"Заглушка Bot API: {await api.start(args.host, args.port)}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await api.stop()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,157 @@
+"""Операції FSM-сховища на кроках сценарію: з буфером і без.
+
+Проганяє сценарій load_test (SCENARIO: оформлення замовлення, кабінет,
+підтримка) через повний диспетчер двічі — без BufferedStateMiddleware і з
+ним — і рахує виклики сховища на кожному кроці: читання (get_state,
+get_data, get_value) та записи (set_state, set_data), а також час у
+сховищі. Користувачі проходять сценарій по черзі, тож лічильники точні.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.fsm_ops [--users 200] [--storage memory|bounded|sqlite]
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import logging
+import os
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.base import BaseStorage
+
+from app import async_db, db
+from app.services.audit_log import audit_log
+from app.services.user_tracker import user_tracker
+from benchmarks.fake_bot_api import FakeBotAPI
+from benchmarks.load_test import FIRST_USER_ID, LOAD_TEST_TOKEN, SCENARIO, STORAGES, SyntheticUser
+
+READS = ('get_state', 'get_data', 'get_value')
+WRITES = ('set_state', 'set_data')
+
+
+class CountingStorage(BaseStorage):
+    """Обгортка над сховищем, що рахує виклики та час у ньому."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.calls = Counter()
+        self.elapsed = 0.0
+
+    async def _call(self, name, *args, **kwargs):
+        self.calls[name] += 1
+        start = time.perf_counter()
+        try:
+            return await getattr(self.inner, name)(*args, **kwargs)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+    async def set_state(self, key, state=None):
+        await self._call('set_state', key=key, state=state)
+
+    async def get_state(self, key):
+        return await self._call('get_state', key=key)
+
+    async def set_data(self, key, data):
+        await self._call('set_data', key=key, data=data)
+
+    async def get_data(self, key):
+        return await self._call('get_data', key=key)
+
+    async def get_value(self, storage_key, dict_key, default=None):
+        # BaseStorage.get_value іде через get_data — рахуємо як одне читання
+        return (await self.get_data(storage_key)).get(dict_key, default)
+
+    async def close(self):
+        await self.inner.close()
+
+
+async def measure(buffered_state, storage_name, users):
+    """Повертає {крок: (Counter викликів, час у сховищі)} сумарно за users."""
+    from bot import create_dispatcher
+
+    storage = CountingStorage(STORAGES[storage_name]())
+    dp = create_dispatcher(storage=storage, buffered_state=buffered_state)
+    api = FakeBotAPI()
+    session = AiohttpSession(api=TelegramAPIServer.from_base(await api.start()))
+    bot = Bot(token=LOAD_TEST_TOKEN, session=session)
+    deadline = (date.today() + timedelta(days=14)).strftime('%d.%m.%Y')
+    update_ids = itertools.count(1)
+    calls = defaultdict(Counter)
+    elapsed = defaultdict(float)
+    try:
+        for i in range(users):
+            user = SyntheticUser(FIRST_USER_ID + i, deadline)
+            for step, kind, payload in SCENARIO:
+                storage.calls.clear()
+                storage.elapsed = 0.0
+                await dp.feed_raw_update(bot, user.build_update(next(update_ids), kind, payload))
+                calls[step] += storage.calls
+                elapsed[step] += storage.elapsed
+        await audit_log.stop()
+        await user_tracker.stop()
+        await storage.close()
+    finally:
+        await session.close()
+        await api.stop()
+        # Роутери глобальні: від'єднуємо, щоб зібрати диспетчер знову
+        for router in dp.sub_routers:
+            router._parent_router = None
+    return {step: (calls[step], elapsed[step]) for step, _, _ in SCENARIO}
+
+
+def _totals(calls):
+    return sum(calls[name] for name in READS), sum(calls[name] for name in WRITES)
+
+
+def print_report(before, after, users):
+    print(f"\nОперації FSM-сховища на користувача (користувачів: {users})")
+    print(f"  {'крок':<16} {'читання':>15} {'записи':>15} {'сховище, мкс':>17}")
+    summary = {'before': [0, 0, 0.0], 'after': [0, 0, 0.0]}
+    for step, _, _ in SCENARIO:
+        row = []
+        for name, result in (('before', before), ('after', after)):
+            calls, elapsed = result[step]
+            reads, writes = _totals(calls)
+            summary[name][0] += reads
+            summary[name][1] += writes
+            summary[name][2] += elapsed
+            row.append((reads / users, writes / users, elapsed / users * 1e6))
+        (r0, w0, t0), (r1, w1, t1) = row
+        print(f"  {step:<16} {r0:>6.1f} → {r1:<6.1f} {w0:>6.1f} → {w1:<6.1f} {t0:>7.0f} → {t1:<7.0f}")
+    (r0, w0, t0), (r1, w1, t1) = summary['before'], summary['after']
+    print(f"  {'разом':<16} {r0 / users:>6.1f} → {r1 / users:<6.1f} {w0 / users:>6.1f} → {w1 / users:<6.1f} "
+          f"{t0 / users * 1e6:>7.0f} → {t1 / users * 1e6:<7.0f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--storage', choices=tuple(STORAGES), default='sqlite',
+                        help='FSM-сховище: memory (aiogram), bounded або sqlite')
+    args = parser.parse_args()
+
+    # Імпорт тут: bot.py підтягує всі обробники
+    import bot  # noqa: F401
+    # Без журналу aiogram про кожен апдейт
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = []
+        for buffered_state in (False, True):
+            db.DB_PATH = os.path.join(tmp, f'fsm_ops_{int(buffered_state)}.sqlite3')
+            db.init_db()
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                results.append(await measure(buffered_state, args.storage, args.users))
+        print(f"FSM-сховище: {args.storage}; без буфера → з BufferedStateMiddleware")
+        print_report(*results, args.users)
+        async_db.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
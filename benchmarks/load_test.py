@@ -0,0 +1,305 @@
+"""Навантажувальний тест: синтетичні користувачі проти повного диспетчера.
+
+Збирає той самий Dispatcher, що й bot.py (create_dispatcher: усі роутери
+та middleware), і подає йому апдейти від тисяч синтетичних користувачів
+одночасно. Кожен користувач проходить сценарій SCENARIO: /start, повне
+оформлення замовлення (OrderStates), /cabinet, /faq і /support. Бот
+ходить у локальну заглушку Bot API (benchmarks/fake_bot_api.py), база —
+тимчасовий файл SQLite з тими ж PRAGMA, що й у продакшені.
+
+Звіт: пропускна здатність (апдейтів/с), затримка обробки апдейта
+p50/p95/p99 загалом і за кроками сценарію, час у БД на апдейт (очікування
+пулу потоків + виконання запитів) і кількість викликів Bot API.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.load_test [--users 2000] [--concurrency 500]
+                                   [--think-ms 0] [--api-latency-ms 0] [--api-url URL]
+                                   [--storage memory|bounded|sqlite]
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import itertools
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from app import async_db, db
+from app.services.audit_log import audit_log
+from app.services.user_tracker import user_tracker
+from app.storage import BoundedMemoryStorage, SQLiteStorage
+from benchmarks.fake_bot_api import BOT_USER, FakeBotAPI
+
+LOAD_TEST_TOKEN = '100000:LOAD-TEST-TOKEN'
+FIRST_USER_ID = 10_000_000
+
+# (крок, тип апдейта, текст або callback_data)
+SCENARIO = [
+    ('start', 'message', '/start'),
+    ('order', 'message', '/order'),
+    ('order_type', 'callback', 'order_type:coursework'),
+    ('topic', 'message', 'Аналіз ринку праці в Україні {user_id}'),
+    ('subject', 'message', 'Економіка'),
+    ('deadline', 'message', '{deadline}'),
+    ('volume', 'message', '25'),
+    ('requirements', 'message', 'Оформлення за ДСТУ, 20 джерел'),
+    ('files', 'message', '⏭️ Пропустити'),
+    ('promocode', 'message', '⏭️ Без промокоду'),
+    ('confirm', 'callback', 'confirm_order'),
+    ('cabinet', 'message', '/cabinet'),
+    ('faq', 'message', '/faq'),
+    ('support', 'message', '/support'),
+    ('support_message', 'message', 'Коли буде готова робота?'),
+]
+
+STORAGES = {
+    'memory': MemoryStorage,
+    'bounded': BoundedMemoryStorage,
+    'sqlite': SQLiteStorage,
+}
+
+_update_timing = contextvars.ContextVar('update_timing', default=None)
+
+
+class UpdateTiming:
+    __slots__ = ('db_calls', 'db_wait', 'db_exec')
+
+    def __init__(self):
+        self.db_calls = 0
+        self.db_wait = 0.0
+        self.db_exec = 0.0
+
+
+@contextlib.contextmanager
+def instrument_db():
+    """Рахує час у БД для апдейта, що зараз обробляється.
+
+    Підміняє app.async_db.run_in_db: обгортки async_db беруть його з модуля
+    під час виклику. db_exec — виконання функції в потоці пулу, db_wait —
+    загальний час очікування результату (разом з чергою до пулу).
+    """
+    original = async_db.run_in_db
+
+    async def run_in_db(func, *args, **kwargs):
+        timing = _update_timing.get()
+        if timing is None:
+            return await original(func, *args, **kwargs)
+        executed = [0.0]
+
+        def timed():
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                executed[0] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            return await original(timed)
+        finally:
+            timing.db_calls += 1
+            timing.db_wait += time.perf_counter() - start
+            timing.db_exec += executed[0]
+
+    async_db.run_in_db = run_in_db
+    try:
+        yield
+    finally:
+        async_db.run_in_db = original
+
+
+class SyntheticUser:
+    def __init__(self, user_id, deadline):
+        self.user = {'id': user_id, 'is_bot': False, 'first_name': f'Студент {user_id}',
+                     'username': f'student{user_id}', 'language_code': 'uk'}
+        self.chat = {'id': user_id, 'type': 'private', 'first_name': self.user['first_name']}
+        self.deadline = deadline
+        self._message_ids = itertools.count(1)
+
+    def build_update(self, update_id, kind, payload):
+        payload = payload.format(user_id=self.user['id'], deadline=self.deadline)
+        now = int(time.time())
+        if kind == 'callback':
+            return {'update_id': update_id, 'callback_query': {
+                'id': str(update_id),
+                'from': self.user,
+                'chat_instance': str(self.user['id']),
+                'data': payload,
+                'message': {'message_id': next(self._message_ids), 'date': now, 'chat': self.chat,
+                            'from': BOT_USER, 'text': '...'},
+            }}
+        return {'update_id': update_id, 'message': {
+            'message_id': next(self._message_ids), 'date': now, 'chat': self.chat,
+            'from': self.user, 'text': payload,
+        }}
+
+
+class LoadTestReport:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.db_by_step = defaultdict(list)
+        self.db = []
+        self.errors = defaultdict(int)
+        self.unhandled = defaultdict(int)
+        self.elapsed = 0.0
+
+    def record(self, step, latency, timing):
+        self.latencies[step].append(latency)
+        self.db_by_step[step].append(timing.db_wait)
+        self.db.append(timing)
+
+    @property
+    def total_updates(self):
+        return sum(len(samples) for samples in self.latencies.values())
+
+
+def percentile(sorted_samples, p):
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, round(p / 100 * len(sorted_samples) + 0.5) - 1))
+    return sorted_samples[index]
+
+
+def _ms(seconds):
+    return seconds * 1000
+
+
+async def run_user(dp, bot, user, update_ids, report, think):
+    for step, kind, payload in SCENARIO:
+        update = user.build_update(next(update_ids), kind, payload)
+        timing = UpdateTiming()
+        token = _update_timing.set(timing)
+        start = time.perf_counter()
+        try:
+            if await dp.feed_raw_update(bot, update) is UNHANDLED:
+                report.unhandled[step] += 1
+        except Exception as e:
+            report.errors[f'{step}: {type(e).__name__}: {e}'] += 1
+        finally:
+            report.record(step, time.perf_counter() - start, timing)
+            _update_timing.reset(token)
+        if think:
+            await asyncio.sleep(think)
+
+
+async def run_load_test(dp, users=1000, concurrency=500, think=0.0, api_latency=0.0, api_url=None):
+    """Проганяє users синтетичних користувачів через dp; повертає (звіт, заглушку API).
+
+    Якщо api_url не задано, заглушка Bot API запускається в цьому ж event loop.
+    """
+    api = FakeBotAPI(latency=api_latency)
+    base_url = api_url or await api.start()
+    session = AiohttpSession(api=TelegramAPIServer.from_base(base_url), limit=max(100, concurrency))
+    bot = Bot(token=LOAD_TEST_TOKEN, session=session)
+    report = LoadTestReport()
+    deadline = (date.today() + timedelta(days=14)).strftime('%d.%m.%Y')
+    update_ids = itertools.count(1)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(user_id):
+        async with semaphore:
+            await run_user(dp, bot, SyntheticUser(user_id, deadline), update_ids, report, think)
+
+    try:
+        with instrument_db():
+            start = time.perf_counter()
+            await asyncio.gather(*(limited(FIRST_USER_ID + i) for i in range(users)))
+            report.elapsed = time.perf_counter() - start
+        # Дописуємо буферизовані журнали та users, як при зупинці бота
+        await audit_log.stop()
+        await user_tracker.stop()
+        await dp.storage.close()
+    finally:
+        await session.close()
+        await api.stop()
+    return report, api
+
+
+def print_report(report, api, users, storage=None):
+    total = report.total_updates
+    all_latencies = sorted(itertools.chain.from_iterable(report.latencies.values()))
+    print(f"\nКористувачів: {users}, апдейтів: {total}, час: {report.elapsed:.2f} с")
+    print(f"Пропускна здатність: {total / report.elapsed:,.0f} апдейтів/с "
+          f"({users / report.elapsed:,.1f} сценаріїв/с)")
+    print(f"Затримка обробки: p50 {_ms(percentile(all_latencies, 50)):.1f} мс   "
+          f"p95 {_ms(percentile(all_latencies, 95)):.1f} мс   "
+          f"p99 {_ms(percentile(all_latencies, 99)):.1f} мс   "
+          f"max {_ms(all_latencies[-1]) if all_latencies else 0:.1f} мс")
+
+    db_wait = sorted(timing.db_wait for timing in report.db)
+    print(f"БД на апдейт: {statistics.fmean(t.db_calls for t in report.db):.2f} викликів, "
+          f"виконання {_ms(statistics.fmean(t.db_exec for t in report.db)):.2f} мс, "
+          f"з чергою до пулу {_ms(statistics.fmean(db_wait)):.2f} мс "
+          f"(p95 {_ms(percentile(db_wait, 95)):.2f} мс, p99 {_ms(percentile(db_wait, 99)):.2f} мс)")
+
+    print(f"\n  {'крок':<16} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'БД, мс':>9}")
+    for step, _, _ in SCENARIO:
+        samples = sorted(report.latencies.get(step, []))
+        if not samples:
+            continue
+        print(f"  {step:<16} {_ms(percentile(samples, 50)):>9.1f} {_ms(percentile(samples, 95)):>9.1f} "
+              f"{_ms(percentile(samples, 99)):>9.1f} {_ms(statistics.fmean(report.db_by_step[step])):>9.2f}")
+
+    if api.calls:
+        print(f"\nВиклики Bot API: {sum(api.calls.values())} "
+              f"({', '.join(f'{method} {count}' for method, count in api.calls.most_common(6))})")
+    if hasattr(storage, 'stats'):
+        print(f"FSM-сховище: {storage.stats()}")
+    orders = db.count_orders()
+    print(f"Створено замовлень: {orders}/{users}")
+    for step, count in report.unhandled.items():
+        print(f"  [!] {step}: не оброблено {count}")
+    for error, count in report.errors.items():
+        print(f"  [!] {error} × {count}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=500,
+                        help='скільки користувачів проходять сценарій одночасно')
+    parser.add_argument('--think-ms', type=float, default=0,
+                        help='пауза користувача між кроками')
+    parser.add_argument('--api-latency-ms', type=float, default=0,
+                        help='штучна затримка відповіді Bot API')
+    parser.add_argument('--api-url', help='окремо запущена заглушка (python -m benchmarks.fake_bot_api)')
+    parser.add_argument('--storage', choices=tuple(STORAGES), default='memory',
+                        help='FSM-сховище: memory (aiogram), bounded або sqlite')
+    parser.add_argument('--verbose', action='store_true', help='не приховувати print() обробників')
+    args = parser.parse_args()
+
+    # Імпорт тут: bot.py підтягує всі обробники
+    from bot import create_dispatcher
+    # Без журналу aiogram про кожен апдейт
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, 'load_test.sqlite3')
+        db.init_db()
+        dp = create_dispatcher(storage=STORAGES[args.storage]())
+        output = contextlib.nullcontext() if args.verbose else open(os.devnull, 'w')
+        with output as devnull:
+            with contextlib.redirect_stdout(devnull or sys.stdout):
+                report, api = await run_load_test(
+                    dp, users=args.users, concurrency=args.concurrency,
+                    think=args.think_ms / 1000, api_latency=args.api_latency_ms / 1000,
+                    api_url=args.api_url
+                )
+        print_report(report, api, args.users, dp.storage)
+        async_db.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
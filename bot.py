@@ -10,20 +10,74 @@ from app.handlers import (
 from app.handlers.main_commands import router as main_commands_router, setup_bot_commands
 from app.db import init_db
 from app.services.automation import start_automation, stop_automation
-
-# Налаштування логування
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
-    ]
-)
+from app.services.backup import start_backup_scheduler, stop_backup_scheduler
+from app.services.broadcast import start_broadcast_worker, stop_broadcast_worker
+from app import async_db
+from app.services.audit_log import audit_log
+from app.services.rate_limiter import rate_limiter
+from app.middlewares.spam_protection import SpamProtectionMiddleware
+from app.middlewares.user_tracking import UserTrackingMiddleware
+from app.middlewares.buffered_state import BufferedStateMiddleware
+from app.services.user_tracker import user_tracker
+from app.webhook import run_webhook
+from app.storage import create_storage
 
 logger = logging.getLogger(__name__)
 
+
+def setup_logging():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('bot.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+
+def create_dispatcher(storage=None, buffered_state=True) -> Dispatcher:
+    """Створює диспетчер з усіма middleware та роутерами бота.
+
+    Використовується в main() і в навантажувальному тесті
+    (benchmarks/load_test.py), щоб той ганяв рівно ту ж конфігурацію.
+    Роутери — глобальні об'єкти, тому в процесі можна створити лише
+    один такий диспетчер. buffered_state=False вимикає BufferedStateMiddleware
+    (для порівняння в benchmarks/fsm_ops.py).
+    """
+    dp = Dispatcher(storage=storage)
+    
+    # Облік користувачів (таблиця users) для всіх апдейтів
+    dp.update.outer_middleware(UserTrackingMiddleware(user_tracker))
+    
+    # Спам захист перед усіма роутерами (ліміти в пам'яті)
+    spam_middleware = SpamProtectionMiddleware(rate_limiter)
+    dp.message.outer_middleware(spam_middleware)
+    dp.callback_query.outer_middleware(spam_middleware)
+    
+    # Зміни FSM в обробнику записуються в сховище одним пакетом
+    if buffered_state:
+        dp.message.middleware(BufferedStateMiddleware())
+        dp.callback_query.middleware(BufferedStateMiddleware())
+    
+    # Реєструємо роутери в порядку пріоритету
+    # Спочатку FSM-роутери
+    dp.include_router(order_router)
+    dp.include_router(feedback_router)
+    dp.include_router(support_router)
+    # Потім командні роутери
+    dp.include_router(main_commands_router)
+    dp.include_router(start_router)
+    dp.include_router(help_router)
+    dp.include_router(faq_router)
+    dp.include_router(prices_router)
+    dp.include_router(cabinet_router)
+    dp.include_router(broadcast_router)
+    return dp
+
 async def main():
+    bot = None
+    dp = None
     try:
         # Ініціалізуємо базу даних
         init_db()
@@ -31,35 +85,34 @@ async def main():
         
         # Створюємо бота та диспетчер
         bot = Bot(token=Config.BOT_TOKEN)
-        dp = Dispatcher()
+        # Стан FSM у SQLite: незавершені замовлення переживають перезапуск
+        dp = create_dispatcher(storage=create_storage())
+        logger.info("Всі роутери зареєстровані")
+        
+        # Відновлюємо стан спам захисту після перезапуску
+        if Config.RATE_LIMIT_PERSIST:
+            await rate_limiter.restore_from_db()
         
         # Налаштовуємо команди бота
         await setup_bot_commands(bot)
         logger.info("Команди бота налаштовані")
         
-        # Реєструємо роутери в порядку пріоритету
-        # Спочатку FSM-роутери
-        dp.include_router(order_router)
-        dp.include_router(feedback_router)
-        dp.include_router(support_router)
-        # Потім командні роутери
-        dp.include_router(main_commands_router)
-        dp.include_router(start_router)
-        dp.include_router(help_router)
-        dp.include_router(faq_router)
-        dp.include_router(prices_router)
-        dp.include_router(cabinet_router)
-        dp.include_router(broadcast_router)
-        
-        logger.info("Всі роутери зареєстровані")
-        
         # Запускаємо автоматизацію
         await start_automation(bot)
         logger.info("Автоматизація запущена")
+        start_backup_scheduler()
+        # Продовжуємо розсилки, перервані попередньою зупинкою
+        await start_broadcast_worker(bot)
         
         # Запускаємо бота
-        logger.info("Бот запускається...")
-        await dp.start_polling(bot)
+        if Config.BOT_MODE == 'webhook':
+            logger.info("Бот запускається (webhook)...")
+            await run_webhook(dp, bot)
+        else:
+            logger.info("Бот запускається...")
+            # Після роботи через webhook getUpdates не працює, доки його не видалити
+            await bot.delete_webhook()
+            await dp.start_polling(bot, close_bot_session=False)
         
     except Exception as e:
         logger.error(f"Помилка запуску бота: {e}")
@@ -67,9 +120,24 @@ async def main():
     finally:
         # Зупиняємо автоматизацію при завершенні
         await stop_automation()
+        await stop_backup_scheduler()
+        await stop_broadcast_worker()
+        await audit_log.stop()
+        await user_tracker.stop()
+        if dp is not None:
+            await dp.storage.close()
+        if Config.RATE_LIMIT_PERSIST:
+            try:
+                await rate_limiter.save_to_db()
+            except Exception as e:
+                logger.error(f"Не вдалося зберегти стан спам захисту: {e}")
+        if bot is not None:
+            await bot.session.close()
+        async_db.shutdown()
         logger.info("Бот зупинено")
 
 if __name__ == "__main__":
+    setup_logging()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
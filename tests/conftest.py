@@ -12,10 +12,18 @@ from unittest.mock import AsyncMock
 from aiogram import types
 from datetime import datetime, timedelta
 
+@pytest.fixture(autouse=True)
+def isolated_runtime_files(tmp_path, monkeypatch):
+    """Бекапи та файл БД тестів — у tmp_path, а не в каталозі репозиторію."""
+    monkeypatch.setattr(Config, 'BACKUP_DIR', str(tmp_path / 'backups'))
+    monkeypatch.setattr(db_module, 'DB_PATH', str(tmp_path / 'botdata.sqlite3'))
+
 @pytest_asyncio.fixture(scope="function")
 async def db_connection(monkeypatch):
     """Створює з'єднання з БД в пам'яті для кожного тесту."""
-    conn = sqlite3.connect(":memory:")
+    # check_same_thread=False: асинхронний шар виконує запити в пулі потоків
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.row_factory = db_module.namedtuple_row
     # Патчимо функцію get_db_connection, щоб вона повертала наше з'єднання
     monkeypatch.setattr(db_module, 'get_db_connection', lambda: conn)
     init_db() # Ініціалізуємо схему в цій БД
@@ -34,6 +42,16 @@ async def dp(bot):
     dp = Dispatcher(storage=storage)
     return dp
 
+@pytest.fixture
+def bot_dispatcher():
+    """Диспетчер з усіма роутерами та middleware, як у bot.py."""
+    from bot import create_dispatcher
+    dispatcher = create_dispatcher()
+    yield dispatcher
+    # Роутери глобальні: від'єднуємо, щоб інший тест міг зібрати диспетчер знову
+    for router in dispatcher.sub_routers:
+        router._parent_router = None
+
 @pytest_asyncio.fixture
 async def admin_user():
     """Повертає тестового адміністратора."""
@@ -0,0 +1,17 @@
+import pytest
+from app.services.audit_log import AuditLogWriter
+
+pytestmark = pytest.mark.asyncio
+
+async def test_rows_are_flushed_in_batches_and_drained_on_stop(db_connection):
+    writer = AuditLogWriter(flush_interval=10, batch_size=50, queue_size=20)
+    for i in range(120):
+        await writer.log_message(i, 'user', 'user', f'text {i}', chat_id=i)
+    await writer.add_support_log({'user_id': 1, 'admin_id': 2, 'message': 'hi', 'direction': 'user'})
+    await writer.stop()
+    assert db_connection.execute('SELECT COUNT(*) FROM messages').fetchone()[0] == 120
+    assert db_connection.execute('SELECT COUNT(*) FROM support_logs').fetchone()[0] == 1
+
+async def test_stop_without_writes_is_noop():
+    writer = AuditLogWriter()
+    await writer.stop()
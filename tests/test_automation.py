@@ -0,0 +1,37 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+from app import db
+from app.services.automation import AutomationService
+
+pytestmark = pytest.mark.asyncio
+
+
+def add_order_with(test_order, user_id, status, days_to_deadline):
+    deadline = (datetime.now() + timedelta(days=days_to_deadline)).strftime('%d.%m.%Y')
+    order_id = db.add_order(**{**test_order, 'user_id': user_id, 'deadline': deadline})
+    db.update_order_status(order_id, status)
+    return order_id
+
+
+async def test_overdue_orders_move_to_review_in_bulk(db_connection, test_order):
+    overdue = [add_order_with(test_order, 100 + i, 'in_progress', -2) for i in range(3)]
+    on_time = add_order_with(test_order, 200, 'in_progress', 5)
+    confirmed = add_order_with(test_order, 201, 'confirmed', -2)
+
+    bot = AsyncMock()
+    await AutomationService(bot).process_auto_status_updates()
+
+    statuses = dict(db_connection.execute('SELECT id, status FROM orders').fetchall())
+    assert all(statuses[order_id] == 'review' for order_id in overdue)
+    assert statuses[on_time] == 'in_progress' and statuses[confirmed] == 'confirmed'
+    history = db_connection.execute(
+        "SELECT order_id FROM order_status_history WHERE status = 'review'").fetchall()
+    assert sorted(row.order_id for row in history) == sorted(overdue)
+    notified = sorted(call.args[0] for call in bot.send_message.await_args_list)
+    assert notified == [100, 101, 102]
+
+    # Повторний прохід нічого не змінює
+    bot.send_message.reset_mock()
+    await AutomationService(bot).process_auto_status_updates()
+    bot.send_message.assert_not_awaited()
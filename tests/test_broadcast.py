@@ -0,0 +1,141 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from aiogram.exceptions import TelegramForbiddenError
+from app import db
+from app.services import broadcast
+from app.services.broadcast import BroadcastWorker, start_broadcast
+from app.services.user_tracker import user_tracker
+
+pytestmark = pytest.mark.asyncio
+
+
+def add_users(user_ids):
+    db.upsert_users([(user_id, None, f'User {user_id}', None, 'uk', '2030-01-01T00:00:00')
+                     for user_id in user_ids])
+
+
+async def wait_for_jobs(worker):
+    await asyncio.gather(*worker._tasks.values())
+
+
+async def test_broadcast_runs_in_background_and_records_results(db_connection, monkeypatch):
+    add_users([1, 2, 3, 3])
+    monkeypatch.setattr(broadcast, 'broadcast_worker', None)
+
+    async def send_message(chat_id, text, **kwargs):
+        if chat_id == 2:
+            raise TelegramForbiddenError(method=MagicMock(), message='bot was blocked')
+
+    bot = AsyncMock()
+    bot.send_message.side_effect = send_message
+    progress_message = MagicMock(message_id=50)
+    progress_message.chat.id = 999
+
+    job_id, total = await start_broadcast(bot, 999, progress_message, 'text', text='<b>Новини</b>')
+    assert total == 3
+    await wait_for_jobs(broadcast.broadcast_worker)
+
+    job = db.get_broadcast_job(job_id)
+    assert (job.status, job.sent, job.failed) == ('completed', 2, 1)
+    statuses = dict(db_connection.execute(
+        'SELECT user_id, status FROM broadcast_deliveries WHERE job_id = ?', (job_id,)).fetchall())
+    assert statuses == {1: 'sent', 2: 'failed', 3: 'sent'}
+    # Прогрес: початковий стан, старт і фінал в одному повідомленні адміна
+    edits = bot.edit_message_text.await_args_list
+    assert len(edits) >= 2 and all(call.kwargs['message_id'] == 50 for call in edits)
+    assert 'Завершено' in edits[-1].args[0]
+    # Хто заблокував бота, не потрапить у наступну розсилку
+    await user_tracker.stop()
+    assert db.get_user(2).is_blocked == 1
+    assert db.count_broadcast_recipients() == 2
+
+
+async def test_unfinished_broadcast_resumes_after_restart(db_connection):
+    add_users([1, 2, 3])
+    job_id, _ = db.create_broadcast_job(999, 999, 'photo', text='Фото', file_id='photo-file')
+    db.set_broadcast_status(job_id, 'running')
+    # До "збою" встигли відправити першому отримувачу
+    db.record_broadcast_results(job_id, [(1, 'sent', None)])
+
+    bot = AsyncMock()
+    worker = BroadcastWorker(bot)
+    await worker.resume_unfinished()
+    await wait_for_jobs(worker)
+
+    assert sorted(call.args[0] for call in bot.send_photo.await_args_list) == [2, 3]
+    bot.send_photo.assert_awaited_with(3, 'photo-file', caption='Фото', parse_mode='HTML')
+    job = db.get_broadcast_job(job_id)
+    assert (job.status, job.sent, job.failed) == ('completed', 3, 0)
+    assert db.get_unfinished_broadcast_jobs() == []
+
+
+async def test_cancel_does_not_overwrite_finished_job(db_connection):
+    add_users([1, 2])
+    bot = AsyncMock()
+    worker = BroadcastWorker(bot)
+    job_id, _ = db.create_broadcast_job(999, 999, 'text', text='Новини')
+    worker.start_job(job_id)
+    await wait_for_jobs(worker)
+    assert db.get_broadcast_job(job_id).status == 'completed'
+
+    # "Зупинити" зі старого повідомлення прогресу
+    assert await worker.cancel_job(job_id) is None
+    job = db.get_broadcast_job(job_id)
+    assert (job.status, job.sent) == ('completed', 2)
+    assert worker._cancelled == set()
+
+    # Скасована в черзі розсилка не стартує і не стає completed
+    job_id, _ = db.create_broadcast_job(999, 999, 'text', text='Ще новини')
+    assert (await worker.cancel_job(job_id)).status == 'cancelled'
+    worker.start_job(job_id)
+    await wait_for_jobs(worker)
+    assert db.get_broadcast_job(job_id).status == 'cancelled'
+    assert bot.send_message.await_count == 2
+
+
+async def test_cancel_racing_completion_keeps_cancelled(db_connection, monkeypatch):
+    from app import async_db
+    add_users([1])
+    bot = AsyncMock()
+    worker = BroadcastWorker(bot)
+    job_id, _ = db.create_broadcast_job(999, 999, 'text', text='Новини')
+    record_results = async_db.record_broadcast_results
+
+    async def cancel_after_last_batch(*args):
+        job = await record_results(*args)
+        # Скасування записане в БД, але цикл уже не перевіряє _cancelled
+        await async_db.set_broadcast_status(job_id, 'cancelled')
+        return job
+
+    monkeypatch.setattr(async_db, 'record_broadcast_results', cancel_after_last_batch)
+    worker.start_job(job_id)
+    await wait_for_jobs(worker)
+    job = db.get_broadcast_job(job_id)
+    assert (job.status, job.sent) == ('cancelled', 1)
+
+
+async def test_broadcast_keeps_caption_formatting(db_connection, monkeypatch):
+    from datetime import datetime
+    from aiogram import types
+    from app.handlers.cabinet import process_broadcast_message
+    add_users([1])
+    message = types.Message(
+        message_id=1, date=datetime.now(), chat=types.Chat(id=999, type='private'),
+        photo=[types.PhotoSize(file_id='photo-file', file_unique_id='p', width=1, height=1)],
+        caption='Знижка 5 < 10',
+        caption_entities=[types.MessageEntity(type='bold', offset=0, length=6)])
+    monkeypatch.setattr(types.Message, 'answer', AsyncMock())
+    state = AsyncMock()
+    await process_broadcast_message(message, state)
+    data = state.update_data.await_args.kwargs
+    assert data['text'] == '<b>Знижка</b> 5 &lt; 10'
+
+    bot = AsyncMock()
+    worker = BroadcastWorker(bot)
+    job_id, _ = db.create_broadcast_job(999, 999, 'photo', text=data['text'],
+                                        file_id=data['photo_id'])
+    worker.start_job(job_id)
+    await wait_for_jobs(worker)
+    bot.send_photo.assert_awaited_once_with(1, 'photo-file', caption='<b>Знижка</b> 5 &lt; 10',
+                                            parse_mode='HTML')
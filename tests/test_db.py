@@ -1,13 +1,14 @@
 import pytest
 from datetime import datetime
 from app.db import (
-    add_order, get_order_by_id, update_order,
+    add_order, get_order_by_id, update_order, get_orders,
     add_promocode, is_promocode_valid, use_promocode,
     add_feedback, get_feedbacks,
     add_referral_bonus, get_referrals,
     add_reminder, get_pending_reminders, mark_reminder_sent,
     check_spam_protection, get_promocode, add_referral
 )
+from app import async_db
 
 # Використовуємо pytest.mark.asyncio для всіх тестів
 pytestmark = pytest.mark.asyncio
@@ -66,4 +67,188 @@ async def test_spam_protection(db_connection):
     assert check_spam_protection(user_id, action, limit, 1) is True
     assert check_spam_protection(user_id, action, limit, 1) is True
     # Третій запит має бути заблокований
-    assert check_spam_protection(user_id, action, limit, 1) is False 
\ No newline at end of file
+    assert check_spam_protection(user_id, action, limit, 1) is False 
+
+async def test_async_db_wrappers(db_connection, test_order):
+    order_id = await async_db.add_order(**test_order)
+    order_data = await async_db.get_order_by_id(order_id)
+    assert order_data['order'][0] == order_id
+    orders = await async_db.get_orders(user_id=test_order['user_id'])
+    assert len(orders) == 1
+
+async def test_migrations_create_indexes(db_connection):
+    from app.migrations import LATEST_VERSION, get_schema_version
+    assert get_schema_version(db_connection) == LATEST_VERSION
+    plan = db_connection.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM orders WHERE user_id = ? ORDER BY created_at DESC', (1,)
+    ).fetchall()
+    assert any('idx_orders_user_created' in row[-1] for row in plan)
+
+async def test_migrations_upgrade_existing_db(db_connection):
+    from app.migrations import LATEST_VERSION, run_migrations
+    db_connection.execute('DROP INDEX idx_orders_user_created')
+    db_connection.execute('PRAGMA user_version = 0')
+    assert run_migrations(db_connection) == LATEST_VERSION
+    names = {row[0] for row in db_connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert 'idx_orders_user_created' in names
+
+async def test_add_order_allocates_unique_ids(db_connection, test_order):
+    ids = [add_order(**test_order) for _ in range(50)]
+    assert len(set(ids)) == 50
+    assert all(10000 <= order_id <= 99999 for order_id in ids)
+    counter = db_connection.execute("SELECT value FROM id_sequences WHERE name = 'orders'").fetchone()[0]
+    assert counter == 50
+
+async def test_get_orders_column_projection(db_connection, test_order):
+    from app.db import ORDER_SUMMARY_COLUMNS
+    order_id = add_order(**test_order)
+    order = get_orders(user_id=test_order['user_id'], columns=ORDER_SUMMARY_COLUMNS)[0]
+    assert order.id == order_id
+    assert order.status == 'draft'
+    assert order._fields == ORDER_SUMMARY_COLUMNS
+    with pytest.raises(ValueError):
+        get_orders(columns=('id', 'status; DROP TABLE orders'))
+
+async def test_orders_keyset_pagination(db_connection, test_order):
+    from app.db import get_orders_page, count_orders
+    ids = [add_order(**test_order) for _ in range(25)]
+    # Нові першими: порядок як у get_orders
+    expected = [order.id for order in get_orders(user_id=test_order['user_id'], columns=('id',))]
+    assert sorted(expected) == sorted(ids)
+
+    first, has_more = get_orders_page(user_id=test_order['user_id'], limit=10)
+    assert [o.id for o in first] == expected[:10] and has_more
+    second, has_more = get_orders_page(user_id=test_order['user_id'], cursor=first[-1].id, limit=10)
+    assert [o.id for o in second] == expected[10:20] and has_more
+    third, has_more = get_orders_page(user_id=test_order['user_id'], cursor=second[-1].id, limit=10)
+    assert [o.id for o in third] == expected[20:] and not has_more
+
+    back, has_more = get_orders_page(user_id=test_order['user_id'], cursor=second[0].id,
+                                     direction='prev', limit=10)
+    assert [o.id for o in back] == expected[:10] and not has_more
+    assert count_orders(user_id=test_order['user_id']) == 25
+
+async def test_find_orders_fulltext(db_connection, test_order):
+    from app.db import find_orders, rebuild_search_index
+    order_id = add_order(**{**test_order, 'topic': 'Економіка підприємства', 'requirements': 'Ґрунтовний аналіз'})
+    other_id = add_order(**{**test_order, 'topic': 'Історія України', 'requirements': 'Есе'})
+    rows, has_more = find_orders('ЕКОНОМІКА')
+    assert [row.id for row in rows] == [order_id] and not has_more
+    assert [row.id for row in find_orders('ґрунт')[0]] == [order_id]
+    # Тригер оновлення тримає індекс синхронним
+    update_order(other_id, topic='Економіка праці')
+    assert {row.id for row in find_orders('економіка')[0]} == {order_id, other_id}
+    rebuild_search_index()
+    assert find_orders('"OR * (')[0] == []
+
+async def test_create_backup_compressed_with_retention(db_connection, test_order, tmp_path, monkeypatch):
+    import gzip
+    import sqlite3
+    from app.config import Config
+    from app.db import create_backup
+    monkeypatch.setattr(Config, 'BACKUP_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'BACKUP_KEEP', 2)
+    monkeypatch.setattr(Config, 'BACKUP_PAGES_PER_STEP', 1)
+    monkeypatch.setattr(Config, 'BACKUP_STEP_SLEEP', 0)
+    order_id = add_order(**test_order)
+
+    stages = []
+    files = [create_backup(progress=lambda stage, done, total: stages.append(stage)) for _ in range(3)]
+    assert {'copy', 'verify', 'compress'} <= set(stages)
+    # Залишились лише два останні бекапи
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(f.rsplit('/', 1)[-1] for f in files[1:])
+    assert db_connection.execute('SELECT COUNT(*) FROM backups').fetchone()[0] == 2
+
+    restored = tmp_path / 'restored.sqlite3'
+    with gzip.open(files[-1], 'rb') as src:
+        restored.write_bytes(src.read())
+    conn = sqlite3.connect(restored)
+    assert conn.execute('SELECT id FROM orders').fetchall() == [(order_id,)]
+    conn.close()
+
+async def test_deadline_date_is_normalized_and_queryable(db_connection, test_order):
+    from app.db import get_orders_by_deadline
+    order_id = add_order(**{**test_order, 'deadline': '25.12.2030'})
+    assert get_order_by_id(order_id)['order'].deadline_date == '2030-12-25'
+    update_order(order_id, deadline='2030-12-20')
+    db_connection.execute("UPDATE orders SET status = 'confirmed' WHERE id = ?", (order_id,))
+    assert [o.id for o in get_orders_by_deadline('confirmed', deadline_date='2030-12-20', columns=('id',))] == [order_id]
+    assert get_orders_by_deadline('confirmed', before='2030-12-20') == []
+    assert len(get_orders_by_deadline('confirmed', before='2030-12-21')) == 1
+
+async def test_deadline_migration_backfills_and_dedupes_reminders(db_connection, test_order):
+    from app.migrations import LATEST_VERSION, run_migrations
+    order_id = add_order(**{**test_order, 'deadline': '01/02/2031'})
+    db_connection.execute('UPDATE orders SET deadline_date = NULL')
+    db_connection.execute('DROP INDEX idx_reminders_order_type')
+    for _ in range(3):
+        add_reminder(1, order_id, 'deadline_approaching', '2031-01-29T10:00:00', 'msg')
+    db_connection.execute('PRAGMA user_version = 5')
+    assert run_migrations(db_connection) == LATEST_VERSION
+    assert get_order_by_id(order_id)['order'].deadline_date == '2031-02-01'
+    assert db_connection.execute('SELECT COUNT(*) FROM reminders').fetchone()[0] == 1
+    # Повторне створення того ж нагадування ігнорується
+    assert add_reminder(1, order_id, 'deadline_approaching', '2031-01-29T10:00:00', 'msg') is None
+    assert db_connection.execute('SELECT COUNT(*) FROM reminders').fetchone()[0] == 1
+
+async def test_order_stats_follow_order_writes(db_connection, test_order):
+    from app.db import (apply_status_transitions, get_order_stats, rebuild_order_stats,
+                        update_order_status)
+    first = add_order(**test_order)
+    second = add_order(**{**test_order, 'type_label': 'Диплом', 'price': 5000})
+    old = add_order(**{**test_order, 'price': None})
+    db_connection.execute("UPDATE orders SET created_at = '2020-01-01T10:00:00' WHERE id = ?", (old,))
+    update_order_status(first, 'confirmed')
+    update_order(second, price=4500, type_label='Дипломна робота')
+    apply_status_transitions([('draft', 'canceled', 'created_at', '2021-01-01', None)])
+    db_connection.execute('DELETE FROM orders WHERE id = ?', (first,))
+
+    stats = get_order_stats('2020-06-01')
+    assert (stats.total_orders, stats.total_revenue, stats.recent_orders) == (2, 4500, 1)
+    assert [tuple(row) for row in stats.by_status] == [('canceled', 1, 0), ('draft', 1, 4500)]
+    assert [tuple(row) for row in stats.by_type] == [('Дипломна робота', 1), ('Курсова робота', 1)]
+    assert get_order_stats('2019-12-31').recent_orders == 2
+    # Тригери вели агрегати правильно
+    assert rebuild_order_stats() == 0
+
+    db_connection.execute("UPDATE order_stats_status SET orders = 7 WHERE status = 'draft'")
+    assert rebuild_order_stats() == 1
+    assert get_order_stats('2020-06-01').total_orders == 2
+
+async def test_order_stats_revenue_is_exact(db_connection, test_order):
+    from app.db import get_order_stats, rebuild_order_stats
+    # Ціни з calculate_price — float; суми в тригерах не накопичують похибку
+    ids = [add_order(**{**test_order, 'price': price}) for price in (0.1, 0.2, 629.05) * 20]
+    for order_id in ids[::3]:
+        update_order(order_id, price=0.7)
+    for order_id in ids[1::6]:
+        db_connection.execute('DELETE FROM orders WHERE id = ?', (order_id,))
+    total = sum(row.price for row in db_connection.execute('SELECT price FROM orders'))
+    stats = get_order_stats('2020-01-01')
+    assert stats.total_revenue == round(total, 2) == 12597
+    assert rebuild_order_stats() == 0
+
+async def test_order_stats_recent_window_is_exact(db_connection, test_order):
+    from app.db import get_order_stats
+    for created_at in ('2024-03-01T09:00:00', '2024-03-01T18:30:00', '2024-03-03T08:00:00'):
+        order_id = add_order(**test_order)
+        db_connection.execute('UPDATE orders SET created_at = ? WHERE id = ?', (created_at, order_id))
+    # Частина дня since — за часом, а не цілим днем
+    assert get_order_stats('2024-03-01T12:00:00').recent_orders == 2
+    assert get_order_stats('2024-03-01T18:30:00').recent_orders == 1
+    assert get_order_stats('2024-03-01').recent_orders == 3
+
+async def test_connection_pragmas(tmp_path, monkeypatch):
+    from app import db
+    from app.config import Config
+    monkeypatch.setattr(db, 'DB_PATH', str(tmp_path / 'pragmas.sqlite3'))
+    try:
+        conn = db.get_db_connection()
+        assert conn is db.get_db_connection()
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+        assert conn.execute('PRAGMA cache_size').fetchone()[0] == -Config.DB_CACHE_SIZE_KB
+        assert conn.execute('PRAGMA mmap_size').fetchone()[0] == Config.DB_MMAP_SIZE
+        assert conn.execute('PRAGMA temp_store').fetchone()[0] == 2  # MEMORY
+    finally:
+        db.close_db_connections()
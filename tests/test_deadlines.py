@@ -0,0 +1,28 @@
+from datetime import date, datetime, timedelta
+from app.utils.deadlines import parse_deadline, to_deadline_date
+from app.utils.validation import validate_deadline
+from app.handlers.order import calculate_price, get_urgency
+
+
+def test_parse_deadline_formats():
+    expected = date(2030, 12, 5)
+    for text in ('05.12.2030', '5.12.2030', '05/12/2030', '05-12-2030', '05 12 2030',
+                 '05.12.30', '2030-12-05', '2030.12.05', '2030/12/5', '  05.12.2030 '):
+        assert parse_deadline(text) == expected, text
+    assert to_deadline_date('05.12.2030') == '2030-12-05'
+
+
+def test_parse_deadline_rejects_invalid():
+    for text in ('', 'завтра', '31.02.2030', '2030-13-01', '05.12-2030', '05.12.2030 р.', '123.12.2030', None):
+        assert parse_deadline(text) is None, text
+    assert to_deadline_date('завтра') is None
+
+
+def test_validation_and_pricing_agree():
+    # Формат, який валідація приймає, має враховуватись і в ціні
+    soon = (datetime.now() + timedelta(days=2)).strftime('%Y-%m-%d')
+    assert validate_deadline(soon)[0] is True
+    assert get_urgency(soon)[0] == 1.5
+    data = {'order_type': 'coursework', 'volume': '10', 'deadline': soon}
+    relaxed = {**data, 'deadline': (datetime.now() + timedelta(days=30)).strftime('%d.%m.%Y')}
+    assert calculate_price(data)[0] == calculate_price(relaxed)[0] * 1.5
@@ -0,0 +1,75 @@
+import csv
+import io
+import zipfile
+import pytest
+from app.config import Config
+from app.db import add_order, export_stats, update_order_status, use_promocode, add_promocode
+from app.handlers.cabinet import parse_export_args
+from app.services.export import build_export
+
+pytestmark = pytest.mark.asyncio
+
+
+def read_csv(archive, name):
+    with archive.open(name) as raw:
+        return list(csv.reader(io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')))
+
+
+async def test_export_streams_filtered_orders(db_connection, test_order, test_promocode):
+    add_promocode(**test_promocode)
+    first = add_order(**{**test_order, 'topic': '=HYPERLINK("http://evil")'})
+    second = add_order(**test_order)
+    old = add_order(**test_order)
+    db_connection.execute("UPDATE orders SET created_at = '2020-01-15T10:00:00' WHERE id = ?", (old,))
+    update_order_status(first, 'completed')
+    use_promocode(test_promocode['code'], test_order['user_id'], first, 100)
+    use_promocode(test_promocode['code'], test_order['user_id'], second, 100)
+
+    buffer = io.BytesIO()
+    counts = export_stats(buffer, chunk_size=2)
+    assert counts == {'orders': 3, 'order_status_history': 4, 'promocode_usages': 2}
+    with zipfile.ZipFile(buffer) as archive:
+        orders = read_csv(archive, 'orders.csv')
+    assert orders[0][:2] == ['id', 'user_id'] and 'files' not in orders[0]
+    assert [int(row[0]) for row in orders[1:]] == [old, first, second]
+    # Текст користувача не стає формулою в Excel
+    assert orders[2][orders[0].index('topic')] == '\'=HYPERLINK("http://evil")'
+
+    buffer = io.BytesIO()
+    counts = export_stats(buffer, date_from='2021-01-01', status='completed')
+    assert counts == {'orders': 1, 'order_status_history': 2, 'promocode_usages': 1}
+    with zipfile.ZipFile(buffer) as archive:
+        history = read_csv(archive, 'order_status_history.csv')
+        usages = read_csv(archive, 'promocode_usages.csv')
+    assert [row[1] for row in history[1:]] == ['draft', 'completed']
+    assert usages[1][:3] == [test_promocode['code'], str(test_order['user_id']), str(first)]
+
+    assert export_stats(io.BytesIO(), date_to='2020-01-15')['orders'] == 1
+    assert export_stats(io.BytesIO(), date_to='2020-01-14')['orders'] == 0
+
+
+async def test_build_export_spools_and_checks_size(db_connection, test_order, monkeypatch):
+    add_order(**test_order)
+    document, counts = await build_export(status='draft')
+    try:
+        assert counts['orders'] == 1
+        assert document.filename.startswith('stats_draft_') and document.filename.endswith('.zip')
+        data = b''.join([chunk async for chunk in document.read(None)])
+        assert zipfile.ZipFile(io.BytesIO(data)).namelist() == [
+            'orders.csv', 'order_status_history.csv', 'promocode_usages.csv'
+        ]
+    finally:
+        document.file.close()
+
+    monkeypatch.setattr(Config, 'EXPORT_MAX_BYTES', 10)
+    with pytest.raises(ValueError):
+        await build_export()
+
+
+async def test_parse_export_args():
+    assert parse_export_args(None) == (None, None, None)
+    assert parse_export_args('01.09.2024 2024-12-31 completed') == ('2024-09-01', '2024-12-31', 'completed')
+    assert parse_export_args('confirmed 01.09.2024') == ('2024-09-01', None, 'confirmed')
+    for args in ('вчора', '31.12.2024 01.09.2024', '01.01.2024 02.01.2024 03.01.2024'):
+        with pytest.raises(ValueError):
+            parse_export_args(args)
@@ -0,0 +1,290 @@
+import asyncio
+import sqlite3
+from collections import namedtuple
+from datetime import datetime, timedelta
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from app import db
+from app.handlers.order import OrderStates
+from app.config import Config
+from app.middlewares.buffered_state import BufferedStateMiddleware
+from app.storage import BoundedMemoryStorage, BufferedFSMContext, SQLiteStorage, create_storage
+from app.storage.sqlite import storage_key_to_str
+
+pytestmark = pytest.mark.asyncio
+
+KEY = StorageKey(bot_id=1, chat_id=42, user_id=42)
+Promo = namedtuple('Promo', 'id code discount_type discount_value')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def count_calls(monkeypatch, name):
+    calls = []
+    original = getattr(db, name)
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(db, name, wrapper)
+    return calls
+
+
+async def test_order_form_survives_restart(db_connection):
+    storage = SQLiteStorage(flush_interval=60)
+    state = FSMContext(storage, KEY)
+    await state.set_state(OrderStates.waiting_for_deadline)
+    await state.update_data(order_type='coursework', topic='Тема роботи',
+                            promocode=Promo(1, 'TEST', 'percent', 10))
+    await storage.close()
+
+    restarted = SQLiteStorage(flush_interval=60)
+    state = FSMContext(restarted, KEY)
+    assert await state.get_state() == OrderStates.waiting_for_deadline.state
+    data = await state.get_data()
+    assert data['topic'] == 'Тема роботи'
+    # Рядки з БД повертаються списками, індекси ті самі
+    assert data['promocode'][2:] == ['percent', 10]
+    await restarted.close()
+
+
+async def test_reads_are_cached_and_writes_batched(db_connection, monkeypatch):
+    loads = count_calls(monkeypatch, 'load_fsm_record')
+    saves = count_calls(monkeypatch, 'save_fsm_records')
+    storage = SQLiteStorage(flush_interval=60)
+    state = FSMContext(storage, KEY)
+
+    # Одночасні перші звернення читають БД один раз
+    await asyncio.gather(*(state.get_state() for _ in range(5)))
+    for i in range(20):
+        await state.update_data(step=i)
+        assert (await state.get_data())['step'] == i
+    await state.set_state(OrderStates.waiting_for_topic)
+    assert len(loads) == 1 and saves == []
+    assert db.load_fsm_record(storage_key_to_str(KEY)) is None
+
+    await storage.flush()
+    assert len(saves) == 1
+    upserts, deletes = saves[0]
+    assert [row[0] for row in upserts] == [storage_key_to_str(KEY)] and deletes == []
+    row = db.load_fsm_record(storage_key_to_str(KEY))
+    assert row.state == OrderStates.waiting_for_topic.state and '"step": 19' in row.data
+    await storage.close()
+
+
+async def test_cleared_state_is_deleted(db_connection):
+    storage = SQLiteStorage(flush_interval=60)
+    state = FSMContext(storage, KEY)
+    await state.set_state(OrderStates.waiting_for_topic)
+    await state.update_data(topic='x')
+    await storage.flush()
+    await state.clear()
+    await storage.close()
+    assert db.load_fsm_record(storage_key_to_str(KEY)) is None
+
+
+async def test_purge_evicts_idle_cache_and_stale_rows(db_connection):
+    clock = FakeClock()
+    storage = SQLiteStorage(flush_interval=60, ttl=86400, cache_idle=100, clock=clock)
+    state = FSMContext(storage, KEY)
+    await state.set_state(OrderStates.waiting_for_volume)
+    await storage.flush()
+    old = (datetime.now() - timedelta(days=2)).isoformat()
+    db.save_fsm_records([('1:7:7:::default', 'OrderStates:waiting_for_topic', '{}', old)])
+
+    clock.now = 50
+    await storage.purge()
+    assert storage_key_to_str(KEY) in storage._records
+    assert db.load_fsm_record('1:7:7:::default') is None
+
+    clock.now = 200
+    await storage.purge()
+    assert storage._records == {}
+    # Вивантажений запис знову читається з БД
+    assert await state.get_state() == OrderStates.waiting_for_volume.state
+    await storage.close()
+
+
+async def test_failed_flush_is_retried(db_connection, monkeypatch):
+    storage = SQLiteStorage(flush_interval=60)
+    await FSMContext(storage, KEY).set_state(OrderStates.waiting_for_topic)
+
+    def broken(*args, **kwargs):
+        raise sqlite3.OperationalError('database is locked')
+
+    original = db.save_fsm_records
+    monkeypatch.setattr(db, 'save_fsm_records', broken)
+    await storage.flush()
+    assert db.load_fsm_record(storage_key_to_str(KEY)) is None
+
+    monkeypatch.setattr(db, 'save_fsm_records', original)
+    await storage.close()
+    assert db.load_fsm_record(storage_key_to_str(KEY)).state == OrderStates.waiting_for_topic.state
+
+
+def key(user_id):
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+async def test_memory_storage_keeps_only_non_empty_contexts():
+    storage = BoundedMemoryStorage()
+    state = FSMContext(storage, KEY)
+    # Читання не створює записів
+    assert await state.get_state() is None and await state.get_data() == {}
+    assert await FSMContext(storage, key(7)).get_value('x', 5) == 5
+    assert storage.stats()['contexts'] == 0
+
+    await state.set_state(OrderStates.waiting_for_deadline)
+    await state.update_data(topic='Тема роботи', promocode=Promo(1, 'TEST', 'percent', 10))
+    assert await state.get_state() == OrderStates.waiting_for_deadline.state
+    data = await state.get_data()
+    assert data['topic'] == 'Тема роботи' and data['promocode'][2:] == ['percent', 10]
+    assert storage.stats()['contexts'] == 1 and storage.bytes_used > 0
+
+    await state.clear()
+    assert storage.stats() == {'contexts': 0, 'bytes': 0, 'evicted_idle': 0, 'evicted_budget': 0}
+
+
+async def test_memory_storage_evicts_idle_contexts():
+    clock = FakeClock()
+    storage = BoundedMemoryStorage(idle_ttl=100, clock=clock)
+    await FSMContext(storage, key(1)).set_state(OrderStates.waiting_for_topic)
+    await FSMContext(storage, key(2)).set_state(OrderStates.waiting_for_topic)
+
+    clock.now = 80
+    assert await FSMContext(storage, key(2)).get_state() == OrderStates.waiting_for_topic.state
+    clock.now = 150
+    # Запис нового контексту прибирає прострочений key(1), key(2) ще живий
+    await FSMContext(storage, key(3)).update_data(step=1)
+    assert storage.stats()['contexts'] == 2 and storage.evicted_idle == 1
+
+    clock.now = 300
+    assert await FSMContext(storage, key(3)).get_data() == {}
+    assert storage.evicted_idle == 2
+
+
+async def test_memory_storage_evicts_least_recently_used_over_budget():
+    storage = BoundedMemoryStorage(max_contexts=3)
+    for user_id in range(1, 4):
+        await FSMContext(storage, key(user_id)).update_data(user_id=user_id)
+    await FSMContext(storage, key(1)).get_data()
+    await FSMContext(storage, key(4)).update_data(user_id=4)
+    assert await FSMContext(storage, key(2)).get_data() == {}
+    assert (await FSMContext(storage, key(1)).get_data())['user_id'] == 1
+    assert storage.evicted_budget == 1
+
+    small = BoundedMemoryStorage(max_bytes=2000)
+    for user_id in range(50):
+        await FSMContext(small, key(user_id)).update_data(last_bot_message_id=user_id, topic='x' * 100)
+    assert small.bytes_used <= 2000
+    assert small.stats()['contexts'] + small.evicted_budget == 50
+
+
+async def test_create_storage_uses_bounded_memory(monkeypatch):
+    monkeypatch.setattr(Config, 'FSM_STORAGE', 'memory')
+    assert isinstance(create_storage(), BoundedMemoryStorage)
+
+
+class CountingMemoryStorage(MemoryStorage):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def get_state(self, key):
+        self.calls.append('get_state')
+        return await super().get_state(key)
+
+    async def set_state(self, key, state=None):
+        self.calls.append('set_state')
+        await super().set_state(key, state)
+
+    async def get_data(self, key):
+        self.calls.append('get_data')
+        return await super().get_data(key)
+
+    async def set_data(self, key, data):
+        self.calls.append('set_data')
+        await super().set_data(key, data)
+
+
+async def test_buffered_context_coalesces_writes():
+    storage = CountingMemoryStorage()
+    await storage.set_data(KEY, {'files': [1]})
+    storage.calls.clear()
+
+    state = BufferedFSMContext(storage, KEY, raw_state=None)
+    assert await state.get_state() is None
+    await state.update_data(last_user_message_id=10)
+    await state.set_state(OrderStates.waiting_for_volume)
+    data = await state.update_data(price=500, discount=50)
+    data['files'].append(2)
+    await state.update_data(files=data['files'], last_bot_message_id=11)
+    assert await state.get_value('price') == 500 and state.has_pending
+    assert storage.calls == ['get_data']
+
+    await state.flush()
+    # Змінені ключі зливаються зі свіжими даними сховища
+    assert storage.calls == ['get_data', 'set_state', 'get_data', 'set_data']
+    assert await storage.get_state(KEY) == OrderStates.waiting_for_volume.state
+    assert await storage.get_data(KEY) == {'files': [1, 2], 'last_user_message_id': 10, 'price': 500,
+                                           'discount': 50, 'last_bot_message_id': 11}
+
+    # Незмінений стан і порожній clear() нічого не пишуть
+    storage.calls.clear()
+    state = BufferedFSMContext(storage, StorageKey(bot_id=1, chat_id=7, user_id=7), raw_state=None)
+    await state.clear()
+    await state.flush()
+    assert storage.calls == ['set_data']
+
+
+async def test_concurrent_buffered_updates_keep_each_others_keys():
+    storage = CountingMemoryStorage()
+    await storage.set_data(KEY, {'order_type': 'coursework', 'topic': 'Стара'})
+    # Подвійне натискання: обидва обробники прочитали дані до запису
+    first = BufferedFSMContext(storage, KEY, raw_state=None)
+    second = BufferedFSMContext(storage, KEY, raw_state=None)
+    await first.update_data(topic='Нова', last_bot_message_id=5)
+    await second.update_data(price=500)
+    second_data = await second.get_data()
+    await second.set_state(None)
+    await first.flush()
+    await second.flush()
+    assert second_data == {'order_type': 'coursework', 'topic': 'Стара', 'price': 500}
+    assert await storage.get_data(KEY) == {'order_type': 'coursework', 'topic': 'Нова',
+                                           'last_bot_message_id': 5, 'price': 500}
+
+    # set_data() замінює дані повністю, як і без буфера
+    state = BufferedFSMContext(storage, KEY, raw_state=None)
+    data = await state.get_data()
+    del data['price']
+    await state.set_data(data)
+    await storage.set_data(KEY, {**await storage.get_data(KEY), 'discount': 50})
+    await state.flush()
+    assert 'discount' not in await storage.get_data(KEY)
+
+
+async def test_buffered_state_middleware_flushes_after_handler():
+    storage = CountingMemoryStorage()
+    middleware = BufferedStateMiddleware()
+    data = {'state': FSMContext(storage, KEY), 'raw_state': None}
+
+    async def handler(event, data):
+        assert isinstance(data['state'], BufferedFSMContext)
+        await data['state'].set_state(OrderStates.waiting_for_topic)
+        await data['state'].update_data(order_type='coursework')
+        assert storage.calls == ['get_data']
+        raise ValueError('handler failed')
+
+    with pytest.raises(ValueError):
+        await middleware(handler, object(), data)
+    assert storage.calls == ['get_data', 'set_state', 'get_data', 'set_data']
+    assert await storage.get_state(KEY) == OrderStates.waiting_for_topic.state
@@ -0,0 +1,23 @@
+import pytest
+from app import async_db, db
+from benchmarks.load_test import SCENARIO, run_load_test
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_synthetic_users_complete_scenario(tmp_path, monkeypatch, bot_dispatcher):
+    monkeypatch.setattr(db, 'DB_PATH', str(tmp_path / 'load_test.sqlite3'))
+    db.init_db()
+    try:
+        report, api = await run_load_test(bot_dispatcher, users=5, concurrency=5)
+
+        assert report.errors == {} and report.unhandled == {}
+        assert report.total_updates == 5 * len(SCENARIO)
+        assert all(len(report.latencies[step]) == 5 for step, _, _ in SCENARIO)
+        assert db.count_orders() == 5
+        # Замовлення пишеться в БД на кроці підтвердження
+        assert min(report.db_by_step['confirm']) > 0
+        assert api.calls['sendmessage'] > 0
+        assert db.count_broadcast_recipients() == 5
+    finally:
+        async_db.shutdown()
@@ -0,0 +1,23 @@
+from app.utils.order_ids import order_number, permute
+
+KEY = b'test-secret'
+
+def test_five_digit_space_is_a_permutation():
+    """Усі 90 000 значень лічильника дають різні 5-значні номери"""
+    numbers = {order_number(i, KEY) for i in range(90000)}
+    assert len(numbers) == 90000
+    assert min(numbers) == 10000
+    assert max(numbers) == 99999
+
+def test_numbers_depend_on_key():
+    first = [order_number(i, KEY) for i in range(20)]
+    other = [order_number(i, b'another-secret') for i in range(20)]
+    assert first != other
+    # Номери не йдуть підряд
+    assert first != sorted(first)
+
+def test_overflow_switches_to_six_digits():
+    assert len(str(order_number(89999, KEY))) == 5
+    assert len(str(order_number(90000, KEY))) == 6
+    assert len(str(order_number(90000 + 900000, KEY))) == 7
+    assert permute(0, KEY, 6) != permute(1, KEY, 6)
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app import async_db, db
+from app.handlers.order import calculate_price
+from app.services.promo_registry import PromoRegistry
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def count_calls(monkeypatch, name):
+    calls = []
+    original = getattr(db, name)
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(db, name, wrapper)
+    return calls
+
+
+async def test_registry_caches_lookups_with_ttl(db_connection, test_promocode, monkeypatch):
+    loads = count_calls(monkeypatch, 'get_promocode')
+    clock = FakeClock()
+    registry = PromoRegistry(ttl=60, clock=clock)
+
+    # Відсутній код теж кешується, але add() одразу робить його видимим
+    assert await registry.get('TEST2024') is None
+    assert await registry.get('TEST2024') is None
+    await registry.add(**test_promocode)
+    for _ in range(5):
+        promo = await registry.get('TEST2024')
+    assert promo.used_count == 0 and len(loads) == 2
+
+    clock.now = 61
+    await registry.get('TEST2024')
+    assert len(loads) == 3
+
+    assert await registry.redeem('TEST2024', 1, 10, 1000) == 100
+    assert (await registry.get('TEST2024')).used_count == 1
+    assert len(loads) == 4
+
+
+async def test_registry_is_bounded(db_connection):
+    registry = PromoRegistry(max_size=2)
+    for code in ('A', 'B', 'A', 'C'):
+        await registry.get(code)
+    assert list(registry._entries) == ['A', 'C']
+
+
+async def test_redemption_is_limited(db_connection, test_promocode):
+    db.add_promocode(**{**test_promocode, 'usage_limit': 1})
+    assert db.use_promocode('TEST2024', 1, 10, 1000) == 100
+    assert db.use_promocode('TEST2024', 2, 11, 1000) is None
+    assert db.use_promocode('MISSING', 2, 11, 1000) is None
+    assert db.get_promocode('TEST2024').used_count == 1
+    assert [row.order_id for row in db.get_promocode_usages('TEST2024')] == [10]
+
+
+async def test_concurrent_redemptions_never_exceed_limit(tmp_path, monkeypatch, test_promocode):
+    """Стрес-тест: 200 підтверджень з 16 потоків на промокод з лімітом 25."""
+    monkeypatch.setattr(db, 'DB_PATH', str(tmp_path / 'promo.sqlite3'))
+    db.init_db()
+    db.add_promocode(**{**test_promocode, 'usage_limit': 25})
+    start = threading.Barrier(16)
+
+    def redeem(order_id):
+        if order_id < 16:
+            start.wait()
+        return db.use_promocode('TEST2024', order_id, order_id, 1000)
+
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(redeem, range(200)))
+        # І через асинхронний шар, як у confirm_order_callback
+        results += await asyncio.gather(*(async_db.use_promocode('TEST2024', i, i, 1000)
+                                          for i in range(200, 260)))
+
+        redeemed = [r for r in results if r is not None]
+        assert len(redeemed) == 25 and set(redeemed) == {100}
+        assert db.get_promocode('TEST2024').used_count == 25
+        assert len(db.get_promocode_usages('TEST2024')) == 25
+    finally:
+        async_db.shutdown()
+
+
+async def test_calculate_price_uses_promo_type_and_value():
+    data = {'order_type': 'coursework', 'volume': '10', 'deadline': '01.01.2099'}
+    full_price, _ = calculate_price(data)
+    assert full_price > 0
+    promo = ['TEST2024', 'percent', 10, 100, 0, None, None, 0, None, 0]
+    price, discount = calculate_price({**data, 'promocode': promo})
+    assert discount == pytest.approx(full_price * 0.1) and price == pytest.approx(full_price - discount)
+    price, discount = calculate_price({**data, 'promocode': ['FIX', 'fixed', 150, 100, 0, None, None, 0, None, 0]})
+    assert discount == 150 and price == full_price - 150
@@ -0,0 +1,139 @@
+import itertools
+import pytest
+from datetime import date, timedelta
+from unittest.mock import AsyncMock, MagicMock
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import CallbackQuery, Message
+from app import async_db, db
+from app.services.audit_log import audit_log
+from app.services.user_tracker import user_tracker
+from app.services.rate_limiter import SlidingWindowLimiter
+from app.middlewares.spam_protection import SpamProtectionMiddleware
+from benchmarks.fake_bot_api import FakeBotAPI
+from benchmarks.load_test import FIRST_USER_ID, LOAD_TEST_TOKEN, SCENARIO, SyntheticUser
+
+pytestmark = pytest.mark.asyncio
+
+LIMITS = {'order_creation': {'limit': 2, 'window': 1}}
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+async def test_sliding_window_limit():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter(LIMITS, max_keys=10, clock=clock)
+    assert limiter.hit(1, 'order_creation') == (True, 0)
+    clock.now += 30
+    assert limiter.hit(1, 'order_creation') == (True, 0)
+    allowed, retry_after = limiter.hit(1, 'order_creation')
+    assert allowed is False and retry_after == pytest.approx(30)
+    # Інший користувач і дія без ліміту не обмежуються
+    assert limiter.hit(2, 'order_creation')[0] is True
+    assert limiter.hit(1, 'general')[0] is True
+    # Найстаріша дія виходить з вікна
+    clock.now += 31
+    assert limiter.hit(1, 'order_creation')[0] is True
+    assert limiter.hit(1, 'order_creation')[0] is False
+
+
+async def test_lru_is_bounded():
+    limiter = SlidingWindowLimiter(LIMITS, max_keys=3, clock=FakeClock())
+    for user_id in range(10):
+        limiter.hit(user_id, 'order_creation')
+    assert len(limiter) == 3
+
+
+async def test_snapshot_survives_restart(db_connection):
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter(LIMITS, clock=clock)
+    limiter.hit(1, 'order_creation')
+    limiter.hit(1, 'order_creation')
+    await limiter.save_to_db()
+
+    restored = SlidingWindowLimiter(LIMITS, clock=clock)
+    await restored.restore_from_db()
+    assert restored.hit(1, 'order_creation')[0] is False
+    assert restored.hit(2, 'order_creation')[0] is True
+
+
+async def test_middleware_blocks_over_limit():
+    limiter = SlidingWindowLimiter(LIMITS, clock=FakeClock())
+    middleware = SpamProtectionMiddleware(limiter)
+    handler = AsyncMock(return_value='ok')
+    message = MagicMock(spec=Message)
+    message.text = '/order'
+    message.from_user = MagicMock(id=1)
+    message.answer = AsyncMock()
+
+    assert await middleware(handler, message, {}) == 'ok'
+    assert await middleware(handler, message, {}) == 'ok'
+    assert await middleware(handler, message, {}) is None
+    assert handler.await_count == 2
+    message.answer.assert_awaited_once()
+
+    # Звичайні повідомлення не обмежуються
+    message.text = 'привіт'
+    assert await middleware(handler, message, {}) == 'ok'
+
+
+async def test_order_creation_counted_once_per_order():
+    get_action_type = SpamProtectionMiddleware.get_action_type
+    message = MagicMock(spec=Message)
+    callback = MagicMock(spec=CallbackQuery)
+    callback.data = 'order_type:coursework'
+
+    message.text = '/order'
+    assert get_action_type(message) == 'order_creation'
+    message.text = '📝 Нове замовлення'
+    assert get_action_type(message, None) == 'order_creation'
+    # /order у формі відновлює діалог; /orders — інша команда
+    assert get_action_type(message, 'OrderStates:waiting_for_volume') is None
+    message.text = '/orders'
+    assert get_action_type(message) is None
+
+    # Тип з меню після /order — те саме замовлення; зі старого меню — нове
+    assert get_action_type(callback, 'OrderStates:waiting_for_type') is None
+    assert get_action_type(callback, None) == 'order_creation'
+
+
+async def test_resumed_order_does_not_spend_limit(tmp_path, monkeypatch, bot_dispatcher):
+    """Через повний диспетчер: /order посеред форми не з'їдає ліміт (3 за 10 хв)."""
+    monkeypatch.setattr(db, 'DB_PATH', str(tmp_path / 'spam.sqlite3'))
+    db.init_db()
+    api = FakeBotAPI()
+    session = AiohttpSession(api=TelegramAPIServer.from_base(await api.start()))
+    bot = Bot(token=LOAD_TEST_TOKEN, session=session)
+    user = SyntheticUser(FIRST_USER_ID + 777, (date.today() + timedelta(days=14)).strftime('%d.%m.%Y'))
+    steps = [step for step in SCENARIO if step[0] not in ('start', 'cabinet', 'faq', 'support')]
+    # Користувач двічі повертається до форми через /order
+    steps[3:3] = [('order', 'message', '/order')]
+    steps[6:6] = [('order', 'message', '/order')]
+    update_ids = itertools.count(1)
+    key = StorageKey(bot_id=bot.id, chat_id=user.chat['id'], user_id=user.user['id'])
+    try:
+        for _ in range(3):
+            for _, kind, payload in steps:
+                await bot_dispatcher.feed_raw_update(bot, user.build_update(next(update_ids), kind, payload))
+                if payload == '/order':
+                    # Не відхилено: показано меню типів або відновлено форму
+                    assert (await bot_dispatcher.storage.get_state(key)).startswith('OrderStates:')
+        assert db.count_orders() == 3
+
+        # Четверте нове замовлення вже відхиляється
+        await bot_dispatcher.feed_raw_update(bot, user.build_update(next(update_ids), 'message', '/order'))
+        assert await bot_dispatcher.storage.get_state(key) is None
+    finally:
+        await session.close()
+        await api.stop()
+        await audit_log.stop()
+        await user_tracker.stop()
+        async_db.shutdown()
@@ -0,0 +1,112 @@
+import asyncio
+import sqlite3
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+from app import db
+from app.services import reminders
+from app.services.reminders import ReminderScheduler
+
+pytestmark = pytest.mark.asyncio
+
+
+async def wait_until(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "умова не виконалась вчасно"
+        await asyncio.sleep(0.01)
+
+
+async def test_scheduler_resyncs_pending_reminders(db_connection):
+    # Нагадування, створене до перезапуску бота
+    db.add_reminder(1, 10, 'test', (datetime.now() - timedelta(minutes=5)).isoformat(), 'old')
+    db.add_reminder(2, 11, 'test', (datetime.now() + timedelta(days=1)).isoformat(), 'future')
+    bot = AsyncMock()
+    scheduler = ReminderScheduler(bot)
+    await scheduler.start()
+    try:
+        await wait_until(lambda: bot.send_message.await_count == 1)
+        bot.send_message.assert_awaited_with(1, 'old')
+        assert len(scheduler) == 1
+        assert [r.message for r in db.get_pending_reminders()] == []
+    finally:
+        await scheduler.stop()
+
+
+async def test_add_reminder_wakes_scheduler(db_connection, monkeypatch):
+    bot = AsyncMock()
+    scheduler = ReminderScheduler(bot)
+    monkeypatch.setattr(reminders, 'reminder_scheduler', scheduler)
+    await scheduler.start()
+    try:
+        # Планувальник спить без таймауту, поки heap порожній
+        await asyncio.sleep(0.05)
+        due = (datetime.now() + timedelta(seconds=0.2)).isoformat()
+        await reminders.add_reminder(3, 12, 'test', due, 'soon')
+        await wait_until(lambda: bot.send_message.await_count == 1)
+        bot.send_message.assert_awaited_with(3, 'soon')
+    finally:
+        await scheduler.stop()
+
+
+async def test_failed_reminders_are_retried_then_dead_lettered(db_connection, monkeypatch):
+    from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError
+    from app.config import Config
+    from unittest.mock import MagicMock
+    monkeypatch.setattr(Config, 'REMINDER_MAX_ATTEMPTS', 2)
+    past = (datetime.now() - timedelta(minutes=1)).isoformat()
+    ok_id = db.add_reminder(1, 10, 'test', past, 'ok')
+    flaky_id = db.add_reminder(2, 11, 'test', past, 'flaky')
+    blocked_id = db.add_reminder(3, 12, 'test', past, 'blocked')
+
+    async def send_message(chat_id, text):
+        if chat_id == 2:
+            raise TelegramNetworkError(method=MagicMock(), message='timeout')
+        if chat_id == 3:
+            raise TelegramForbiddenError(method=MagicMock(), message='bot was blocked')
+
+    bot = AsyncMock()
+    bot.send_message.side_effect = send_message
+    scheduler = ReminderScheduler(bot)
+    scheduler.sender.max_attempts = 1
+    await scheduler.process_due()
+
+    rows = {row.id: row for row in db_connection.execute('SELECT * FROM reminders')}
+    assert rows[ok_id].sent_at is not None
+    assert rows[blocked_id].failed_at is not None and rows[blocked_id].attempts == 1
+    # Тимчасова помилка: перенесено на пізніше і поставлено в heap
+    assert rows[flaky_id].failed_at is None and rows[flaky_id].scheduled_at > past
+    assert [entry[1] for entry in scheduler._heap] == [flaky_id]
+    assert db.get_pending_reminders() == []
+
+    # Друга невдача вичерпує REMINDER_MAX_ATTEMPTS
+    db_connection.execute('UPDATE reminders SET scheduled_at = ? WHERE id = ?', (past, flaky_id))
+    await scheduler.process_due()
+    row = db_connection.execute('SELECT * FROM reminders WHERE id = ?', (flaky_id,)).fetchone()
+    assert row.failed_at is not None and row.attempts == 2 and 'timeout' in row.last_error
+
+
+async def test_due_reminders_survive_process_error(db_connection, monkeypatch):
+    from app.config import Config
+    monkeypatch.setattr(Config, 'REMINDER_RETRY_DELAY', 0.05)
+    db.add_reminder(1, 10, 'test', (datetime.now() - timedelta(minutes=1)).isoformat(), 'due')
+    get_pending = db.get_pending_reminders
+    calls = []
+
+    def flaky_get_pending():
+        calls.append(1)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError('database is locked')
+        return get_pending()
+
+    monkeypatch.setattr(db, 'get_pending_reminders', flaky_get_pending)
+    bot = AsyncMock()
+    scheduler = ReminderScheduler(bot)
+    await scheduler.start()
+    try:
+        # Без нових нагадувань повтор іде з heap, а не після перезапуску
+        await wait_until(lambda: bot.send_message.await_count == 1)
+        bot.send_message.assert_awaited_with(1, 'due')
+        assert len(calls) == 2
+    finally:
+        await scheduler.stop()
@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter
+from app.services.sender import RateLimitedSender, is_permanent_error
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_sender(bot, **kwargs):
+    options = dict(global_rate=1000, per_chat_interval=0, concurrency=4, max_attempts=3, backoff_base=0)
+    options.update(kwargs)
+    return RateLimitedSender(bot, **options)
+
+
+async def test_per_chat_interval_is_respected():
+    bot = AsyncMock()
+    sender = make_sender(bot, per_chat_interval=0.05)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await asyncio.gather(*(sender.send_message(1, f'm{i}') for i in range(3)), sender.send_message(2, 'other'))
+    assert loop.time() - start >= 0.1
+    assert bot.send_message.await_count == 4
+
+
+async def test_global_rate_is_respected():
+    bot = AsyncMock()
+    sender = make_sender(bot, global_rate=20)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    # 20 токенів у відрі одразу, ще 10 — за 0.5 с
+    await asyncio.gather(*(sender.send_message(chat_id, 'hi') for chat_id in range(30)))
+    assert loop.time() - start >= 0.45
+
+
+async def test_retry_after_and_transient_errors_are_retried():
+    method = MagicMock()
+    bot = AsyncMock()
+    bot.send_message.side_effect = [
+        TelegramRetryAfter(method=method, message='Too Many Requests', retry_after=0),
+        TelegramNetworkError(method=method, message='timeout'),
+        'ok',
+    ]
+    assert await make_sender(bot).send_message(1, 'hi') == 'ok'
+    assert bot.send_message.await_count == 3
+
+
+async def test_permanent_and_exhausted_errors_are_raised():
+    method = MagicMock()
+    bot = AsyncMock()
+    bot.send_message.side_effect = TelegramForbiddenError(method=method, message='bot was blocked')
+    with pytest.raises(TelegramForbiddenError) as error:
+        await make_sender(bot).send_message(1, 'hi')
+    assert is_permanent_error(error.value)
+    assert bot.send_message.await_count == 1
+
+    bot.send_message.side_effect = TelegramNetworkError(method=method, message='timeout')
+    bot.send_message.reset_mock()
+    with pytest.raises(TelegramNetworkError):
+        await make_sender(bot, max_attempts=2).send_message(1, 'hi')
+    assert bot.send_message.await_count == 2
@@ -0,0 +1,133 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.types import Update, User
+from app import db
+from app.services.sender import RateLimitedSender
+from app.services.user_tracker import UserTracker, user_tracker
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_user(user_id, username='student', language_code='uk'):
+    return User(id=user_id, is_bot=False, first_name='Студент', username=username,
+                language_code=language_code)
+
+
+async def test_touch_is_buffered_and_flushed_in_one_batch(db_connection):
+    tracker = UserTracker(flush_interval=60)
+    for user_id in (1, 2, 3):
+        tracker.touch(make_user(user_id))
+    tracker.touch(make_user(2, username='renamed'))
+    assert db.get_user(1) is None
+
+    await tracker.stop()
+    assert db.count_broadcast_recipients() == 3
+    user = db.get_user(2)
+    assert (user.username, user.language_code, user.is_blocked) == ('renamed', 'uk', 0)
+    assert user.first_seen_at == user.last_active_at
+
+
+async def test_touch_is_debounced_until_profile_changes(db_connection):
+    clock = FakeClock()
+    tracker = UserTracker(flush_interval=60, debounce=300, clock=clock)
+    tracker.touch(make_user(1))
+    await tracker.flush()
+
+    clock.now = 10
+    tracker.touch(make_user(1))
+    assert tracker._pending == {}
+    tracker.touch(make_user(1, username='new_name'))
+    assert 1 in tracker._pending
+    await tracker.flush()
+
+    clock.now = 400
+    tracker.touch(make_user(1, username='new_name'))
+    assert 1 in tracker._pending
+    await tracker.stop()
+    assert db.get_user(1).username == 'new_name'
+
+
+async def test_blocked_users_are_skipped_by_broadcasts_and_reminders(db_connection, test_order):
+    tracker = UserTracker(flush_interval=60)
+    tracker.touch(make_user(1))
+    tracker.touch(make_user(2))
+    tracker.mark_blocked(2)
+    await tracker.flush()
+    assert db.get_user(2).is_blocked == 1
+
+    job_id, total = db.create_broadcast_job(999, 999, 'text', text='Новини')
+    assert total == 1
+    assert db.get_broadcast_batch(job_id, 10) == [1]
+
+    due = (datetime.now() - timedelta(minutes=1)).isoformat()
+    order_id = db.add_order(**{**test_order, 'user_id': 2})
+    db.add_reminder(2, order_id, 'deadline', due, 'Нагадування')
+    assert db.get_pending_reminders() == []
+
+    # Нова взаємодія означає, що користувач розблокував бота
+    tracker.touch(make_user(2))
+    await tracker.stop()
+    assert db.get_user(2).is_blocked == 0
+    assert [r.user_id for r in db.get_pending_reminders()] == [2]
+
+
+async def test_my_chat_member_updates_reach_dispatcher(db_connection, bot_dispatcher):
+    assert 'my_chat_member' in bot_dispatcher.resolve_used_update_types()
+    bot = Bot(token='42:TEST')
+    user = make_user(5)
+
+    def chat_member_update(update_id, status):
+        return Update.model_validate({'update_id': update_id, 'my_chat_member': {
+            'chat': {'id': 5, 'type': 'private'}, 'from': user.model_dump(), 'date': 0,
+            'old_chat_member': {'status': 'member', 'user': {'id': 42, 'is_bot': True, 'first_name': 'Bot'}},
+            'new_chat_member': {'status': status, 'user': {'id': 42, 'is_bot': True, 'first_name': 'Bot'},
+                                **({'until_date': 0} if status == 'kicked' else {})}}})
+
+    try:
+        await bot_dispatcher.feed_update(bot, chat_member_update(1, 'kicked'))
+        await user_tracker.flush()
+        assert db.get_user(5).is_blocked == 1
+
+        # Розблокував — знову отримує розсилки
+        await bot_dispatcher.feed_update(bot, chat_member_update(2, 'member'))
+        await user_tracker.flush()
+        assert db.get_user(5).is_blocked == 0
+    finally:
+        await user_tracker.stop()
+        await bot.session.close()
+
+
+async def test_sender_marks_user_blocked_on_forbidden(db_connection):
+    bot = AsyncMock()
+    bot.send_message.side_effect = TelegramForbiddenError(method=MagicMock(), message='bot was blocked')
+    sender = RateLimitedSender(bot, per_chat_interval=0)
+    with pytest.raises(TelegramForbiddenError):
+        await sender.send_message(77, 'Привіт')
+    await user_tracker.stop()
+    assert db.get_user(77).is_blocked == 1
+
+
+async def test_users_migration_backfills_from_orders_and_messages(db_connection, test_order):
+    from app.migrations import LATEST_VERSION, run_migrations
+    db.add_order(**test_order)
+    db.log_message(555, 'writer', 'user', 'Привіт')
+    db.log_message(777, None, 'bot', 'Відповідь бота')
+    db_connection.execute('DROP TABLE users')
+    db_connection.execute('PRAGMA user_version = 7')
+    assert run_migrations(db_connection) == LATEST_VERSION
+
+    assert db.get_user(test_order['user_id']).username == test_order['username']
+    assert db.get_user(555).username == 'writer'
+    assert db.get_user(777) is None
+    assert db.count_broadcast_recipients() == 2
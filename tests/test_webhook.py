@@ -0,0 +1,112 @@
+import asyncio
+import json
+from pathlib import Path
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from app.webhook import create_webhook_app
+from benchmarks.fake_bot_api import FakeBotAPI
+
+pytestmark = pytest.mark.asyncio
+
+SECRET = 'test-webhook-secret'
+HEADERS = {'X-Telegram-Bot-Api-Secret-Token': SECRET}
+RECORDED_UPDATES = json.loads(
+    (Path(__file__).parent / 'data' / 'webhook_updates.json').read_text(encoding='utf-8')
+)
+
+
+def text_update(update_id, text='привіт'):
+    return {'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': 0, 'text': text,
+        'chat': {'id': 1, 'type': 'private'},
+        'from': {'id': 1, 'is_bot': False, 'first_name': 'Test'},
+    }}
+
+
+def blocking_dispatcher(release, handled):
+    dp = Dispatcher()
+
+    @dp.message()
+    async def slow_handler(message):
+        await release.wait()
+        handled.append(message.message_id)
+
+    return dp
+
+
+async def test_recorded_updates_are_handled_by_full_dispatcher(db_connection, bot_dispatcher):
+    api = FakeBotAPI()
+    bot = Bot(token='100000:TEST', session=AiohttpSession(api=TelegramAPIServer.from_base(await api.start())))
+    app, handler = create_webhook_app(bot_dispatcher, bot, '/webhook', SECRET)
+    try:
+        async with TestClient(TestServer(app)) as client:
+            for update in RECORDED_UPDATES:
+                response = await client.post('/webhook', json=update, headers=HEADERS)
+                assert response.status == 200
+            await handler.drain()
+        assert handler.in_flight == 0
+        # Відповідь на кожен апдейт; callback FAQ ще й answerCallbackQuery
+        assert api.calls['sendmessage'] == len(RECORDED_UPDATES)
+        assert api.calls['answercallbackquery'] == 1
+    finally:
+        await bot.session.close()
+        await api.stop()
+
+
+async def test_webhook_rejects_wrong_secret():
+    handled = []
+    release = asyncio.Event()
+    release.set()
+    bot = Bot(token='100000:TEST')
+    app, handler = create_webhook_app(blocking_dispatcher(release, handled), bot, '/hook', SECRET)
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post('/hook', json=text_update(1))
+        assert response.status == 401
+        response = await client.post('/hook', json=text_update(2),
+                                     headers={'X-Telegram-Bot-Api-Secret-Token': 'wrong'})
+        assert response.status == 401
+        response = await client.post('/hook', json=text_update(3), headers=HEADERS)
+        assert response.status == 200
+        await handler.drain()
+    assert handled == [3]
+    await bot.session.close()
+
+
+async def test_webhook_answers_fast_and_drains_on_shutdown():
+    handled = []
+    release = asyncio.Event()
+    bot = Bot(token='100000:TEST')
+    app, handler = create_webhook_app(blocking_dispatcher(release, handled), bot, '/hook', SECRET)
+    async with TestClient(TestServer(app)) as client:
+        # Обробник ще чекає, а Telegram уже отримав 200
+        response = await asyncio.wait_for(client.post('/hook', json=text_update(1), headers=HEADERS), 1)
+        assert response.status == 200
+        assert handler.in_flight == 1 and handled == []
+
+        drain = asyncio.create_task(handler.drain())
+        await asyncio.sleep(0)
+        # Під час зупинки нові апдейти не приймаються — Telegram повторить їх пізніше
+        response = await client.post('/hook', json=text_update(2), headers=HEADERS)
+        assert response.status == 503
+
+        release.set()
+        await drain
+    assert handled == [1]
+    assert handler.in_flight == 0
+    await bot.session.close()
+
+
+async def test_drain_cancels_updates_after_timeout():
+    handled = []
+    bot = Bot(token='100000:TEST')
+    app, handler = create_webhook_app(blocking_dispatcher(asyncio.Event(), handled), bot, '/hook', SECRET)
+    handler.drain_timeout = 0.05
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post('/hook', json=text_update(1), headers=HEADERS)
+        assert response.status == 200
+        await handler.drain()
+    assert handled == [] and handler.in_flight == 0
+    await bot.session.close()